@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import ACTIVE_USERS_WINDOW_HOURS
+
+
+def parse_timestamp(value: str) -> float:
+    """Переводит CURRENT_TIMESTAMP SQLite (UTC) в unix-время"""
+    return datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+class ActiveUserIndex:
+    """Индекс активных пользователей в памяти
+
+    Хранит последнюю активность каждого пользователя за окно window_hours.
+    Записи упорядочены по времени активности, поэтому устаревшие удаляются
+    с начала без полного обхода. Поиск пользователя — O(1). Имена
+    пользователей упорядочены по времени сохранения и устаревают так же.
+    """
+
+    def __init__(self, window_hours: float = ACTIVE_USERS_WINDOW_HOURS):
+        self.window_hours = window_hours
+        self.window_seconds = window_hours * 3600
+        self._users = OrderedDict()
+        self._profiles = OrderedDict()
+
+    def _expire(self, now: float):
+        while self._users:
+            user_id, entry = next(iter(self._users.items()))
+            if now - entry['ts'] <= self.window_seconds:
+                break
+            self._users.popitem(last=False)
+            self._profiles.pop(user_id, None)
+
+        # Имена пользователей, которые так и не стали активными
+        while self._profiles:
+            _, (_, _, saved_at) = next(iter(self._profiles.items()))
+            if now - saved_at <= self.window_seconds:
+                break
+            self._profiles.popitem(last=False)
+
+    def remember_profile(self, user_id: int, first_name: str, username: str = None):
+        """Запоминает имя пользователя для ответов из индекса"""
+        now = time.time()
+        self._profiles.pop(user_id, None)
+        self._profiles[user_id] = (first_name, username, now)
+        self._expire(now)
+
+    def touch(self, user_id: int, last_activity: str, last_activity_time: str, ts: float = None):
+        """Отмечает активность пользователя"""
+        now = time.time()
+        ts = now if ts is None else ts
+
+        entry = self._users.get(user_id)
+        if entry is not None and entry['ts'] > ts:
+            # Более старая активность (например, загруженная из базы) не перетирает более новую
+            return
+
+        self._users.pop(user_id, None)
+        # Более старая активность (из базы) встает перед более новыми, чтобы сохранить порядок по времени
+        newer = []
+        for other_id in reversed(self._users):
+            if self._users[other_id]['ts'] <= ts:
+                break
+            newer.append(other_id)
+
+        self._users[user_id] = {'ts': ts, 'last_activity': last_activity, 'last_activity_time': last_activity_time}
+        for other_id in reversed(newer):
+            self._users.move_to_end(other_id)
+        self._expire(now)
+
+    def get(self, user_id: int, hours: float) -> Optional[Dict[str, Any]]:
+        """Возвращает пользователя, активного за последние hours часов, или None"""
+        entry = self._users.get(user_id)
+        profile = self._profiles.get(user_id)
+        if entry is None or profile is None:
+            return None
+        if time.time() - entry['ts'] > hours * 3600:
+            return None
+
+        first_name, username, _ = profile
+        return {
+            'first_name': first_name,
+            'username': username,
+            'last_activity': entry['last_activity'],
+            'last_activity_time': entry['last_activity_time']
+        }
+
+    def load(self, user_id: int, info: Dict[str, Any]):
+        """Добавляет в индекс пользователя, найденного в базе"""
+        self.remember_profile(user_id, info['first_name'], info.get('username'))
+        self.touch(user_id, info['last_activity'], info['last_activity_time'],
+                   ts=parse_timestamp(info['last_activity_time']))
+
+    def warm(self, active_users: Dict[int, Dict[str, Any]]):
+        """Заполняет индекс результатом Database.get_active_users"""
+        # Загружаем от старых к новым, чтобы сохранить порядок по времени
+        for user_id, info in sorted(active_users.items(), key=lambda item: item[1]['last_activity_time']):
+            self.load(user_id, info)
+
+    def __len__(self):
+        return len(self._users)
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from config import ACTIVITY_BATCH_SIZE, ACTIVITY_FLUSH_INTERVAL, ACTIVITY_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+def utc_timestamp() -> str:
+    """Текущее время в формате CURRENT_TIMESTAMP SQLite"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ActivityBuffer:
+    """Буфер отложенной записи активностей пользователей
+
+    Активности копятся в памяти и записываются одной транзакцией, когда
+    набирается batch_size записей или проходит flush_interval секунд.
+    Время активности фиксируется в момент добавления, а не записи.
+    Вместе с активностями записывается last_seen пользователей, отмеченных через touch().
+    """
+
+    def __init__(self, adb, batch_size: int = ACTIVITY_BATCH_SIZE,
+                 flush_interval: float = ACTIVITY_FLUSH_INTERVAL, max_pending: int = ACTIVITY_MAX_PENDING):
+        self.adb = adb
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._seen = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._stopping = False
+
+        # Метрики
+        self.flushed_total = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.dropped_total = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def add(self, user_id: int, activity_type: str, message_text: str = None, bot_response: str = None) -> str:
+        """Ставит активность в очередь на запись и возвращает ее время"""
+        created_at = utc_timestamp()
+        self._pending.append((user_id, activity_type, message_text, bot_response, created_at))
+        self._trim()
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return created_at
+
+    def touch(self, user_id: int):
+        """Отмечает, что пользователь появился: last_seen обновится при следующей записи буфера"""
+        self._seen[user_id] = utc_timestamp()
+
+    def _trim(self):
+        # Если база долго недоступна, отбрасываем самые старые записи, чтобы не съесть всю память
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped_total += overflow
+            logger.warning(f"⚠️ Буфер активностей переполнен, отброшено записей: {overflow}")
+
+    async def flush(self):
+        """Записывает все накопленные активности одной транзакцией"""
+        async with self._flush_lock:
+            if not self._pending and not self._seen:
+                return
+
+            batch, self._pending = self._pending, []
+            seen, self._seen = self._seen, {}
+            started = time.perf_counter()
+            success = await self.adb.run_write(self.adb.database.save_user_activities, batch, seen)
+            elapsed = time.perf_counter() - started
+
+            self.flush_count += 1
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+
+            if success:
+                self.flushed_total += len(batch)
+            else:
+                # Возвращаем пачку в начало очереди, попробуем в следующий раз
+                self.failed_flushes += 1
+                self._pending[:0] = batch
+                for user_id, ts in seen.items():
+                    self._seen.setdefault(user_id, ts)
+                self._trim()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи буфера активностей: {e}")
+
+    def start(self):
+        """Запускает фоновую запись по таймеру"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую запись и сбрасывает остаток буфера"""
+        if self._task is not None:
+            # Не отменяем задачу: wait_for может проглотить отмену, если событие
+            # сработало одновременно с ней, и тогда остановка зависнет
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        logger.info(f"✅ Буфер активностей сброшен, всего записано: {self.flushed_total}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики буфера"""
+        return {
+            'queue_depth': len(self._pending),
+            'flushed_total': self.flushed_total,
+            'flush_count': self.flush_count,
+            'failed_flushes': self.failed_flushes,
+            'dropped_total': self.dropped_total,
+            'last_flush_ms': round(self.last_flush_seconds * 1000, 2),
+            'max_flush_ms': round(self.max_flush_seconds * 1000, 2),
+            'avg_flush_ms': round(self.total_flush_seconds / self.flush_count * 1000, 2) if self.flush_count else 0.0,
+        }
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict
+
+from telegram.error import NetworkError, RetryAfter
+
+from broadcast import TokenBucket, retry_after_seconds
+from config import (
+    ADMIN_ID, ADMIN_NOTIFY_DIGEST_WINDOW, ADMIN_NOTIFY_MAX_BATCH, ADMIN_NOTIFY_MAX_PENDING,
+    ADMIN_NOTIFY_RATE, ADMIN_NOTIFY_MAX_RETRIES, ADMIN_NOTIFY_DRAIN_TIMEOUT
+)
+from keyboards import quick_reply_inline_keyboard
+
+logger = logging.getLogger(__name__)
+
+# Лимит длины сообщения Telegram и длина ответа бота в сводке из нескольких сообщений
+MESSAGE_LIMIT = 4096
+DIGEST_RESPONSE_LIMIT = 300
+
+
+def shorten(text: str, limit: int) -> str:
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit - 1] + "…"
+
+
+class AdminNotifier:
+    """Фоновая отправка админу переписки пользователей
+
+    notify() только ставит сообщение в очередь и сразу возвращает управление.
+    Сообщения одного пользователя, пришедшие в течение digest_window секунд,
+    объединяются в одну сводку (не больше max_batch последних). Отправка
+    ограничена rate сообщениями в секунду; после RetryAfter отправка встает
+    на паузу, а новые сообщения продолжают сливаться в сводки. Если сводок
+    накопилось больше max_pending, самые старые отбрасываются. При остановке
+    оставшиеся сводки досылаются не дольше drain_timeout секунд.
+    """
+
+    def __init__(self, admin_id: int = ADMIN_ID, digest_window: float = ADMIN_NOTIFY_DIGEST_WINDOW,
+                 max_batch: int = ADMIN_NOTIFY_MAX_BATCH, max_pending: int = ADMIN_NOTIFY_MAX_PENDING,
+                 rate: float = ADMIN_NOTIFY_RATE, max_retries: int = ADMIN_NOTIFY_MAX_RETRIES,
+                 drain_timeout: float = ADMIN_NOTIFY_DRAIN_TIMEOUT):
+        self.admin_id = admin_id
+        self.digest_window = digest_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.drain_timeout = drain_timeout
+        self.bucket = TokenBucket(rate, capacity=1)
+        self.bot = None
+
+        # user_id -> сводка; порядок — по времени, когда сводку пора отправлять
+        self._digests = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+        # Метрики
+        self.queued_total = 0
+        self.sent_total = 0
+        self.merged_total = 0
+        self.dropped_total = 0
+        self.rate_limited = 0
+        self.failed_total = 0
+
+    def notify(self, user, message: str, user_message: str = None):
+        """Ставит в очередь уведомление о сообщении пользователя и ответе бота"""
+        self.queued_total += 1
+        digest = self._digests.get(user.id)
+
+        if digest is None:
+            digest = {
+                'user_id': user.id,
+                'first_name': user.first_name,
+                'username': user.username,
+                'items': deque(maxlen=self.max_batch),
+                'count': 0,
+                'attempts': 0,
+                'due': time.monotonic() + self.digest_window,
+            }
+            self._digests[user.id] = digest
+            self._trim()
+            self._wakeup.set()
+        else:
+            self.merged_total += 1
+
+        digest['items'].append((user_message, message))
+        digest['count'] += 1
+
+        if digest['count'] >= self.max_batch and digest['due'] > time.monotonic():
+            # Сводка заполнена — отправляем без ожидания окна
+            digest['due'] = time.monotonic()
+            self._digests.move_to_end(user.id, last=False)
+            self._wakeup.set()
+
+    def _trim(self):
+        while len(self._digests) > self.max_pending:
+            _, digest = self._digests.popitem(last=False)
+            self.dropped_total += digest['count']
+            logger.warning(f"⚠️ Очередь уведомлений админа переполнена, отброшена сводка пользователя {digest['user_id']}")
+
+    def _requeue(self, digest: Dict[str, Any]):
+        """Возвращает неотправленную сводку в начало очереди, объединяя с новыми сообщениями"""
+        newer = self._digests.pop(digest['user_id'], None)
+        if newer is not None:
+            digest['items'].extend(newer['items'])
+            digest['count'] += newer['count']
+        digest['due'] = time.monotonic()
+        self._digests[digest['user_id']] = digest
+        self._digests.move_to_end(digest['user_id'], last=False)
+
+    def format_digest(self, digest: Dict[str, Any]) -> str:
+        """Текст уведомления: одно сообщение — как раньше, несколько — сводкой"""
+        items = list(digest['items'])
+
+        if digest['count'] == 1:
+            admin_message = "👤 Переписка с пользователем:\n\n"
+        else:
+            admin_message = f"👤 Переписка с пользователем ({digest['count']} сообщ.):\n\n"
+        admin_message += f"🆔 ID: {digest['user_id']}\n"
+        admin_message += f"👤 Имя: {digest['first_name']}\n"
+        if digest['username']:
+            admin_message += f"📱 @{digest['username']}\n"
+
+        if len(items) == 1:
+            user_message, response = items[0]
+            if user_message:
+                admin_message += f"\n💬 Сообщение пользователя:\n{user_message}\n"
+            admin_message += f"\n📨 Ответ бота:\n{response}"
+            return shorten(admin_message, MESSAGE_LIMIT)
+
+        skipped = digest['count'] - len(items)
+        if skipped:
+            admin_message += f"\n… и еще {skipped} более ранних сообщ.\n"
+        for user_message, response in items:
+            admin_message += f"\n💬 {user_message or '—'}\n📨 {shorten(response, DIGEST_RESPONSE_LIMIT)}\n"
+        return shorten(admin_message, MESSAGE_LIMIT)
+
+    async def _send(self, digest: Dict[str, Any], final: bool = False):
+        await self.bucket.acquire()
+        try:
+            await self.bot.send_message(
+                chat_id=self.admin_id,
+                text=self.format_digest(digest),
+                reply_markup=quick_reply_inline_keyboard(digest['user_id'], digest['first_name'])
+            )
+            self.sent_total += 1
+            return
+        except RetryAfter as e:
+            # Флуд-контроль в чате админа: пауза, сводка вернется в очередь и дополнится новыми сообщениями
+            seconds = retry_after_seconds(e)
+            self.rate_limited += 1
+            self.bucket.pause(seconds)
+            logger.warning(f"⚠️ Флуд-контроль в чате админа, пауза {seconds} сек.")
+        except NetworkError as e:
+            logger.warning(f"⚠️ Сетевая ошибка при уведомлении админа: {e}")
+        except Exception as e:
+            self.failed_total += digest['count']
+            logger.error(f"Ошибка отправки админу: {e}")
+            return
+
+        digest['attempts'] += 1
+        if final or digest['attempts'] > self.max_retries:
+            self.failed_total += digest['count']
+            logger.error(f"❌ Уведомление админу о пользователе {digest['user_id']} не отправлено")
+        else:
+            self._requeue(digest)
+
+    async def _run(self):
+        while not self._stopping:
+            if not self._digests or self.bot is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            user_id, digest = next(iter(self._digests.items()))
+            delay = digest['due'] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            del self._digests[user_id]
+            await self._send(digest)
+
+    def start(self, bot):
+        """Запускает фоновую отправку уведомлений"""
+        self.bot = bot
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _drain(self):
+        while self._digests:
+            user_id, digest = next(iter(self._digests.items()))
+            await self._send(digest, final=True)
+            self._digests.pop(user_id, None)
+
+    async def stop(self):
+        """Останавливает отправку и до drain_timeout секунд досылает оставшиеся сводки по одной попытке"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        if self.bot is not None and self._digests:
+            try:
+                await asyncio.wait_for(self._drain(), timeout=self.drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._digests:
+            # Не успели за drain_timeout (лимит скорости, флуд-контроль) — не задерживаем остановку бота
+            dropped = sum(digest['count'] for digest in self._digests.values())
+            self.dropped_total += dropped
+            logger.warning(f"⚠️ При остановке не отправлено админу сводок: {len(self._digests)} "
+                           f"({dropped} сообщ.)")
+            self._digests.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики очереди уведомлений"""
+        return {
+            'pending_digests': len(self._digests),
+            'queued_total': self.queued_total,
+            'sent_total': self.sent_total,
+            'merged_total': self.merged_total,
+            'dropped_total': self.dropped_total,
+            'rate_limited': self.rate_limited,
+            'failed_total': self.failed_total,
+        }
+
+
+# Глобальная очередь уведомлений админа
+admin_notifier = AdminNotifier()
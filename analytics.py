@@ -0,0 +1,224 @@
+"""Воронка заказа и выручка за произвольный период
+
+Воронка считается по журналу активностей: subject_selection → variant_entered →
+package_selected → cart_view → order_created. Пользователь проходит шаг, только
+если до этого прошел предыдущий. Журнал читается пачками по ANALYTICS_CHUNK_SIZE
+строк keyset-проходом по id, поэтому память зависит от числа пользователей
+за период, а не от размера журнала. Дни, уже свернутые в activity_daily,
+читаются из итогов; порядок действий внутри такого дня неизвестен и считается
+совпадающим с порядком шагов воронки.
+
+Выручка по предмету и тарифу берется из таблицы заказов.
+
+Отчет из командной строки:
+    python analytics.py [путь_к_базе] [--from 2024-01-01] [--to 2024-01-31] [--json]
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from config import ANALYTICS_CHUNK_SIZE, ANALYTICS_DEFAULT_DAYS
+
+# Шаги воронки: тип активности и подпись
+FUNNEL_STEPS = [
+    ('subject_selection', "📚 Выбрал предмет"),
+    ('variant_entered', "🔢 Ввел вариант"),
+    ('package_selected', "📦 Выбрал тариф"),
+    ('cart_view', "🛒 Открыл корзину"),
+    ('order_created', "✅ Оформил заказ"),
+]
+
+# Ключ, меньший любого ключа activity_daily за день
+MIN_USER_ID = -(2 ** 63)
+
+
+class Funnel:
+    """Накопитель воронки: сколько шагов подряд прошел каждый пользователь"""
+
+    def __init__(self, steps: List[Tuple[str, str]] = FUNNEL_STEPS):
+        self.steps = steps
+        self._index = {activity_type: i for i, (activity_type, _) in enumerate(steps)}
+        self.progress = {}
+        self.events = [0] * len(steps)
+
+    @property
+    def activity_types(self) -> List[str]:
+        return [activity_type for activity_type, _ in self.steps]
+
+    def feed(self, user_id: int, activity_type: str, count: int = 1):
+        """Учитывает действие пользователя (записи подаются в порядке времени)"""
+        step = self._index.get(activity_type)
+        if step is None:
+            return
+        self.events[step] += count
+        if step == self.progress.get(user_id, 0):
+            self.progress[user_id] = step + 1
+
+    def feed_day(self, user_id: int, counts: Dict[str, int]):
+        """Учитывает дневные итоги пользователя в порядке шагов воронки"""
+        for activity_type, _ in self.steps:
+            if activity_type in counts:
+                self.feed(user_id, activity_type, counts[activity_type])
+
+    def result(self) -> List[Dict[str, Any]]:
+        reached = [0] * len(self.steps)
+        for passed in self.progress.values():
+            for step in range(passed):
+                reached[step] += 1
+
+        result = []
+        for i, (activity_type, title) in enumerate(self.steps):
+            previous = reached[i - 1] if i else reached[0]
+            result.append({
+                'activity_type': activity_type,
+                'title': title,
+                'users': reached[i],
+                'events': self.events[i],
+                'conversion': round(reached[i] / previous * 100, 1) if previous else 0.0,
+                'overall': round(reached[i] / reached[0] * 100, 1) if reached[0] else 0.0,
+                'drop_off': previous - reached[i],
+            })
+        return result
+
+
+def day_bounds(date_from: date, date_to: date) -> Tuple[str, str]:
+    """Полуинтервал [start, end) времени записей для дней date_from..date_to включительно"""
+    return f"{date_from.isoformat()} 00:00:00", f"{(date_to + timedelta(days=1)).isoformat()} 00:00:00"
+
+
+def parse_period(args: List[str], default_days: int = ANALYTICS_DEFAULT_DAYS) -> Tuple[date, date]:
+    """Период из аргументов: пусто — последние default_days дней, N — последние N дней, две даты — с по"""
+    today = datetime.now(timezone.utc).date()
+
+    if not args:
+        return today - timedelta(days=default_days - 1), today
+    if len(args) == 1 and args[0].isdigit():
+        days = int(args[0])
+        if days < 1:
+            raise ValueError("Число дней должно быть больше нуля")
+        return today - timedelta(days=days - 1), today
+    if len(args) == 2:
+        date_from, date_to = (date.fromisoformat(arg) for arg in args)
+        if date_from > date_to:
+            raise ValueError("Начало периода позже конца")
+        return date_from, date_to
+    raise ValueError("Укажите число дней или две даты ГГГГ-ММ-ДД")
+
+
+def scan_funnel(database, date_from: date, date_to: date, chunk_size: int = ANALYTICS_CHUNK_SIZE,
+                funnel: Funnel = None) -> Tuple[Funnel, int, int]:
+    """Проходит итоги и журнал за период пачками; возвращает воронку, число строк и пачек"""
+    funnel = funnel or Funnel()
+    types = funnel.activity_types
+    rows_scanned = 0
+    chunks = 0
+
+    # Свернутые дни: итоги одного пользователя за день могут оказаться в двух пачках
+    after = (date_from.isoformat(), MIN_USER_ID, '')
+    date_end = (date_to + timedelta(days=1)).isoformat()
+    current, counts = None, {}
+    while True:
+        rows = database.get_activity_daily_chunk(types, date_end, after, chunk_size)
+        if not rows:
+            break
+        chunks += 1
+        rows_scanned += len(rows)
+        for day, user_id, activity_type, count in rows:
+            if (day, user_id) != current:
+                if current is not None:
+                    funnel.feed_day(current[1], counts)
+                current, counts = (day, user_id), {}
+            counts[activity_type] = count
+        after = rows[-1][:3]
+    if current is not None:
+        funnel.feed_day(current[1], counts)
+
+    # Журнал: диапазон id по индексу времени, затем проход по первичному ключу
+    start, end = day_bounds(date_from, date_to)
+    first_id, last_id = database.get_activity_id_range(start, end)
+    if first_id is not None:
+        after_id = first_id - 1
+        while True:
+            rows = database.get_activities_chunk(types, start, end, after_id, last_id, chunk_size)
+            if not rows:
+                break
+            chunks += 1
+            rows_scanned += len(rows)
+            for _, user_id, activity_type in rows:
+                funnel.feed(user_id, activity_type)
+            after_id = rows[-1][0]
+
+    return funnel, rows_scanned, chunks
+
+
+def build_report(database, date_from: date, date_to: date, chunk_size: int = ANALYTICS_CHUNK_SIZE) -> Dict[str, Any]:
+    """Отчет по воронке и выручке за дни date_from..date_to включительно"""
+    started = time.monotonic()
+    funnel, rows_scanned, chunks = scan_funnel(database, date_from, date_to, chunk_size)
+
+    breakdown = database.get_revenue_breakdown(*day_bounds(date_from, date_to))
+    orders = sum(row['orders'] for row in breakdown)
+    revenue = sum(row['revenue'] for row in breakdown)
+
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'funnel': funnel.result(),
+        'revenue': {
+            'orders': orders,
+            'revenue': revenue,
+            'average': round(revenue / orders) if orders else 0,
+            'breakdown': breakdown,
+        },
+        'rows_scanned': rows_scanned,
+        'chunks': chunks,
+        'seconds': round(time.monotonic() - started, 2),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Текст отчета для сообщения админу"""
+    text = f"📈 Воронка за {report['date_from']} — {report['date_to']}\n"
+
+    for i, step in enumerate(report['funnel']):
+        text += f"\n{step['title']}: {step['users']}"
+        if i:
+            text += f" ({step['conversion']}% от пред., {step['overall']}% от начала, ушли {step['drop_off']})"
+
+    revenue = report['revenue']
+    text += f"\n\n💰 Заказов: {revenue['orders']} на {revenue['revenue']} руб., средний чек {revenue['average']} руб."
+    for row in revenue['breakdown']:
+        text += f"\n• {row['subject']} / {row['package']}: {row['orders']} зак., {row['revenue']} руб."
+
+    text += f"\n\n🔎 Прочитано строк: {report['rows_scanned']} ({report['chunks']} пачек, {report['seconds']} сек.)"
+    return text
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Воронка заказа и выручка за период")
+    parser.add_argument('db_file', nargs='?', default='bot_database.db')
+    parser.add_argument('--from', dest='date_from')
+    parser.add_argument('--to', dest='date_to')
+    parser.add_argument('--days', type=int, default=ANALYTICS_DEFAULT_DAYS, help="длина периода без --from")
+    parser.add_argument('--chunk', type=int, default=ANALYTICS_CHUNK_SIZE)
+    parser.add_argument('--json', action='store_true', help="вывести отчет в JSON")
+    args = parser.parse_args()
+
+    date_to = date.fromisoformat(args.date_to) if args.date_to else datetime.now(timezone.utc).date()
+    date_from = date.fromisoformat(args.date_from) if args.date_from else date_to - timedelta(days=args.days - 1)
+    if date_from > date_to:
+        parser.error("Начало периода позже конца")
+
+    from database import Database
+    database = Database(args.db_file)
+    try:
+        report = build_report(database, date_from, date_to, chunk_size=args.chunk)
+    finally:
+        database.close()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
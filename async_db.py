@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from active_users import ActiveUserIndex
+from activity_buffer import ActivityBuffer
+from config import DB_READ_WORKERS, DB_REPORT_WORKERS, DB_READ_QUEUE_SIZE, DB_WRITE_QUEUE_SIZE
+from database import Database, db
+from profile_cache import ProfileCache
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """Асинхронный фасад над Database
+
+    Методы Database вызываются через await и выполняются вне event loop:
+    чтения — в пуле потоков, записи — в одном выделенном потоке-писателе,
+    поэтому записи не конкурируют между собой за блокировку SQLite.
+    Долгие отчеты админа идут в своем пуле потоков (run_report) и не
+    задерживают чтения пользовательских обработчиков.
+    Очереди ограничены: при переполнении вызывающий ждет свободного места.
+    Активности пользователей не пишутся сразу, а копятся в ActivityBuffer,
+    и одновременно попадают в индекс активных пользователей ActiveUserIndex.
+    Профиль пользователя пишется только при изменении (ProfileCache), а
+    last_seen обновляется вместе с записью буфера активностей.
+    """
+
+    # Методы Database, которые изменяют данные
+    WRITE_METHODS = frozenset({
+        'save_user', 'save_user_activity', 'save_user_activities', 'save_user_selection', 'delete_user_selection',
+        'create_order', 'update_order_status', 'update_order_status_returning', 'update_order_comment', 'delete_order',
+        'create_broadcast_job', 'set_broadcast_status_message', 'recover_broadcast_job',
+        'claim_broadcast_recipients', 'complete_broadcast_recipients', 'finish_broadcast_job',
+        'rollup_activities_chunk', 'prune_daily_active_users',
+    })
+
+    def __init__(self, database: Database, read_workers: int = DB_READ_WORKERS,
+                 report_workers: int = DB_REPORT_WORKERS, read_queue_size: int = DB_READ_QUEUE_SIZE,
+                 write_queue_size: int = DB_WRITE_QUEUE_SIZE):
+        self.database = database
+        if database.pool.size < read_workers + report_workers + 1:
+            # Потокам чтения, отчетов и писателю не хватит соединений — ждут до таймаута пула
+            logger.warning(f"⚠️ Пул соединений ({database.pool.size}) меньше числа потоков базы "
+                           f"({read_workers} чтения + {report_workers} отчетов + писатель)")
+        self._reader = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='db-reader')
+        self._reports = ThreadPoolExecutor(max_workers=max(1, report_workers), thread_name_prefix='db-report')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._read_slots = asyncio.Semaphore(read_queue_size)
+        self._report_slots = asyncio.Semaphore(read_queue_size)
+        self._write_slots = asyncio.Semaphore(write_queue_size)
+        self.activities = ActivityBuffer(self)
+        self.active_users = ActiveUserIndex()
+        self.profiles = ProfileCache()
+
+    async def _submit(self, executor, slots, func, *args, **kwargs):
+        async with slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def run_read(self, func, *args, **kwargs):
+        """Выполняет функцию чтения в пуле потоков"""
+        return await self._submit(self._reader, self._read_slots, func, *args, **kwargs)
+
+    async def run_report(self, func, *args, **kwargs):
+        """Выполняет долгое чтение (отчет, выгрузку) в отдельном пуле потоков отчетов"""
+        return await self._submit(self._reports, self._report_slots, func, *args, **kwargs)
+
+    async def run_write(self, func, *args, **kwargs):
+        """Выполняет функцию записи в потоке-писателе"""
+        return await self._submit(self._writer, self._write_slots, func, *args, **kwargs)
+
+    async def save_user(self, user_id: int, first_name: str, username: str = None):
+        """Сохраняет пользователя, если профиль изменился, и запоминает его имя в индексе активных"""
+        self.active_users.remember_profile(user_id, first_name, username)
+
+        if self.profiles.is_saved(user_id, first_name, username):
+            self.activities.touch(user_id)
+            return
+
+        if await self.run_write(self.database.save_user, user_id, first_name, username):
+            self.profiles.remember(user_id, first_name, username)
+        else:
+            self.profiles.forget(user_id)
+
+    async def save_user_activity(self, user_id: int, activity_type: str, message_text: str = None,
+                                 bot_response: str = None):
+        """Ставит активность в буфер отложенной записи"""
+        created_at = self.activities.add(user_id, activity_type, message_text, bot_response)
+        self.active_users.touch(user_id, message_text or activity_type or 'Нет данных', created_at)
+
+    async def find_active_user(self, user_id: int, hours: float = 1) -> Optional[Dict[str, Any]]:
+        """Ищет пользователя, активного за последние hours часов: сначала в индексе, затем в базе"""
+        info = self.active_users.get(user_id, hours)
+        if info is None:
+            info = await self.run_read(self.database.get_active_user, user_id, hours)
+            if info:
+                self.active_users.load(user_id, info)
+        return info
+
+    def __getattr__(self, name):
+        method = getattr(self.database, name)
+        if not callable(method):
+            return method
+
+        runner = self.run_write if name in self.WRITE_METHODS else self.run_read
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            return await runner(method, *args, **kwargs)
+
+        return wrapper
+
+    async def start(self):
+        """Заполняет индекс активных пользователей и запускает фоновую запись буфера активностей"""
+        self.active_users.warm(await self.run_read(self.database.get_active_users, self.active_users.window_hours))
+        self.activities.start()
+
+    async def close(self):
+        """Сбрасывает буфер активностей, дожидается поставленных задач и останавливает потоки"""
+        await self.activities.stop()
+        self._writer.shutdown(wait=True)
+        self._reader.shutdown(wait=True)
+        self._reports.shutdown(wait=True)
+        logger.info("✅ Асинхронный доступ к базе данных остановлен")
+
+
+# Глобальный асинхронный фасад базы данных
+adb = AsyncDatabase(db)
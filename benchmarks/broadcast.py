@@ -0,0 +1,80 @@
+"""Рассылка через BroadcastEngine на фейковом боте с лимитами Telegram
+
+Фейковый бот отвечает RetryAfter при превышении лимита сообщений в секунду
+и случайно выдает сетевые ошибки. Запуск из корня проекта:
+    python -m benchmarks.broadcast --recipients 500
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from telegram.error import RetryAfter, TimedOut
+
+from broadcast import BroadcastEngine
+
+
+class FakeBot:
+    """Заглушка Bot: лимит limit сообщений в скользящем окне 1 сек. и случайные таймауты"""
+
+    def __init__(self, limit: int = 30, latency: float = 0.05, error_rate: float = 0.02):
+        self.limit = limit
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sent = []
+        self.rate_limited = 0
+        self.timeouts = 0
+        self._window = deque()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1:
+            self._window.popleft()
+        if len(self._window) >= self.limit:
+            self.rate_limited += 1
+            raise RetryAfter(1)
+
+        if random.random() < self.error_rate:
+            self.timeouts += 1
+            raise TimedOut()
+
+        self._window.append(now)
+        self.sent.append(chat_id)
+
+
+async def run(args):
+    bot = FakeBot(limit=args.limit, latency=args.latency, error_rate=args.error_rate)
+    engine = BroadcastEngine(bot, concurrency=args.concurrency, global_rate=args.rate, retry_backoff=0.1)
+    recorded = []
+
+    async def on_delivered(batch):
+        recorded.extend(batch)
+
+    async def on_progress(result):
+        print(f"   ... {result.processed}/{result.total}")
+
+    result = await engine.run(range(args.recipients), "test", on_delivered=on_delivered, on_progress=on_progress)
+
+    print(f"\n📢 Получателей: {result.total}")
+    print(f"✅ Доставлено: {result.successful} (записано: {len(recorded)}, уникальных: {len(set(bot.sent))})")
+    print(f"❌ Ошибок: {result.failed}, повторов: {result.retries}")
+    print(f"⏳ RetryAfter от бота: {bot.rate_limited}, таймаутов: {bot.timeouts}")
+    print(f"⏱️ Время: {result.elapsed:.2f} сек., {result.successful / result.elapsed:.1f} сообщ./сек.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipients', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=25)
+    parser.add_argument('--limit', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
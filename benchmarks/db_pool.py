@@ -0,0 +1,62 @@
+"""Сравнение пула соединений с подключением на каждый вызов
+
+Запуск из корня проекта:
+    python -m benchmarks.db_pool --iterations 2000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import Database
+
+
+class ConnectPerCallDatabase(Database):
+    """Старое поведение: новое соединение на каждый вызов метода"""
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+def run_workload(database: Database, iterations: int, users: int) -> float:
+    """Имитирует нагрузку обработчиков: /start и клики по меню"""
+    started = time.perf_counter()
+    for i in range(iterations):
+        user_id = 1000 + i % users
+        database.save_user(user_id, f"User{user_id}", None)
+        database.save_user_activity(user_id, "menu_click", "Предметы")
+        database.get_user_selection(user_id)
+        if i % 10 == 0:
+            database.get_active_users(1)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--pool-size', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, factory in (
+            ('connect-per-call', lambda path: ConnectPerCallDatabase(path)),
+            ('pool', lambda path: Database(path, pool_size=args.pool_size)),
+        ):
+            database = factory(os.path.join(tmp, f"{name}.db"))
+            run_workload(database, min(100, args.iterations), args.users)  # прогрев
+            elapsed = run_workload(database, args.iterations, args.users)
+            database.close()
+            results[name] = elapsed
+            print(f"{name:>18}: {elapsed:.3f} сек., {args.iterations / elapsed:.0f} итераций/сек.")
+
+        speedup = results['connect-per-call'] / results['pool']
+        print(f"\n🚀 Ускорение пула: x{speedup:.2f}")
+
+
+if __name__ == '__main__':
+    main()
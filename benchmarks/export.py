@@ -0,0 +1,119 @@
+"""Выгрузка журнала активностей: потоковая запись пачками против fetchall
+
+Создает временную базу с синтетическим журналом (по умолчанию 1 000 000 строк)
+и для каждого формата измеряет время, размер файла и пик памяти Python
+(tracemalloc, отдельным проходом). Для сравнения выгружает те же строки через fetchall.
+Запуск из корня проекта:
+    python -m benchmarks.export --rows 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from database import Database
+from exporter import EXPORTS, export_rows
+
+ACTIVITY_TYPES = ['menu_click', 'subject_selection', 'variant_entered', 'package_selected', 'cart_view',
+                  'user_message', 'order_created']
+
+
+def fill(database: Database, rows: int, users: int):
+    """Заполняет журнал одной транзакцией, строки создаются генератором"""
+    rng = random.Random(42)
+    start = datetime.now(timezone.utc) - timedelta(days=60)
+    step = 60 * 86400 / rows
+
+    def activities():
+        for i in range(rows):
+            created_at = (start + timedelta(seconds=i * step)).strftime('%Y-%m-%d %H:%M:%S')
+            yield (rng.randint(1, users), rng.choice(ACTIVITY_TYPES), f"Сообщение {i}",
+                   "Ответ бота " * rng.randint(1, 20), created_at)
+
+    conn = database.get_connection()
+    try:
+        conn.executemany('INSERT OR IGNORE INTO users (user_id, first_name) VALUES (?, ?)',
+                         ((user_id, f"User{user_id}") for user_id in range(1, users + 1)))
+        conn.executemany('''
+            INSERT INTO user_activities (user_id, activity_type, message_text, bot_response, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', activities())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def fetchall_export(database: Database, path: str) -> int:
+    """Прежний подход: весь результат в память, затем в файл"""
+    conn = database.get_connection()
+    try:
+        rows = conn.execute(EXPORTS['activities'].sql).fetchall()
+    finally:
+        conn.close()
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(EXPORTS['activities'].columns)
+        writer.writerows(rows)
+    return len(rows)
+
+
+def traced(func, *args):
+    """Время считается отдельным проходом: под tracemalloc выгрузка в несколько раз медленнее"""
+    started = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--skip-fetchall', action='store_true', help="не запускать выгрузку через fetchall")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'export.db'))
+        started = time.perf_counter()
+        fill(database, args.rows, args.users)
+        print(f"Синтетический журнал: {args.rows} строк за {time.perf_counter() - started:.1f} сек.")
+
+        print(f"{'Способ':<22}{'строк':>10}{'сек.':>8}{'строк/с':>10}{'файл, МБ':>10}{'пик, МБ':>9}")
+        peaks = []
+        for fmt, compress in (('csv', False), ('csv', True), ('jsonl', False), ('jsonl', True)):
+            path = os.path.join(tmp, f"activities.{fmt}" + ('.gz' if compress else ''))
+            result, elapsed, peak = traced(export_rows, database, 'activities', path, fmt, compress, None, args.batch)
+            peaks.append(peak)
+            name = f"поток {fmt}" + (' + gzip' if compress else '')
+            print(f"{name:<22}{result['rows']:>10}{elapsed:>8.1f}{result['rows'] / elapsed:>10.0f}"
+                  f"{result['bytes'] / 1024 / 1024:>10.1f}{peak:>9.1f}")
+            os.remove(path)
+
+        if not args.skip_fetchall:
+            path = os.path.join(tmp, 'fetchall.csv')
+            rows, elapsed, peak = traced(fetchall_export, database, path)
+            print(f"{'fetchall csv':<22}{rows:>10}{elapsed:>8.1f}{rows / elapsed:>10.0f}"
+                  f"{os.path.getsize(path) / 1024 / 1024:>10.1f}{peak:>9.1f}")
+
+        database.close()
+
+    # Пик памяти потоковой выгрузки не должен зависеть от числа строк
+    if max(peaks) > 50:
+        print(f"❌ Пик памяти потоковой выгрузки {max(peaks):.1f} МБ")
+        sys.exit(1)
+    print("✅ Память потоковой выгрузки не зависит от числа строк")
+
+
+if __name__ == '__main__':
+    main()
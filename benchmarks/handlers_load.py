@@ -0,0 +1,323 @@
+"""Нагрузочный тест обработчиков без сети и без запуска бота
+
+Синтетические Update проходят через настоящий Application со всеми
+обработчиками (main.build_application), а сетевой слой заменен фейковым
+Bot API в памяти с задержкой --api-latency на каждый вызов. --users
+пользователей одновременно проходят путь заказа (start → предметы →
+предмет → вариант → тариф → корзина → заказ) по --journeys раз.
+
+Считаются пропускная способность, p50/p95/p99 задержки обработки по
+обработчикам и число SQL-запросов: всего за прогон (вместе с отложенной
+записью активностей) и на один вызов каждого обработчика — отдельным
+последовательным проходом, где запросы однозначно относятся к обработчику.
+Запросом считается каждый оператор, который выполняет sqlite3, включая
+BEGIN/COMMIT и операторы триггеров.
+База создается во временной папке. Результаты сохраняются в JSON:
+    python -m benchmarks.handlers_load --users 50 --journeys 5 --output run.json
+    python -m benchmarks.handlers_load --users 50 --journeys 5 --compare run.json
+С --metrics прогон идет с включенными метриками (METRICS_ENABLED=1) — сравнение
+с прогоном без них показывает накладные расходы инструментирования:
+    python -m benchmarks.handlers_load --metrics --compare run.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+ADMIN_ID = 1
+USER_ID_START = 100000
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeBotApi:
+    """Ответы Bot API в памяти: getMe, отправка и редактирование сообщений, остальное — True"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def answer(self, method: str, params: dict):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Load', 'username': 'load_test_bot'}
+        if method.startswith('send') or method.startswith('edit'):
+            return {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        return True
+
+
+class FakeRequest(BaseRequest):
+    """Сетевой слой бота, который вместо HTTP обращается к FakeBotApi"""
+
+    def __init__(self, api: FakeBotApi):
+        self.api = api
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        params = request_data.parameters if request_data else {}
+        result = await self.api.answer(url.rsplit('/', 1)[-1], params)
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+class QueryCounter:
+    """Считает SQL-запросы всех соединений пула через trace callback sqlite3"""
+
+    def __init__(self):
+        self.by_kind = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, statement: str):
+        # Запросы внутри триггеров sqlite3 сообщает строкой "-- TRIGGER имя"
+        kind = 'TRIGGER' if statement.startswith('--') else statement.lstrip().split(None, 1)[0].upper()
+        with self._lock:
+            self.by_kind[kind] += 1
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return sum(self.by_kind.values())
+
+    def install(self):
+        """Включает подсчет для всех новых соединений пула (до создания базы)"""
+        from db_pool import ConnectionPool
+        connect = ConnectionPool._connect
+        counter = self
+
+        def traced_connect(pool):
+            conn = connect(pool)
+            conn.set_trace_callback(counter)
+            return conn
+
+        ConnectionPool._connect = traced_connect
+
+
+def journey(subjects, buttons, variant: int):
+    """Сообщения одного пути пользователя от /start до оформления заказа"""
+    return [
+        '/start', buttons.BTN_SUBJECTS, subjects[variant % len(subjects)], buttons.BTN_ENTER_VARIANT,
+        str(variant), buttons.BTN_PACKAGE_STANDARD, buttons.BTN_CART, buttons.BTN_CHECKOUT,
+    ]
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def latency_summary(values) -> dict:
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+    }
+
+
+async def run(args) -> dict:
+    api = FakeBotApi(args.api_latency / 1000)
+    counter = QueryCounter()
+    counter.install()
+
+    # Модули бота импортируются после подмены окружения: база создается в текущей папке
+    import main as bot_main
+    import routing
+    from benchmarks.webhook_load import make_update
+    from async_db import adb
+    from config import SUBJECTS
+    from metrics import metrics
+    from retention import retention_job
+    logging.getLogger().setLevel(logging.WARNING)
+
+    application = bot_main.build_application(request=FakeRequest(api), get_updates_request=FakeRequest(api))
+    errors = []
+
+    async def count_error(update, context):
+        errors.append(repr(context.error))
+
+    application.add_error_handler(count_error)
+
+    def handler_label(text: str) -> str:
+        if text.startswith('/'):
+            return text.split()[0]
+        route = routing.router.resolve(text)
+        return route.handler.__name__ if route else 'unknown'
+
+    update_ids = itertools.count(1)
+
+    async def process(user_id: int, text: str) -> float:
+        update = Update.de_json(make_update(next(update_ids), user_id, text), application.bot)
+        started = time.perf_counter()
+        await application.process_update(update)
+        return time.perf_counter() - started
+
+    await application.initialize()
+    await bot_main.on_startup(application)
+
+    # Первый проход очистки журнала запускается при старте — дожидаемся его, чтобы не считать его запросы
+    while retention_job.enabled and retention_job.runs == 0:
+        await asyncio.sleep(0.01)
+
+    # Последовательный проход: запросы на один вызов каждого обработчика вместе с его отложенной записью
+    queries_per_call = {}
+    for text in journey(SUBJECTS, routing, 1):
+        await adb.activities.flush()
+        before = counter.total
+        await process(USER_ID_START - 1, text)
+        await adb.activities.flush()
+        queries_per_call[handler_label(text)] = counter.total - before
+
+    # Нагрузка: пользователи параллельно, шаги одного пользователя — по очереди
+    latencies = defaultdict(list)
+    queries_before = counter.total
+    api_calls_before = sum(api.calls.values())
+
+    async def user_session(user_id: int):
+        for number in range(args.journeys):
+            for text in journey(SUBJECTS, routing, user_id + number):
+                latencies[handler_label(text)].append(await process(user_id, text))
+                if args.think_time:
+                    await asyncio.sleep(args.think_time / 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_session(USER_ID_START + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    # Остановка сбрасывает буфер активностей — эти запросы тоже относятся к прогону
+    await bot_main.on_shutdown(application)
+    await application.shutdown()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    updates = len(all_latencies)
+    queries = counter.total - queries_before
+
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {
+            'users': args.users,
+            'journeys': args.journeys,
+            'api_latency_ms': args.api_latency,
+            'think_time_ms': args.think_time,
+            'concurrent_updates': application.concurrent_updates,
+            'metrics_enabled': metrics.enabled,
+        },
+        'updates': updates,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_ups': round(updates / elapsed, 1),
+        'latency': latency_summary(all_latencies),
+        'handlers': {
+            label: dict(latency_summary(values), queries_per_call=queries_per_call.get(label))
+            for label, values in sorted(latencies.items())
+        },
+        'db': {
+            'queries': queries,
+            'queries_per_update': round(queries / updates, 2) if updates else 0.0,
+            'by_kind': dict(counter.by_kind.most_common()),
+        },
+        'bot_api_calls': sum(api.calls.values()) - api_calls_before,
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'metrics_summary': metrics.summary() if metrics.enabled else None,
+    }
+
+
+def print_report(result: dict, baseline: dict = None):
+    def delta(value, old):
+        if old in (None, 0):
+            return ''
+        return f" ({(value - old) / old * 100:+.0f}%)"
+
+    base = baseline or {}
+    print(f"Обновлений: {result['updates']} за {result['elapsed_s']} сек., "
+          f"{result['throughput_ups']} обн./сек.{delta(result['throughput_ups'], base.get('throughput_ups'))}")
+    latency = result['latency']
+    print(f"Задержка: p50 {latency['p50_ms']} мс, p95 {latency['p95_ms']} мс"
+          f"{delta(latency['p95_ms'], base.get('latency', {}).get('p95_ms'))}, p99 {latency['p99_ms']} мс")
+    print(f"SQL-запросов: {result['db']['queries']} ({result['db']['queries_per_update']} на обновление"
+          f"{delta(result['db']['queries_per_update'], base.get('db', {}).get('queries_per_update'))}), "
+          f"вызовов Bot API: {result['bot_api_calls']}, ошибок: {result['errors']}")
+
+    print(f"\n{'Обработчик':<28}{'вызовов':>8}{'p50, мс':>9}{'p95, мс':>9}{'p99, мс':>9}{'SQL':>5}")
+    for label, stats in result['handlers'].items():
+        old = base.get('handlers', {}).get(label, {})
+        print(f"{label:<28}{stats['count']:>8}{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+              f"{stats['queries_per_call'] if stats['queries_per_call'] is not None else '-':>5}"
+              f"{delta(stats['p95_ms'], old.get('p95_ms'))}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50, help="одновременных пользователей")
+    parser.add_argument('--journeys', type=int, default=5, help="путей заказа на пользователя")
+    parser.add_argument('--api-latency', type=float, default=20, help="задержка вызова Bot API, мс")
+    parser.add_argument('--think-time', type=float, default=0, help="пауза между шагами пользователя, мс")
+    parser.add_argument('--metrics', action='store_true', help="включить метрики (METRICS_ENABLED=1)")
+    parser.add_argument('--output', help="сохранить результаты в JSON")
+    parser.add_argument('--compare', help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output) if args.output else None
+
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.update(BOT_TOKEN='123456:LOAD-TEST', ADMIN_ID=str(ADMIN_ID))
+    # HTTP-сервер метрик не нужен: сводка берется из реестра напрямую
+    os.environ.update(METRICS_ENABLED='1' if args.metrics else '0', METRICS_PORT='0')
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            result = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    print_report(result, baseline)
+    if result['metrics_summary']:
+        print(f"\n{result['metrics_summary']}")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Результаты сохранены в {output}")
+
+    if result['errors']:
+        print(f"❌ Ошибки обработчиков: {result['error_samples']}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Стоимость клавиатуры на один ответ: создание заново против готового объекта
+
+Для каждой клавиатуры измеряется время и память на создание объекта и
+время сериализации в JSON (ее библиотека выполняет при каждой отправке,
+с кэшем или без). Запуск из корня проекта:
+    python -m benchmarks.keyboards --calls 20000
+"""
+import argparse
+import time
+import tracemalloc
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+import keyboards
+
+
+def rebuild_reply(markup):
+    """Прежнее поведение: новая клавиатура на каждый вызов"""
+    layout = [list(row) for row in markup.keyboard]
+    return lambda: ReplyKeyboardMarkup([list(row) for row in layout], resize_keyboard=True)
+
+
+def rebuild_order_actions(order_id):
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("✅ Готов", callback_data=f"order_ready_{order_id}"),
+            InlineKeyboardButton("🗑️ Удалить", callback_data=f"order_delete_{order_id}")
+        ]
+    ])
+
+
+def per_call(func, calls: int):
+    """Среднее время (мкс) и выделенная память (байт) на вызов"""
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = (time.perf_counter() - started) / calls * 1e6
+
+    tracemalloc.start()
+    keep = [func() for _ in range(1000)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return elapsed, allocated / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    cases = [
+        ("main_keyboard", rebuild_reply(keyboards.MAIN_KEYBOARD), keyboards.main_keyboard),
+        ("subjects_keyboard", rebuild_reply(keyboards.SUBJECTS_KEYBOARD), keyboards.subjects_keyboard),
+        ("admin_panel_keyboard", rebuild_reply(keyboards.ADMIN_PANEL_KEYBOARD), keyboards.admin_panel_keyboard),
+        ("order_actions_keyboard", lambda: rebuild_order_actions(42), lambda: keyboards.order_actions_keyboard(42)),
+    ]
+
+    print(f"{'Клавиатура':<24}{'заново, мкс':>12}{'кэш, мкс':>10}{'заново, Б':>11}{'кэш, Б':>8}{'JSON, мкс':>11}")
+    for name, fresh, cached in cases:
+        fresh_time, fresh_memory = per_call(fresh, args.calls)
+        cached_time, cached_memory = per_call(cached, args.calls)
+        markup = cached()
+        json_time, _ = per_call(markup.to_json, args.calls // 4)
+        print(f"{name:<24}{fresh_time:>12.2f}{cached_time:>10.2f}{fresh_memory:>11.0f}{cached_memory:>8.0f}{json_time:>11.2f}")
+
+    print(keyboards.order_actions_keyboard.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Поиск одного заказа: прямой запрос против загрузки всех заказов
+
+Запуск из корня проекта:
+    python -m benchmarks.order_lookup --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from config import ORDER_STATUSES
+from database import Database
+
+
+def fill_orders(database: Database, count: int, users: int = 1000):
+    """Догружает заказы до count штук одной транзакцией"""
+    conn = database.get_connection()
+    try:
+        existing = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, first_name) VALUES (?, ?)',
+            [(user_id, f"User{user_id}") for user_id in range(1, users + 1)]
+        )
+        conn.executemany(
+            'INSERT INTO orders (user_id, subject, variant, package, price) VALUES (?, ?, ?, ?, ?)',
+            [(random.randint(1, users), '🏠 Архитектура', str(i % 40), '📊 СТАНДАРТ', 5000)
+             for i in range(count - existing)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def measure(func, calls: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'orders.db'))
+        print(f"{'заказов':>10} | {'get_orders+next, мс':>20} | {'get_order, мс':>14} | {'status_returning, мс':>20}")
+
+        for size in sorted(args.sizes):
+            fill_orders(database, size)
+
+            def random_id():
+                return random.randint(1, size)
+
+            def old_path():
+                order_id = random_id()
+                orders = database.get_orders("all")
+                return next((o for o in orders if o['order_id'] == order_id), None)
+
+            # Старый путь линейный, на больших таблицах хватит нескольких вызовов
+            old_ms = measure(old_path, max(1, min(args.calls, 2_000_000 // size)))
+            direct_ms = measure(lambda: database.get_order(random_id()), args.calls)
+            returning_ms = measure(
+                lambda: database.update_order_status_returning(random_id(), ORDER_STATUSES['ready']), args.calls
+            )
+            print(f"{size:>10} | {old_ms:>20.3f} | {direct_ms:>14.3f} | {returning_ms:>20.3f}")
+
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Количество записей пользователей за сессию из 1000 сообщений: с кэшем профилей и без
+
+Каждое сообщение проходит тот же путь записи, что и в боте: save_user в
+handle_message и в notify_admin, затем активность в буфер. На середине
+сессии один пользователь меняет username. Запуск из корня проекта:
+    python -m benchmarks.profile_cache --messages 1000 --users 25
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+from async_db import AsyncDatabase
+from database import Database
+
+
+class WriteCounter:
+    """Считает вызовы метода Database и пропускает их дальше"""
+
+    def __init__(self, method):
+        self.method = method
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.method(*args, **kwargs)
+
+
+async def run_session(db_file: str, messages: int, users: int, cache_size: int):
+    database = Database(db_file)
+    save_user = WriteCounter(database.save_user)
+    database.save_user = save_user
+
+    adb = AsyncDatabase(database)
+    adb.profiles.max_entries = cache_size
+    await adb.start()
+
+    rng = random.Random(13)
+    for i in range(messages):
+        user_id = rng.randint(1, users)
+        username = f"user{user_id}"
+        if user_id == 1 and i >= messages // 2:
+            username = "renamed_user1"
+
+        await adb.save_user(user_id, f"User{user_id}", username)
+        await adb.save_user_activity(user_id, "menu_click", "Предметы")
+        await adb.save_user(user_id, f"User{user_id}", username)
+
+    await adb.close()
+
+    conn = database.get_connection()
+    try:
+        stored = conn.execute('SELECT username FROM users WHERE user_id = 1').fetchone()[0]
+        missing_last_seen = conn.execute('SELECT COUNT(*) FROM users WHERE last_seen IS NULL').fetchone()[0]
+    finally:
+        conn.close()
+        database.close()
+
+    return save_user.calls, adb.profiles.metrics(), stored, missing_last_seen
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before, _, _, _ = await run_session(os.path.join(tmp, 'no_cache.db'), args.messages, args.users, 0)
+        after, metrics, stored, missing = await run_session(
+            os.path.join(tmp, 'cache.db'), args.messages, args.users, 100000
+        )
+
+    print(f"Сообщений: {args.messages}, пользователей: {args.users}")
+    print(f"Записей пользователей без кэша: {before}")
+    print(f"Записей пользователей с кэшем:  {after} ({metrics})")
+    print(f"username после переименования: {stored}")
+
+    # Записываются только первые появления и одно переименование
+    expected = args.users + 1
+    if after > expected or stored != "renamed_user1" or missing:
+        print(f"❌ Ожидалось не больше {expected} записей и сохраненное переименование")
+        sys.exit(1)
+    print(f"✅ Записей меньше в {before / after:.0f} раз")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Поиск обработчика: цепочка if/elif против таблицы маршрутов
+
+Заодно проверяет, что у каждой кнопки клавиатур есть обработчик.
+Запуск из корня проекта:
+    python -m benchmarks.routing --iterations 200000
+"""
+import argparse
+import random
+import sys
+import time
+
+from config import SUBJECTS
+from handlers import router, admin_router
+import keyboards
+
+
+def legacy_resolve(text: str) -> str:
+    """Прежняя цепочка сравнений из handle_message (возвращает имя ветки)"""
+    if text == '📚 Предметы':
+        return 'subjects'
+    elif text == '✏️ Ввести вариант':
+        return 'enter_variant'
+    elif text in ['🏗️ БАЗОВЫЙ', '📊 СТАНДАРТ', '💎 ИНДИВИДУАЛЬНЫЙ']:
+        return 'package'
+    elif text == '📞 Заказать консультацию':
+        return 'consultation'
+    elif text == '📞 Связаться с менеджером':
+        return 'manager'
+    elif text == '🛒 Корзина':
+        return 'cart'
+    elif text == '✅ Оформить заказ':
+        return 'checkout'
+    elif text in SUBJECTS:
+        return 'subject'
+    elif text in ['↩️ Назад в меню', '🏠 В главное меню']:
+        return 'menu'
+    elif text == '↩️ К выбору предмета':
+        return 'to_subjects'
+    elif text == '↩️ Назад к тарифам':
+        return 'to_packages'
+    elif text == '↩️ Назад':
+        return 'back'
+    elif text == '🧹 Очистить корзину':
+        return 'clear'
+    elif text == 'ℹ️ Гарантии':
+        return 'guarantees'
+    elif text == '💰 Цены':
+        return 'prices'
+    elif text == '👨‍🎓 О нас':
+        return 'about'
+    elif text == '📞 Контакты':
+        return 'contacts'
+    return 'unknown'
+
+
+def keyboard_labels(markup):
+    return [[button.text for button in row] for row in markup.keyboard]
+
+
+def check_keyboards() -> list:
+    """Надписи кнопок без обработчика"""
+    user_keyboards = [
+        keyboards.main_keyboard(), keyboards.subjects_keyboard(), keyboards.subject_selected_keyboard(),
+        keyboards.service_packages_keyboard(), keyboards.consultation_keyboard(), keyboards.cart_keyboard(),
+    ]
+    admin_keyboards = [
+        keyboards.admin_panel_keyboard(), keyboards.admin_cancel_keyboard(), keyboards.admin_orders_keyboard(),
+        keyboards.admin_users_keyboard({42: {'first_name': 'Тест'}}),
+    ]
+    missing = []
+    for markup in user_keyboards:
+        missing += router.unrouted(keyboard_labels(markup))
+    for markup in admin_keyboards:
+        missing += admin_router.unrouted(keyboard_labels(markup))
+    return missing
+
+
+def measure(resolve, texts) -> float:
+    started = time.perf_counter()
+    for text in texts:
+        resolve(text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    missing = check_keyboards()
+    if missing:
+        print(f"❌ Кнопки без обработчика: {missing}")
+        sys.exit(1)
+    print("✅ У всех кнопок клавиатур есть обработчик")
+
+    # Смесь кнопок меню, предметов, номеров вариантов и произвольного текста
+    labels = list(router.labels)
+    samples = labels + ['27', '15', 'Здравствуйте, сколько стоит курсовая?']
+    texts = [random.choice(samples) for _ in range(args.iterations)]
+    worst = ['Здравствуйте, сколько стоит курсовая?'] * args.iterations
+
+    for name, data in (("Смесь сообщений", texts), ("Неизвестный текст (худший случай)", worst)):
+        legacy = measure(legacy_resolve, data)
+        table = measure(router.resolve, data)
+        print(f"{name}: if/elif {legacy / len(data) * 1e9:.0f} нс, "
+              f"таблица {table / len(data) * 1e9:.0f} нс, ускорение {legacy / table:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Статистика /stats: агрегаты по журналу против счетчиков из триггеров
+
+Заполняет временную базу журналом активностей и заказами, сравнивает время
+прежних запросов get_user_stats со чтением счетчиков и проверяет, что
+счетчики совпадают с пересчетом по сырым данным. Запуск из корня проекта:
+    python -m benchmarks.stats --activities 200000 --users 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from database import Database
+
+
+def legacy_stats(database: Database):
+    """Прежние три агрегата по таблицам"""
+    conn = database.get_connection()
+    try:
+        total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        active_today = conn.execute('''
+            SELECT COUNT(DISTINCT user_id) FROM user_activities
+            WHERE created_at > datetime('now', '-24 hours')
+        ''').fetchone()[0]
+        current_orders = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        return total_users, active_today, current_orders
+    finally:
+        conn.close()
+
+
+def recomputed(database: Database):
+    """Значения, которые должны совпасть со счетчиками"""
+    conn = database.get_connection()
+    try:
+        return (
+            conn.execute('SELECT COUNT(*) FROM users').fetchone()[0],
+            conn.execute('''
+                SELECT COUNT(DISTINCT user_id) FROM user_activities WHERE created_at >= date('now')
+            ''').fetchone()[0],
+            conn.execute('SELECT COUNT(*), COALESCE(SUM(price), 0) FROM orders').fetchone()[:],
+        )
+    finally:
+        conn.close()
+
+
+def measure(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'stats.db'))
+        for user_id in range(1, args.users + 1):
+            database.save_user(user_id, f"User{user_id}", f"user{user_id}")
+
+        activities = []
+        for _ in range(args.activities):
+            created_at = now - timedelta(seconds=rng.randint(0, 14 * 86400))
+            activities.append((rng.randint(1, args.users), 'menu_click', '📚 Предметы', None,
+                               created_at.strftime('%Y-%m-%d %H:%M:%S')))
+        started = time.perf_counter()
+        database.save_user_activities(activities)
+        write_time = time.perf_counter() - started
+
+        for _ in range(args.orders):
+            order_id = database.create_order(rng.randint(1, args.users), '🏠 Архитектура', '1', '🏗️ БАЗОВЫЙ', 3000)
+            if rng.random() < 0.3:
+                database.update_order_status(order_id, '✅ Готов')
+            elif rng.random() < 0.1:
+                database.delete_order(order_id)
+
+        legacy = measure(lambda: legacy_stats(database), args.repeat)
+        counters = measure(database.get_user_stats, args.repeat)
+        stats = database.get_user_stats()
+        total_users, active_today, (orders, revenue) = recomputed(database)
+        database.close()
+
+    print(f"Активностей: {args.activities}, пользователей: {args.users}, заказов: {args.orders}")
+    print(f"Запись журнала с триггерами: {write_time / args.activities * 1e6:.1f} мкс на активность")
+    print(f"Агрегаты по журналу: {legacy:.2f} мс, счетчики: {counters:.2f} мс, ускорение {legacy / counters:.0f}x")
+
+    actual = (stats['total_users'], stats['active_today'], stats['current_orders'], stats['revenue_total'])
+    expected = (total_users, active_today, orders, revenue)
+    if actual != expected:
+        print(f"❌ Счетчики {actual} не совпадают с пересчетом {expected}")
+        sys.exit(1)
+    print("✅ Счетчики совпадают с пересчетом по таблицам")
+
+
+if __name__ == '__main__':
+    main()
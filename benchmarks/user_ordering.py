@@ -0,0 +1,160 @@
+"""Гонка быстрых нажатий одного пользователя при параллельной обработке обновлений
+
+Каждый из --users пользователей без пауз отправляет
+предмет A → вариант → тариф → предмет B → вариант → тариф; нажатия одного
+пользователя приходят подряд, пользователи — друг за другом. Обновления
+подаются в процессор так же, как это делает Application при
+concurrent_updates: задача на каждое обновление в порядке поступления. Обработчики идут через настоящий Application и базу, Bot API —
+фейковый с задержкой --api-latency.
+
+Прогон повторяется для двух процессоров:
+  - SimpleUpdateProcessor (PTB по умолчанию) — гонка воспроизводится:
+    "Сначала выберите предмет" или корзина с ценой другого предмета;
+  - PerUserUpdateProcessor — у всех пользователей итоговый выбор как при
+    последовательной обработке, а разные пользователи идут параллельно.
+Пользователь считается сломанным, если бот ответил ему ошибкой или его выбор
+отличается от ожидаемого. Код выхода 1, если сломан кто-то при PerUserUpdateProcessor.
+    python -m benchmarks.user_ordering --users 50 --concurrency 16
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from telegram import Update
+from telegram.ext import SimpleUpdateProcessor
+
+from benchmarks.handlers_load import ADMIN_ID, PROJECT_DIR, FakeBotApi, FakeRequest
+
+USER_ID_START = 200000
+
+
+class RecordingBotApi(FakeBotApi):
+    """Фейковый Bot API, который запоминает тексты отправленных сообщений по чатам"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency)
+        self.texts = defaultdict(list)
+
+    async def answer(self, method: str, params: dict):
+        if method == 'sendMessage':
+            self.texts[int(params['chat_id'])].append(params.get('text', ''))
+        return await super().answer(method, params)
+
+
+def taps(routing, subject_a: str, subject_b: str):
+    """Быстрые нажатия одного пользователя и выбор, который должен получиться в итоге"""
+    messages = [subject_a, '7', routing.BTN_PACKAGE_STANDARD, subject_b, '8', routing.BTN_PACKAGE_BASIC]
+    return messages, {'subject': subject_b, 'variant': '8', 'package': 'basic'}
+
+
+async def run_scenario(application, processor, api: RecordingBotApi, users, messages, expected, update_ids) -> dict:
+    """Подает нажатия пользователей в процессор и проверяет итоговый выбор каждого"""
+    from async_db import adb
+    from benchmarks.webhook_load import make_update
+    from config import SUBJECT_PRICES
+
+    await processor.initialize()
+    tasks = []
+    started = time.perf_counter()
+    # Нажатия одного пользователя приходят подряд, как при быстрых нажатиях в клиенте
+    for user_id in users:
+        for text in messages:
+            update = Update.de_json(make_update(next(update_ids), user_id, text), application.bot)
+            tasks.append(asyncio.create_task(processor.process_update(update, application.process_update(update))))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await processor.shutdown()
+
+    broken = 0
+    error_replies = 0
+    wrong_selections = 0
+    for user_id in users:
+        errors = [text for text in api.texts[user_id] if text.startswith('❌')]
+        selection = await adb.get_user_selection(user_id) or {}
+        actual = {key: selection.get(key) for key in expected}
+        price_ok = selection.get('price') == SUBJECT_PRICES[expected['subject']][expected['package']]
+        wrong = actual != expected or not price_ok
+        error_replies += len(errors)
+        wrong_selections += wrong
+        broken += bool(errors) or wrong
+
+    return {
+        'processor': type(processor).__name__,
+        'updates': len(tasks),
+        'elapsed_s': round(elapsed, 3),
+        'broken_users': broken,
+        'error_replies': error_replies,
+        'wrong_selections': wrong_selections,
+        'max_running': getattr(processor, 'max_running', None),
+    }
+
+
+async def run(args) -> list:
+    api = RecordingBotApi(args.api_latency / 1000)
+
+    import main as bot_main
+    import routing
+    from config import SUBJECT_PRICES
+    from update_processor import PerUserUpdateProcessor
+    logging.getLogger().setLevel(logging.WARNING)
+
+    application = bot_main.build_application(request=FakeRequest(api), get_updates_request=FakeRequest(api))
+    await application.initialize()
+    await bot_main.on_startup(application)
+
+    subject_a, subject_b = list(SUBJECT_PRICES)[:2]
+    messages, expected = taps(routing, subject_a, subject_b)
+    update_ids = itertools.count(1)
+    results = []
+    try:
+        for number, processor in enumerate((SimpleUpdateProcessor(args.concurrency),
+                                            PerUserUpdateProcessor(args.concurrency))):
+            users = [USER_ID_START + number * args.users + i for i in range(args.users)]
+            results.append(await run_scenario(application, processor, api, users, messages, expected, update_ids))
+    finally:
+        await bot_main.on_shutdown(application)
+        await application.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=16, help="одновременно обрабатываемых обновлений")
+    parser.add_argument('--api-latency', type=float, default=5, help="задержка вызова Bot API, мс")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.update(BOT_TOKEN='123456:LOAD-TEST', ADMIN_ID=str(ADMIN_ID))
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'Процессор':<24}{'обновлений':>11}{'сек.':>7}{'сломано':>9}{'ошибок':>8}{'неверный выбор':>16}"
+          f"{'параллельно':>13}")
+    for result in results:
+        print(f"{result['processor']:<24}{result['updates']:>11}{result['elapsed_s']:>7}{result['broken_users']:>9}"
+              f"{result['error_replies']:>8}{result['wrong_selections']:>16}{result['max_running'] or '-':>13}")
+
+    unordered, ordered = results
+    if not unordered['broken_users']:
+        print("⚠️ Гонка без упорядочивания не воспроизвелась — увеличьте --users или --api-latency")
+    if ordered['broken_users']:
+        print(f"❌ PerUserUpdateProcessor: сломано пользователей: {ordered['broken_users']}")
+        sys.exit(1)
+    print("✅ Нажатия каждого пользователя обработаны по порядку, пользователи — параллельно")
+
+
+if __name__ == '__main__':
+    main()
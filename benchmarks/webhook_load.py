@@ -0,0 +1,230 @@
+"""Нагрузочный тест бота в режиме webhook
+
+Скрипт поднимает фейковый Bot API (getMe, setWebhook, sendMessage и т.д.),
+при --spawn запускает main.py во временной папке и отправляет на webhook
+синтетические обновления от --users пользователей. Каждый пользователь
+отправляет сообщение и ждет ответа бота, поэтому задержка считается от
+отправки обновления до первого sendMessage в его чат. Запуск из корня проекта:
+    python -m benchmarks.webhook_load --spawn --users 50 --messages 20 --concurrent-updates 16
+
+Против уже запущенного бота (TELEGRAM_API_URL=http://127.0.0.1:8081/bot):
+    python -m benchmarks.webhook_load --webhook-url http://127.0.0.1:8443/telegram
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import httpx
+
+from config import SUBJECTS
+
+ADMIN_ID = 1
+USER_ID_START = 100000
+SECRET = 'load-test-secret'
+
+# Сообщения одного шага пути пользователя по меню
+JOURNEY = ['/start', '📚 Предметы', SUBJECTS[0], '💰 Цены', 'ℹ️ Гарантии', '🛒 Корзина']
+
+
+class FakeBotApi:
+    """Фейковый Bot API: отвечает на вызовы бота и сообщает о sendMessage в чаты"""
+
+    def __init__(self, port: int, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.waiters = {}
+        self.calls = 0
+        self._message_ids = itertools.count(1)
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.server.daemon_threads = True
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                method = self.path.rsplit('/', 1)[-1]
+                params = {}
+                if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+                payload = json.dumps({'ok': True, 'result': api.answer(method, params)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def answer(self, method: str, params: dict):
+        self.calls += 1
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Load', 'username': 'load_test_bot'}
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            self.loop.call_soon_threadsafe(self._delivered, chat_id, time.perf_counter())
+            return {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        return True
+
+    def _delivered(self, chat_id: int, ts: float):
+        waiter = self.waiters.pop(chat_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(ts)
+
+    def expect_reply(self, chat_id: int) -> asyncio.Future:
+        waiter = self.loop.create_future()
+        self.waiters[chat_id] = waiter
+        return waiter
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+        'from': user,
+        'text': text
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return {'update_id': update_id, 'message': message}
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def wait_for_webhook(client: httpx.AsyncClient, url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.post(url, content=b'{}')
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Webhook {url} не ответил за {timeout} сек.")
+
+
+async def run_load(args, api: FakeBotApi):
+    update_ids = itertools.count(1)
+    latencies, ingest, timeouts = [], [], 0
+    headers = {'X-Telegram-Bot-Api-Secret-Token': args.secret} if args.secret else {}
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        await wait_for_webhook(client, args.webhook_url)
+
+        async def user_session(user_id: int):
+            nonlocal timeouts
+            for step in range(args.messages):
+                update = make_update(next(update_ids), user_id, JOURNEY[step % len(JOURNEY)])
+                reply = api.expect_reply(user_id)
+
+                started = time.perf_counter()
+                response = await client.post(args.webhook_url, json=update, headers=headers)
+                ingest.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+                try:
+                    replied_at = await asyncio.wait_for(reply, timeout=args.timeout)
+                    latencies.append(replied_at - started)
+                except asyncio.TimeoutError:
+                    api.waiters.pop(user_id, None)
+                    timeouts += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user_session(USER_ID_START + i) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+    total = args.users * args.messages
+    print(f"Обновлений: {total}, пользователей: {args.users}, время: {elapsed:.2f} сек.")
+    print(f"Пропускная способность: {len(latencies) / elapsed:.1f} обновлений/сек.")
+    print(f"Задержка ответа: p50 {percentile(latencies, 0.5) * 1000:.1f} мс, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} мс, p99 {percentile(latencies, 0.99) * 1000:.1f} мс")
+    print(f"Прием webhook: p99 {percentile(ingest, 0.99) * 1000:.1f} мс")
+    print(f"Без ответа за {args.timeout} сек.: {timeouts}, вызовов Bot API: {api.calls}")
+
+
+def spawn_bot(args, workdir: str) -> subprocess.Popen:
+    """Запускает main.py в режиме webhook с фейковым Bot API и чистой базой"""
+    port = args.webhook_url.split(':')[-1].split('/')[0]
+    env = dict(
+        os.environ,
+        BOT_TOKEN='123456:LOAD-TEST',
+        ADMIN_ID=str(ADMIN_ID),
+        BOT_MODE='webhook',
+        WEBHOOK_LISTEN='127.0.0.1',
+        WEBHOOK_PORT=port,
+        WEBHOOK_PATH=args.webhook_url.rsplit('/', 1)[-1],
+        WEBHOOK_URL=args.webhook_url.rsplit('/', 1)[0],
+        WEBHOOK_SECRET=args.secret,
+        CONCURRENT_UPDATES=str(args.concurrent_updates),
+        TELEGRAM_API_URL=f'http://127.0.0.1:{args.api_port}/bot',
+        PYTHONPATH=os.getcwd(),
+    )
+    log = open(os.path.join(workdir, 'bot.log'), 'w')
+    return subprocess.Popen([sys.executable, os.path.abspath('main.py')], cwd=workdir, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--webhook-url', default='http://127.0.0.1:8443/telegram')
+    parser.add_argument('--api-port', type=int, default=8081)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--secret', default=SECRET)
+    parser.add_argument('--spawn', action='store_true', help='запустить main.py с чистой базой')
+    parser.add_argument('--concurrent-updates', type=int, default=16, help='CONCURRENT_UPDATES для --spawn')
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.api_port, asyncio.get_running_loop())
+    api.start()
+
+    bot = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.spawn:
+                bot = spawn_bot(args, workdir)
+            await run_load(args, api)
+        finally:
+            if bot is not None:
+                # SIGTERM: бот дорабатывает принятые обновления и сбрасывает буферы
+                bot.terminate()
+                bot.wait(timeout=30)
+            api.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
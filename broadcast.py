@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from config import (
+    BROADCAST_CONCURRENCY, BROADCAST_GLOBAL_RATE, BROADCAST_PER_CHAT_RATE,
+    BROADCAST_MAX_RETRIES, BROADCAST_RECORD_BATCH_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Время ожидания из RetryAfter (int или timedelta в зависимости от версии библиотеки)"""
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Запрещает выдачу токенов на seconds секунд (например, после RetryAfter)"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = max(self._updated, self._paused_until)
+
+    async def acquire(self):
+        """Ждет, пока не появится свободный токен"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BroadcastResult:
+    """Прогресс и итог рассылки"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.successful = 0
+        self.failed = 0
+        self.retries = 0
+        self.delivered = []
+        self.errors = {}
+        self.in_flight = set()
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def processed(self) -> int:
+        return self.successful + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class BroadcastEngine:
+    """Параллельная рассылка с учетом лимитов Telegram
+
+    Одновременно выполняется не больше concurrency отправок. Общий поток
+    ограничен token bucket на global_rate сообщений в секунду, отправки в
+    один чат — своим bucket на per_chat_rate, общим для всех рассылок
+    движка; bucket чата, простоявший дольше 1/per_chat_rate секунд, уже
+    полон и удаляется. После RetryAfter ставится на паузу
+    весь поток, после сетевых ошибок отправка повторяется с экспоненциальной
+    задержкой. Успешные получатели передаются в on_delivered пачками.
+    """
+
+    def __init__(self, bot, concurrency: int = BROADCAST_CONCURRENCY, global_rate: float = BROADCAST_GLOBAL_RATE,
+                 per_chat_rate: float = BROADCAST_PER_CHAT_RATE, max_retries: int = BROADCAST_MAX_RETRIES,
+                 record_batch_size: int = BROADCAST_RECORD_BATCH_SIZE, retry_backoff: float = 1.0):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        # chat_id -> (bucket, время последней отправки); порядок — по времени последней отправки
+        self._chat_buckets = OrderedDict()
+        self.max_retries = max_retries
+        self.record_batch_size = record_batch_size
+        self.retry_backoff = retry_backoff
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Bucket чата; заодно удаляет bucket чатов, в которые давно не отправляли"""
+        now = time.monotonic()
+        idle = 1 / self.per_chat_rate
+        while self._chat_buckets:
+            _, (_, used_at) = next(iter(self._chat_buckets.items()))
+            if now - used_at <= idle:
+                break
+            self._chat_buckets.popitem(last=False)
+
+        entry = self._chat_buckets.pop(chat_id, None)
+        bucket = entry[0] if entry is not None else TokenBucket(self.per_chat_rate, capacity=1)
+        self._chat_buckets[chat_id] = (bucket, now)
+        return bucket
+
+    async def _send(self, chat_id: int, text: str, result: BroadcastResult) -> Optional[str]:
+        """Отправляет одно сообщение с повторами. Возвращает текст ошибки или None при успехе"""
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                result.retries += 1
+
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                return None
+            except RetryAfter as e:
+                seconds = retry_after_seconds(e)
+                logger.warning(f"⚠️ Флуд-контроль при рассылке, пауза {seconds} сек.")
+                self.global_bucket.pause(seconds)
+                last_error = str(e)
+            except BadRequest as e:
+                # Чат не найден, сообщение некорректно — повтор не поможет
+                return str(e)
+            except NetworkError as e:
+                last_error = str(e)
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            except Exception as e:
+                # Forbidden (бот заблокирован) и прочие постоянные ошибки
+                return str(e)
+
+        return last_error
+
+    async def run(self, chat_ids: Iterable[int], text: str,
+                  on_delivered: Callable[[List[int]], Awaitable[None]] = None,
+                  on_progress: Callable[[BroadcastResult], Awaitable[None]] = None,
+                  progress_interval: float = 2.0, result: BroadcastResult = None) -> BroadcastResult:
+        """Рассылает text по chat_ids и возвращает итог
+
+        Если передан result, прогресс пишется в него: так вызывающий видит,
+        кому уже доставлено, даже если рассылку прервали.
+        """
+        chat_ids = list(chat_ids)
+        if result is None:
+            result = BroadcastResult(len(chat_ids))
+        queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        delivered = []
+
+        async def flush_delivered():
+            if delivered and on_delivered:
+                batch = delivered[:]
+                delivered.clear()
+                try:
+                    await on_delivered(batch)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка записи результатов рассылки: {e}")
+
+        async def worker():
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                result.in_flight.add(chat_id)
+                error = await self._send(chat_id, text, result)
+                result.in_flight.discard(chat_id)
+
+                if error is None:
+                    result.successful += 1
+                    result.delivered.append(chat_id)
+                    delivered.append(chat_id)
+                    if len(delivered) >= self.record_batch_size:
+                        await flush_delivered()
+                else:
+                    result.failed += 1
+                    result.errors[chat_id] = error
+                    logger.error(f"Ошибка рассылки пользователю {chat_id}: {error}")
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(progress_interval)
+                try:
+                    await on_progress(result)
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось обновить прогресс рассылки: {e}")
+
+        progress_task = asyncio.create_task(reporter()) if on_progress else None
+        try:
+            workers = min(self.concurrency, len(chat_ids))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            await flush_delivered()
+        finally:
+            if progress_task:
+                progress_task.cancel()
+
+        result.finished_at = time.monotonic()
+        return result
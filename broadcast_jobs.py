@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import List
+
+from async_db import adb
+from broadcast import BroadcastEngine, BroadcastResult
+from config import BROADCAST_CHUNK_SIZE, BROADCAST_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_PREFIX = "📢 Сообщение от поддержки:\n\n"
+
+
+class BroadcastWorker:
+    """Фоновый исполнитель заданий рассылки
+
+    Задания и состояние доставки каждому получателю хранятся в базе.
+    Получатели берутся пачками по курсору: перед отправкой пачка помечается
+    как 'sending', после — 'sent'/'failed'. После перезапуска бота незавершенные
+    задания продолжаются с курсора, а получатели, отправка которым прервалась,
+    помечаются 'unknown' и повторно не получают сообщение. Сообщение с
+    прогрессом обновляется каждые progress_interval секунд и во время пачки.
+    """
+
+    def __init__(self, chunk_size: int = BROADCAST_CHUNK_SIZE,
+                 progress_interval: float = BROADCAST_PROGRESS_INTERVAL):
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self.engine = None
+        self._jobs = asyncio.Queue()
+        self._task = None
+
+    async def start(self, bot):
+        """Запускает исполнитель и ставит в очередь незавершенные задания"""
+        self.engine = BroadcastEngine(bot)
+
+        for job in await adb.get_unfinished_broadcast_jobs():
+            lost = await adb.recover_broadcast_job(job['job_id'])
+            logger.info(f"🔄 Возобновляем рассылку #{job['job_id']}, неизвестный статус доставки: {lost}")
+            self._jobs.put_nowait(job)
+
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Останавливает исполнитель. Прерванное задание продолжится после перезапуска"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, admin_id: int, text: str, user_ids: List[int], status_message=None) -> int:
+        """Создает задание рассылки и ставит его в очередь"""
+        job_id = await adb.create_broadcast_job(admin_id, text, user_ids)
+        if not job_id:
+            return 0
+
+        job = {'job_id': job_id, 'text': text, 'total': len(user_ids),
+               'status_chat_id': None, 'status_message_id': None}
+        if status_message is not None:
+            job['status_chat_id'] = status_message.chat_id
+            job['status_message_id'] = status_message.message_id
+            await adb.set_broadcast_status_message(job_id, status_message.chat_id, status_message.message_id)
+
+        self._jobs.put_nowait(job)
+        return job_id
+
+    async def _run(self):
+        while True:
+            job = await self._jobs.get()
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка выполнения рассылки #{job['job_id']}: {e}")
+
+    async def _process(self, job):
+        job_id = job['job_id']
+        text = BROADCAST_PREFIX + job['text']
+        activity = ("broadcast", job['text'], "Рассылка")
+
+        while True:
+            chunk = await adb.claim_broadcast_recipients(job_id, self.chunk_size)
+            if not chunk:
+                break
+
+            result = BroadcastResult(len(chunk))
+
+            async def on_progress(current: BroadcastResult):
+                await self._report(job, done=False, current=current)
+
+            try:
+                await self.engine.run(chunk, text, on_progress=on_progress,
+                                      progress_interval=self.progress_interval, result=result)
+            finally:
+                # Даже при остановке записываем, кому успели отправить. Получатели, которым
+                # отправка не начиналась, возвращаются в очередь; "в полете" остаются 'sending'
+                done = set(result.delivered) | set(result.errors) | result.in_flight
+                released = [user_id for user_id in chunk if user_id not in done]
+                await asyncio.shield(adb.complete_broadcast_recipients(
+                    job_id, result.delivered, result.errors, released, activity
+                ))
+
+            await self._report(job, done=False)
+
+        await adb.finish_broadcast_job(job_id)
+        await self._report(job, done=True)
+        logger.info(f"✅ Рассылка #{job_id} завершена")
+
+    async def _report(self, job, done: bool, current: BroadcastResult = None):
+        """Обновляет сообщение с прогрессом рассылки; current — итог пачки, которая еще отправляется"""
+        if not job.get('status_chat_id') or not job.get('status_message_id'):
+            return
+
+        stats = await adb.get_broadcast_job_stats(job['job_id'])
+        sent = stats.get('sent', 0)
+        failed = stats.get('failed', 0)
+        if current is not None:
+            # Получатели текущей пачки в базе еще 'sending' — берем их из итога пачки
+            sent += current.successful
+            failed += current.failed
+        unknown = stats.get('unknown', 0)
+        title = "завершена" if done else "выполняется"
+
+        text = (f"📢 Рассылка #{job['job_id']} {title}: {sent + failed + unknown}/{job['total']}\n\n"
+                f"✅ Успешно: {sent}\n❌ Неудачно: {failed}")
+        if unknown:
+            text += f"\n❔ Статус неизвестен (прервано перезапуском): {unknown}"
+        if text == job.get('status_text'):
+            # Telegram отвечает ошибкой на редактирование без изменений
+            return
+
+        try:
+            await self.engine.bot.edit_message_text(
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id'],
+                text=text
+            )
+            job['status_text'] = text
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось обновить прогресс рассылки #{job['job_id']}: {e}")
+
+
+# Глобальный исполнитель рассылок
+broadcast_worker = BroadcastWorker()
@@ -1,18 +1,24 @@
+import argparse
+import json
 import sqlite3
 import os
+import time
 
+from config import ORDER_STATUSES, ORDERS_PAGE_SIZE, STATS_PERIOD_DAYS, DB_SLOW_QUERY_MS, DB_PROFILE_TOP
+from query_profiler import QueryProfiler, format_report
 
-def check_database_state():
+
+def check_database_state(db_file='bot_database.db'):
     print("🔍 Проверяем состояние базы данных...")
 
     # Проверяем существует ли файл
-    if not os.path.exists('bot_database.db'):
-        print("❌ Файл bot_database.db не существует!")
+    if not os.path.exists(db_file):
+        print(f"❌ Файл {db_file} не существует!")
         return
 
-    print(f"✅ Файл базы данных существует: {os.path.getsize('bot_database.db')} байт")
+    print(f"✅ Файл базы данных существует: {os.path.getsize(db_file)} байт")
 
-    conn = sqlite3.connect('bot_database.db')
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
 
     try:
@@ -21,14 +27,14 @@ def check_database_state():
         orders_count = cursor.fetchone()[0]
         print(f"📦 Заказов в таблице: {orders_count}")
 
-        # Показываем все заказы
-        cursor.execute('SELECT order_id, user_id, subject, topic FROM orders')
+        # Показываем последние заказы
+        cursor.execute('SELECT order_id, user_id, subject, variant, status FROM orders ORDER BY order_id DESC LIMIT 20')
         orders = cursor.fetchall()
 
         if orders:
-            print("\n📋 Список заказов:")
+            print("\n📋 Последние заказы:")
             for order in orders:
-                print(f"   #{order[0]} - User:{order[1]} - {order[2]} - {order[3]}")
+                print(f"   #{order[0]} - User:{order[1]} - {order[2]} - вариант {order[3]} - {order[4]}")
         else:
             print("✅ Заказов нет - таблица пуста")
 
@@ -46,5 +52,70 @@ def check_database_state():
         conn.close()
 
 
+def profile_database(db_file='bot_database.db', repeat=5, top=10, output=None):
+    """Прогоняет основные запросы бота под профилировщиком и печатает отчет"""
+    if not os.path.exists(db_file):
+        print(f"❌ Файл {db_file} не существует!")
+        return
+
+    # Database применяет недостающие миграции, как при запуске бота
+    from database import Database
+    profiler = QueryProfiler(slow_ms=DB_SLOW_QUERY_MS, top_n=max(top, DB_PROFILE_TOP))
+    database = Database(db_file, profiler=profiler)
+    profiler.reset()
+
+    workload = [
+        ('get_active_users', lambda: database.get_active_users(24)),
+        ('get_orders (все)', lambda: database.get_orders('all')),
+        ('get_orders (страница)', lambda: database.get_orders('all', limit=ORDERS_PAGE_SIZE)),
+        *[(f'get_orders ({status}, страница)', lambda status=status: database.get_orders(status, limit=ORDERS_PAGE_SIZE))
+          for status in ORDER_STATUSES],
+        ('get_user_stats', lambda: database.get_user_stats()),
+        ('get_activity_summary', lambda: database.get_activity_summary(STATS_PERIOD_DAYS)),
+    ]
+
+    print(f"⏱ Прогон основных запросов по {db_file}, повторов: {repeat}\n")
+    print(f"{'Вызов':<36}{'среднее, мс':>12}{'макс., мс':>11}")
+    try:
+        for name, call in workload:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name:<36}{sum(timings) / len(timings):>12.2f}{max(timings):>11.2f}")
+    finally:
+        database.close()
+
+    report = profiler.report()
+    print()
+    print(format_report(report, top))
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Отчет сохранен в {output}")
+
+
+def print_saved_report(path, top=10):
+    """Печатает отчет профилировщика, сохраненный ботом (DB_PROFILE_FILE)"""
+    with open(path, encoding='utf-8') as f:
+        print(format_report(json.load(f), top))
+
+
 if __name__ == '__main__':
-    check_database_state()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Проверка базы данных и профиль запросов")
+    parser.add_argument('db_file', nargs='?', default='bot_database.db')
+    parser.add_argument('--profile', action='store_true', help="прогнать основные запросы под профилировщиком")
+    parser.add_argument('--repeat', type=int, default=5, help="повторов каждого запроса при --profile")
+    parser.add_argument('--top', type=int, default=10, help="строк в разделах отчета")
+    parser.add_argument('--output', help="сохранить отчет --profile в JSON")
+    parser.add_argument('--report', help="вывести отчет, сохраненный ботом в DB_PROFILE_FILE")
+    args = parser.parse_args()
+
+    if args.report:
+        print_saved_report(args.report, args.top)
+    elif args.profile:
+        profile_database(args.db_file, args.repeat, args.top, args.output)
+    else:
+        check_database_state(args.db_file)
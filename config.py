@@ -6,6 +6,129 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_ID = int(os.getenv('ADMIN_ID', 0))
 
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Webhook: адрес, на котором слушает бот, и публичный URL, который регистрируется в Telegram
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+# Сколько обновлений обрабатывается одновременно (1 — строго по очереди)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', 1))
+# При CONCURRENT_UPDATES > 1 обновления одного пользователя все равно идут по очереди,
+# параллельно — только разных пользователей (0 — без упорядочивания, как в PTB)
+UPDATE_PER_USER_ORDER = os.getenv('UPDATE_PER_USER_ORDER', '1') == '1'
+# Сколько принятых обновлений может одновременно ждать обработки
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', 1000))
+# Адрес Bot API; переопределяется для нагрузочного теста с фейковым сервером
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+
+# Потоки чтения асинхронного доступа к базе
+DB_READ_WORKERS = int(os.getenv('DB_READ_WORKERS', 5))
+# Отдельные потоки для отчетов админа (/funnel, /export), чтобы их полные проходы
+# по таблицам не занимали потоки чтения пользовательских обработчиков
+DB_REPORT_WORKERS = int(os.getenv('DB_REPORT_WORKERS', 1))
+
+# Пул соединений с базой данных: по соединению на каждый поток чтения, поток отчетов
+# и поток-писатель
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', DB_READ_WORKERS + DB_REPORT_WORKERS + 1))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 128))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_HEALTH_CHECK_INTERVAL', 30))
+
+# Режим журнала и настройки SQLite для каждого соединения
+DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))
+
+# Асинхронный доступ к базе: лимиты очередей
+DB_READ_QUEUE_SIZE = int(os.getenv('DB_READ_QUEUE_SIZE', 100))
+DB_WRITE_QUEUE_SIZE = int(os.getenv('DB_WRITE_QUEUE_SIZE', 1000))
+
+# Отложенная запись активностей пользователей
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', 200))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 2))
+ACTIVITY_MAX_PENDING = int(os.getenv('ACTIVITY_MAX_PENDING', 50000))
+
+# Сколько профилей пользователей держать в памяти, чтобы не перезаписывать неизменившиеся
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 100000))
+
+# Окно индекса активных пользователей в памяти, часов
+ACTIVE_USERS_WINDOW_HOURS = int(os.getenv('ACTIVE_USERS_WINDOW_HOURS', 24))
+
+# Рассылка: параллельность и лимиты Telegram (около 30 сообщений в секунду, 1 в секунду на чат)
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', 20))
+BROADCAST_GLOBAL_RATE = float(os.getenv('BROADCAST_GLOBAL_RATE', 25))
+BROADCAST_PER_CHAT_RATE = float(os.getenv('BROADCAST_PER_CHAT_RATE', 1))
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', 3))
+BROADCAST_RECORD_BATCH_SIZE = int(os.getenv('BROADCAST_RECORD_BATCH_SIZE', 200))
+BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', 100))
+# Как часто (сек.) обновлять сообщение с прогрессом рассылки, пока отправляется пачка
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', 3))
+
+# Уведомления админа о переписке: окно объединения сообщений одного пользователя (сек.),
+# максимум сообщений в сводке, лимит сводок в очереди и сообщений в секунду в чат админа
+ADMIN_NOTIFY_DIGEST_WINDOW = float(os.getenv('ADMIN_NOTIFY_DIGEST_WINDOW', 3))
+ADMIN_NOTIFY_MAX_BATCH = int(os.getenv('ADMIN_NOTIFY_MAX_BATCH', 10))
+ADMIN_NOTIFY_MAX_PENDING = int(os.getenv('ADMIN_NOTIFY_MAX_PENDING', 1000))
+ADMIN_NOTIFY_RATE = float(os.getenv('ADMIN_NOTIFY_RATE', 1))
+ADMIN_NOTIFY_MAX_RETRIES = int(os.getenv('ADMIN_NOTIFY_MAX_RETRIES', 3))
+# Сколько секунд при остановке бота досылать оставшиеся сводки; остальные отбрасываются
+ADMIN_NOTIFY_DRAIN_TIMEOUT = float(os.getenv('ADMIN_NOTIFY_DRAIN_TIMEOUT', 5))
+
+# Сколько инлайн-клавиатур с параметрами (действия с заказом, быстрый ответ) держать в кэше
+KEYBOARD_CACHE_SIZE = int(os.getenv('KEYBOARD_CACHE_SIZE', 1024))
+
+# Количество заказов на одной странице списка в админ-панели
+ORDERS_PAGE_SIZE = int(os.getenv('ORDERS_PAGE_SIZE', 5))
+
+# Хранилище состояний диалогов: memory (в памяти процесса) или sqlite (переживает перезапуск)
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+# Кэш в памяти поверх sqlite; отключайте, если бот запущен в нескольких процессах
+STATE_CACHE = os.getenv('STATE_CACHE', '1') == '1'
+# Время жизни состояния, секунд (0 — без ограничения)
+STATE_TTL = int(os.getenv('STATE_TTL', 86400))
+STATE_MAX_ENTRIES = int(os.getenv('STATE_MAX_ENTRIES', 10000))
+
+# Хранение журнала активностей: сырые записи старше ACTIVITY_RETENTION_DAYS дней сворачиваются
+# в дневные итоги по пользователю и типу действия и удаляются безвозвратно, если не задан
+# ACTIVITY_ARCHIVE_DB (по умолчанию 0 — хранить без ограничения, свертка выключена)
+ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', 0))
+# Строк в одной транзакции очистки и пауза между пачками (сек.), чтобы не держать блокировку записи
+RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', 2000))
+RETENTION_CHUNK_PAUSE = float(os.getenv('RETENTION_CHUNK_PAUSE', 0.05))
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', 6))
+# Файл SQLite, куда сырые записи копируются перед удалением (пусто — без архива)
+ACTIVITY_ARCHIVE_DB = os.getenv('ACTIVITY_ARCHIVE_DB', '')
+# Период сводки активности в /stats, дней
+STATS_PERIOD_DAYS = int(os.getenv('STATS_PERIOD_DAYS', 30))
+
+# Аналитика воронки: строк журнала в одной пачке чтения и период отчета по умолчанию, дней
+ANALYTICS_CHUNK_SIZE = int(os.getenv('ANALYTICS_CHUNK_SIZE', 5000))
+ANALYTICS_DEFAULT_DAYS = int(os.getenv('ANALYTICS_DEFAULT_DAYS', 30))
+
+# Выгрузка данных: строк в одной пачке чтения, каталог временных файлов (пусто — системный),
+# предельный размер файла для отправки документом (МБ) и таймаут загрузки (сек.)
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+EXPORT_DIR = os.getenv('EXPORT_DIR', '')
+EXPORT_MAX_UPLOAD_MB = int(os.getenv('EXPORT_MAX_UPLOAD_MB', 50))
+EXPORT_UPLOAD_TIMEOUT = float(os.getenv('EXPORT_UPLOAD_TIMEOUT', 120))
+
+# Метрики Prometheus: задержки обработчиков, вызовы базы и Bot API (1 — включить; выключенные ничего не стоят).
+# Отдаются по HTTP на METRICS_LISTEN:METRICS_PORT/metrics (порт 0 — только команда /metrics у админа)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '0') == '1'
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+
+# Профилирование запросов Database (1 — включить): время каждого оператора, DB_PROFILE_TOP самых
+# медленных с параметрами и планом, предупреждение в лог дольше DB_SLOW_QUERY_MS; отчет сохраняется
+# при остановке в DB_PROFILE_FILE (пусто — не сохранять) и выводится check_db.py --report
+DB_PROFILE = os.getenv('DB_PROFILE', '0') == '1'
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 100))
+DB_PROFILE_TOP = int(os.getenv('DB_PROFILE_TOP', 20))
+DB_PROFILE_FILE = os.getenv('DB_PROFILE_FILE', '')
+
 # Предметы
 SUBJECTS = [
     '🏠 Архитектура',
@@ -61,7 +184,3 @@ ORDER_STATUSES = {
     'delivered': '📦 Передан клиенту',
     'paid': '💰 Оплачен'
 }
-
-# Состояния админа и пользователей
-admin_states = {}
-user_states = {}
\ No newline at end of file
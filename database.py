@@ -1,26 +1,61 @@
 import sqlite3
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, Iterator
+
+from config import (
+    DB_POOL_SIZE, DB_STATEMENT_CACHE_SIZE, DB_HEALTH_CHECK_INTERVAL,
+    DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB, DB_PROFILE
+)
+from db_pool import ConnectionPool
+from migrations import apply_migrations
+from query_profiler import QueryProfiler, query_profiler
+
+# Настройки, которые применяются к каждому соединению пула
+CONNECTION_PRAGMAS = [
+    f'synchronous = {DB_SYNCHRONOUS}',
+    f'cache_size = -{DB_CACHE_SIZE_KB}',
+    'temp_store = MEMORY',
+]
 
 logger = logging.getLogger(__name__)
 
 
 class Database:
-    def __init__(self, db_file='bot_database.db'):
+    def __init__(self, db_file='bot_database.db', pool_size: int = DB_POOL_SIZE,
+                 statement_cache_size: int = DB_STATEMENT_CACHE_SIZE,
+                 health_check_interval: float = DB_HEALTH_CHECK_INTERVAL,
+                 profiler: QueryProfiler = None):
         self.db_file = db_file
+        self.pool = ConnectionPool(
+            db_file,
+            size=pool_size,
+            statement_cache_size=statement_cache_size,
+            health_check_interval=health_check_interval,
+            pragmas=CONNECTION_PRAGMAS,
+            profiler=profiler
+        )
         self.init_db()
 
     def get_connection(self):
-        """Возвращает соединение с базой данных"""
-        conn = sqlite3.connect(self.db_file)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Возвращает соединение из пула. close() возвращает его обратно в пул
+
+        Методы берут соединение внутри try: PoolTimeoutError пишется в лог и
+        обрабатывается так же, как другие ошибки базы.
+        """
+        return self.pool.acquire()
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        self.pool.close()
 
     def init_db(self):
         """Инициализация базы данных"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # Режим журнала хранится в самом файле базы, достаточно выставить его один раз
+        cursor.execute(f'PRAGMA journal_mode = {DB_JOURNAL_MODE}')
+
         # Таблица пользователей
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -77,32 +112,44 @@ class Database:
         ''')
 
         conn.commit()
-        conn.close()
-        logger.info("✅ База данных инициализирована с обновленной структурой")
 
-    def save_user(self, user_id: int, first_name: str, username: str = None):
-        """Сохраняет или обновляет пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            version = apply_migrations(conn)
+        finally:
+            conn.close()
+        logger.info(f"✅ База данных инициализирована с обновленной структурой (версия схемы {version})")
 
+    def save_user(self, user_id: int, first_name: str, username: str = None) -> bool:
+        """Сохраняет или обновляет пользователя, не трогая дату регистрации"""
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
-                INSERT OR REPLACE INTO users (user_id, first_name, username, last_seen)
+                INSERT INTO users (user_id, first_name, username, last_seen)
                 VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    first_name = excluded.first_name,
+                    username = excluded.username,
+                    last_seen = excluded.last_seen
             ''', (user_id, first_name, username))
             conn.commit()
+            return True
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения пользователя {user_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
+            return False
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     def save_user_activity(self, user_id: int, activity_type: str, message_text: str = None, bot_response: str = None):
         """Сохраняет активность пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO user_activities (user_id, activity_type, message_text, bot_response)
                 VALUES (?, ?, ?, ?)
@@ -115,17 +162,58 @@ class Database:
             conn.commit()
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения активности пользователя {user_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
+
+    def save_user_activities(self, activities: List[tuple], seen: Dict[int, str] = None) -> bool:
+        """Сохраняет пачку активностей одной транзакцией
+
+        Каждая активность — кортеж (user_id, activity_type, message_text, bot_response, created_at).
+        seen — время последнего появления пользователей без записанной активности.
+        """
+        if not activities and not seen:
+            return True
+
+        # Для каждого пользователя достаточно одного обновления last_seen — самым поздним временем
+        last_seen = dict(seen or {})
+        for user_id, _, _, _, created_at in activities:
+            if created_at > last_seen.get(user_id, ''):
+                last_seen[user_id] = created_at
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO user_activities (user_id, activity_type, message_text, bot_response, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', activities)
+
+            cursor.executemany('''
+                UPDATE users SET last_seen = ? WHERE user_id = ?
+            ''', [(seen, user_id) for user_id, seen in last_seen.items()])
+
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного сохранения активностей ({len(activities)} шт.): {e}")
+            if conn is not None:
+                conn.rollback()
+            return False
+        finally:
+            if conn is not None:
+                conn.close()
 
     def save_user_selection(self, user_id: int, subject: str = None, variant: str = None,
                             package: str = None, price: int = None):
         """Сохраняет выбор пользователя (обновленная версия)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('SELECT user_id FROM user_selections WHERE user_id = ?', (user_id,))
             exists = cursor.fetchone()
 
@@ -160,16 +248,18 @@ class Database:
             conn.commit()
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения выбора пользователя {user_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     def get_user_selection(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получает выбор пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
                 SELECT subject, variant, package, price 
                 FROM user_selections 
@@ -185,29 +275,35 @@ class Database:
                     'price': result['price']
                 }
             return None
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения выбора пользователя {user_id}: {e}")
+            return None
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     def delete_user_selection(self, user_id: int):
         """Удаляет выбор пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('DELETE FROM user_selections WHERE user_id = ?', (user_id,))
             conn.commit()
         except Exception as e:
             logger.error(f"❌ Ошибка удаления выбора пользователя {user_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     def create_order(self, user_id: int, subject: str, variant: str, package: str, price: int) -> int:
         """Создает новый заказ (обновленная версия)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO orders (user_id, subject, variant, package, price)
                 VALUES (?, ?, ?, ?, ?)
@@ -218,64 +314,108 @@ class Database:
             return order_id
         except Exception as e:
             logger.error(f"❌ Ошибка создания заказа для пользователя {user_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
             return 0
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
-    def get_orders(self, status_filter: str = "all") -> List[Dict[str, Any]]:
-        """Получает заказы с фильтром по статусу"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_orders(self, status_filter: str = "all", limit: int = None,
+                   after: Tuple[str, int] = None, before: Tuple[str, int] = None) -> List[Dict[str, Any]]:
+        """Получает заказы с фильтром по статусу
 
+        Для постраничного просмотра используется keyset-пагинация по (created_at, order_id):
+        after — заказы строго после этой пары, before — строго перед ней. Заказы всегда
+        возвращаются в порядке возрастания created_at.
+        """
+        conn = None
         try:
-            if status_filter == "all":
-                cursor.execute('''
-                    SELECT o.*, u.first_name, u.username 
-                    FROM orders o
-                    JOIN users u ON o.user_id = u.user_id
-                    ORDER BY o.created_at ASC
-                ''')
-            else:
-                cursor.execute('''
-                    SELECT o.*, u.first_name, u.username 
-                    FROM orders o
-                    JOIN users u ON o.user_id = u.user_id
-                    WHERE o.status = ?
-                    ORDER BY o.created_at ASC
-                ''', (status_filter,))
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            conditions = []
+            params = []
 
-            results = cursor.fetchall()
-            orders = []
+            if status_filter != "all":
+                conditions.append('o.status = ?')
+                params.append(status_filter)
+            if after is not None:
+                conditions.append('(o.created_at, o.order_id) > (?, ?)')
+                params.extend(after)
+            if before is not None:
+                conditions.append('(o.created_at, o.order_id) < (?, ?)')
+                params.extend(before)
 
-            for row in results:
-                orders.append({
-                    'order_id': row['order_id'],
-                    'user_id': row['user_id'],
-                    'first_name': row['first_name'],
-                    'username': row['username'],
-                    'subject': row['subject'],
-                    'variant': row['variant'],
-                    'package': row['package'],
-                    'price': row['price'],
-                    'status': row['status'],
-                    'admin_comment': row['admin_comment'],
-                    'created_at': row['created_at']
-                })
-
-            return orders
+            # Страницу "назад" выбираем в обратном порядке от курсора и разворачиваем
+            direction = 'DESC' if before is not None else 'ASC'
+            query = f'''
+                SELECT o.*, u.first_name, u.username
+                FROM orders o
+                JOIN users u ON o.user_id = u.user_id
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY o.created_at {direction}, o.order_id {direction}
+            '''
+            if limit is not None:
+                query += ' LIMIT ?'
+                params.append(limit)
+
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            if before is not None:
+                rows.reverse()
+
+            return [self._order_from_row(row) for row in rows]
         except Exception as e:
             logger.error(f"❌ Ошибка получения заказов: {e}")
             return []
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
+
+    @staticmethod
+    def _order_from_row(row) -> Dict[str, Any]:
+        return {
+            'order_id': row['order_id'],
+            'user_id': row['user_id'],
+            'first_name': row['first_name'],
+            'username': row['username'],
+            'subject': row['subject'],
+            'variant': row['variant'],
+            'package': row['package'],
+            'price': row['price'],
+            'status': row['status'],
+            'admin_comment': row['admin_comment'],
+            'created_at': row['created_at']
+        }
+
+    def get_order(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """Получает один заказ по номеру"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT o.*, u.first_name, u.username
+                FROM orders o
+                JOIN users u ON o.user_id = u.user_id
+                WHERE o.order_id = ?
+            ''', (order_id,))
+
+            row = cursor.fetchone()
+            return self._order_from_row(row) if row else None
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения заказа {order_id}: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
 
     def update_order_status(self, order_id: int, new_status: str) -> bool:
         """Обновляет статус заказа"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
                 UPDATE orders 
                 SET status = ?, updated_at = CURRENT_TIMESTAMP 
@@ -286,17 +426,58 @@ class Database:
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"❌ Ошибка обновления статуса заказа {order_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
             return False
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
+
+    def update_order_status_returning(self, order_id: int, new_status: str) -> Optional[Dict[str, Any]]:
+        """Обновляет статус заказа и возвращает обновленный заказ одной транзакцией
+
+        Возвращает None, если заказа нет.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                UPDATE orders
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE order_id = ?
+            ''', (new_status, order_id))
+
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return None
+
+            cursor.execute('''
+                SELECT o.*, u.first_name, u.username
+                FROM orders o
+                LEFT JOIN users u ON o.user_id = u.user_id
+                WHERE o.order_id = ?
+            ''', (order_id,))
+            row = cursor.fetchone()
+
+            conn.commit()
+            return self._order_from_row(row)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления статуса заказа {order_id}: {e}")
+            if conn is not None:
+                conn.rollback()
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
 
     def update_order_comment(self, order_id: int, comment: str) -> bool:
         """Обновляет комментарий к заказу"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
                 UPDATE orders 
                 SET admin_comment = ?, updated_at = CURRENT_TIMESTAMP 
@@ -307,33 +488,37 @@ class Database:
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"❌ Ошибка обновления комментария заказа {order_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
             return False
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     def delete_order(self, order_id: int) -> bool:
         """Удаляет заказ"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('DELETE FROM orders WHERE order_id = ?', (order_id,))
             conn.commit()
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"❌ Ошибка удаления заказа {order_id}: {e}")
-            conn.rollback()
+            if conn is not None:
+                conn.rollback()
             return False
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     def get_active_users(self, hours: int = 24) -> Dict[int, Dict[str, Any]]:
         """Получает активных пользователей"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        conn = None
         try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
             cursor.execute('''
                 SELECT 
                     u.user_id, 
@@ -368,38 +553,577 @@ class Database:
             logger.error(f"❌ Ошибка получения активных пользователей: {e}")
             return {}
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
-    def get_user_stats(self) -> Dict[str, Any]:
-        """Получает статистику пользователей"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_active_user(self, user_id: int, hours: int = 24) -> Optional[Dict[str, Any]]:
+        """Получает пользователя, если он был активен за последние hours часов"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT u.first_name, u.username, ua.activity_type, ua.message_text, ua.created_at
+                FROM user_activities ua
+                JOIN users u ON u.user_id = ua.user_id
+                WHERE ua.user_id = ? AND ua.created_at > datetime('now', ?)
+                ORDER BY ua.created_at DESC
+                LIMIT 1
+            ''', (user_id, f'-{hours} hours'))
+
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            return {
+                'first_name': row['first_name'],
+                'username': row['username'],
+                'last_activity': row['message_text'] or row['activity_type'] or 'Нет данных',
+                'last_activity_time': row['created_at']
+            }
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения активного пользователя {user_id}: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
 
+    def get_user_stats(self, days: int = 7) -> Dict[str, Any]:
+        """Получает статистику из счетчиков, которые обновляют триггеры (без обхода журнала)"""
+        empty_day = {'active_users': 0, 'actions': 0, 'new_users': 0, 'orders': 0, 'revenue': 0}
+        totals = ('actions', 'new_users', 'orders', 'revenue')
+
+        conn = None
         try:
-            cursor.execute('SELECT COUNT(*) as total_users FROM users')
-            total_users = cursor.fetchone()['total_users']
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM stats_counters WHERE name = 'users'")
+            row = cursor.fetchone()
+            total_users = row['value'] if row else 0
 
             cursor.execute('''
-                SELECT COUNT(DISTINCT user_id) as active_today 
-                FROM user_activities 
-                WHERE created_at > datetime('now', '-24 hours')
-            ''')
-            active_today = cursor.fetchone()['active_today']
+                SELECT * FROM stats_daily
+                WHERE day >= date('now', ?)
+                ORDER BY day DESC
+            ''', (f'-{max(days, 2) - 1} days',))
+            daily = {row['day']: {key: row[key] for key in empty_day} for row in cursor.fetchall()}
 
-            cursor.execute('SELECT COUNT(*) as current_orders FROM orders')
-            current_orders = cursor.fetchone()['current_orders']
+            cursor.execute("SELECT date('now') as today, date('now', '-1 day') as yesterday")
+            row = cursor.fetchone()
+            today = daily.get(row['today'], empty_day)
+            yesterday = daily.get(row['yesterday'], empty_day)
+
+            cursor.execute('SELECT subject, package, status, orders, revenue FROM order_stats WHERE orders > 0')
+            orders_by_status = {}
+            revenue_by_subject = {}
+            revenue_by_package = {}
+            for row in cursor.fetchall():
+                orders_by_status[row['status']] = orders_by_status.get(row['status'], 0) + row['orders']
+                for breakdown, key in ((revenue_by_subject, row['subject']), (revenue_by_package, row['package'])):
+                    orders, revenue = breakdown.get(key, (0, 0))
+                    breakdown[key] = (orders + row['orders'], revenue + row['revenue'])
 
             return {
                 'total_users': total_users,
-                'active_today': active_today,
-                'current_orders': current_orders
+                'active_today': today['active_users'],
+                'current_orders': sum(orders_by_status.values()),
+                'today': today,
+                'yesterday': yesterday,
+                'days': days,
+                'period': {key: sum(day[key] for day in daily.values()) for key in totals},
+                'orders_by_status': orders_by_status,
+                'revenue_by_subject': revenue_by_subject,
+                'revenue_by_package': revenue_by_package,
+                'revenue_total': sum(revenue for _, revenue in revenue_by_subject.values()),
             }
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики: {e}")
-            return {'total_users': 0, 'active_today': 0, 'current_orders': 0}
+            return {
+                'total_users': 0, 'active_today': 0, 'current_orders': 0,
+                'today': empty_day, 'yesterday': empty_day, 'days': days,
+                'period': {key: 0 for key in totals},
+                'orders_by_status': {}, 'revenue_by_subject': {}, 'revenue_by_package': {}, 'revenue_total': 0,
+            }
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_activity_summary(self, days: int = 30) -> Dict[str, Any]:
+        """Сводка активности за последние days дней: дневные итоги плюс еще не свернутые записи"""
+        since = f'-{max(days, 1) - 1} days'
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            # Каждая запись лежит либо в итогах, либо в журнале: свертка переносит ее одной транзакцией
+            cursor.execute('''
+                SELECT activity_type, SUM(count) as count FROM (
+                    SELECT activity_type, SUM(count) as count FROM activity_daily
+                    WHERE day >= date('now', ?)
+                    GROUP BY activity_type
+                    UNION ALL
+                    SELECT COALESCE(activity_type, ''), COUNT(*) FROM user_activities
+                    WHERE created_at >= date('now', ?)
+                    GROUP BY activity_type
+                )
+                GROUP BY activity_type
+                ORDER BY count DESC
+            ''', (since, since))
+            by_type = {row['activity_type']: row['count'] for row in cursor.fetchall()}
+
+            cursor.execute('''
+                SELECT COUNT(*) as users FROM (
+                    SELECT user_id FROM activity_daily WHERE day >= date('now', ?)
+                    UNION
+                    SELECT user_id FROM user_activities WHERE created_at >= date('now', ?)
+                )
+            ''', (since, since))
+            users = cursor.fetchone()['users']
+
+            return {'days': days, 'actions': sum(by_type.values()), 'users': users, 'by_type': by_type}
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения сводки активности: {e}")
+            return {'days': days, 'actions': 0, 'users': 0, 'by_type': {}}
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_activity_id_range(self, start: str, end: str) -> Tuple[Optional[int], Optional[int]]:
+        """Границы id записей журнала с created_at в [start, end) — по индексу, без чтения строк"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MIN(id) as first_id, MAX(id) as last_id FROM user_activities
+                WHERE created_at >= ? AND created_at < ?
+            ''', (start, end))
+            row = cursor.fetchone()
+            return row['first_id'], row['last_id']
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения диапазона журнала: {e}")
+            return None, None
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_activities_chunk(self, activity_types: List[str], start: str, end: str,
+                             after_id: int, last_id: int, limit: int) -> List[Tuple[int, int, str]]:
+        """Пачка (id, user_id, activity_type) журнала в порядке id после after_id (keyset-проход)"""
+        placeholders = ', '.join('?' * len(activity_types))
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            # +created_at: обход по первичному ключу, а не по индексу времени с сортировкой
+            cursor.execute(f'''
+                SELECT id, user_id, activity_type FROM user_activities
+                WHERE id > ? AND id <= ?
+                  AND +created_at >= ? AND +created_at < ?
+                  AND activity_type IN ({placeholders})
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, last_id, start, end, *activity_types, limit))
+            return [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения журнала активностей: {e}")
+            return []
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_activity_daily_chunk(self, activity_types: List[str], date_to: str,
+                                 after: Tuple[str, int, str], limit: int) -> List[Tuple[str, int, str, int]]:
+        """Пачка дневных итогов (day, user_id, activity_type, count) до date_to после ключа after"""
+        placeholders = ', '.join('?' * len(activity_types))
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT day, user_id, activity_type, count FROM activity_daily
+                WHERE (day, user_id, activity_type) > (?, ?, ?)
+                  AND day < ?
+                  AND activity_type IN ({placeholders})
+                ORDER BY day, user_id, activity_type
+                LIMIT ?
+            ''', (*after, date_to, *activity_types, limit))
+            return [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения дневных итогов: {e}")
+            return []
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_revenue_breakdown(self, start: str, end: str) -> List[Dict[str, Any]]:
+        """Заказы и выручка по предмету и тарифу за [start, end)"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT subject, package, COUNT(*) as orders, SUM(price) as revenue
+                FROM orders
+                WHERE created_at >= ? AND created_at < ?
+                GROUP BY subject, package
+                ORDER BY revenue DESC
+            ''', (start, end))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения выручки: {e}")
+            return []
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def stream_query(self, sql: str, params: Tuple = (), batch_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+        """Отдает результат запроса пачками fetchmany, не загружая его в память целиком
+
+        Соединение занято, пока генератор не исчерпан или не закрыт.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
         finally:
+            cursor.close()
             conn.close()
 
+    def prune_daily_active_users(self, before_day: str) -> int:
+        """Удаляет отметки активности за дни раньше before_day: итоги этих дней уже в stats_daily"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM daily_active_users WHERE day < ?', (before_day,))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"❌ Ошибка очистки отметок активности: {e}")
+            if conn is not None:
+                conn.rollback()
+            return 0
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def rollup_activities_chunk(self, cutoff: str, limit: int, archive_file: str = None) -> int:
+        """Сворачивает в дневные итоги и удаляет до limit записей журнала старше cutoff
+
+        Итоги, копия в архив и удаление выполняются одной транзакцией, поэтому
+        каждая запись учитывается ровно один раз. Возвращает число перенесенных записей.
+        """
+        attached = False
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            if archive_file:
+                cursor.execute('ATTACH DATABASE ? AS archive', (archive_file,))
+                attached = True
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS archive.user_activities (
+                        id INTEGER PRIMARY KEY,
+                        user_id INTEGER NOT NULL,
+                        activity_type TEXT,
+                        message_text TEXT,
+                        bot_response TEXT,
+                        created_at TIMESTAMP
+                    )
+                ''')
+
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS retention_chunk (id INTEGER PRIMARY KEY)')
+            cursor.execute('DELETE FROM temp.retention_chunk')
+            cursor.execute('''
+                INSERT INTO temp.retention_chunk (id)
+                SELECT id FROM user_activities
+                WHERE created_at < ?
+                ORDER BY created_at
+                LIMIT ?
+            ''', (cutoff, limit))
+            moved = cursor.rowcount
+
+            if moved:
+                cursor.execute('''
+                    INSERT INTO activity_daily (day, user_id, activity_type, count, first_at, last_at)
+                    SELECT date(created_at), user_id, COALESCE(activity_type, ''), COUNT(*),
+                           MIN(created_at), MAX(created_at)
+                    FROM user_activities
+                    WHERE id IN (SELECT id FROM temp.retention_chunk)
+                    GROUP BY date(created_at), user_id, COALESCE(activity_type, '')
+                    ON CONFLICT (day, user_id, activity_type) DO UPDATE SET
+                        count = count + excluded.count,
+                        first_at = MIN(first_at, excluded.first_at),
+                        last_at = MAX(last_at, excluded.last_at)
+                ''')
+
+                if attached:
+                    # В режиме WAL файлы фиксируются по отдельности; повторная копия после сбоя отбрасывается по id
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO archive.user_activities
+                        SELECT id, user_id, activity_type, message_text, bot_response, created_at
+                        FROM user_activities
+                        WHERE id IN (SELECT id FROM temp.retention_chunk)
+                    ''')
+
+                cursor.execute('''
+                    DELETE FROM user_activities WHERE id IN (SELECT id FROM temp.retention_chunk)
+                ''')
+
+            conn.commit()
+            return moved
+        except Exception as e:
+            logger.error(f"❌ Ошибка свертки журнала активностей: {e}")
+            if conn is not None:
+                conn.rollback()
+            return 0
+        finally:
+            if attached:
+                try:
+                    cursor.execute('DETACH DATABASE archive')
+                except Exception as e:
+                    logger.error(f"❌ Ошибка отключения архива активностей: {e}")
+            if conn is not None:
+                conn.close()
+
+    def create_broadcast_job(self, admin_id: int, text: str, user_ids: List[int]) -> int:
+        """Создает задание рассылки со списком получателей"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO broadcast_jobs (admin_id, text, total)
+                VALUES (?, ?, ?)
+            ''', (admin_id, text, len(user_ids)))
+            job_id = cursor.lastrowid
+
+            cursor.executemany('''
+                INSERT OR IGNORE INTO broadcast_recipients (job_id, user_id)
+                VALUES (?, ?)
+            ''', [(job_id, user_id) for user_id in user_ids])
+
+            conn.commit()
+            return job_id
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания задания рассылки: {e}")
+            if conn is not None:
+                conn.rollback()
+            return 0
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def set_broadcast_status_message(self, job_id: int, chat_id: int, message_id: int):
+        """Запоминает сообщение, в котором показывается прогресс рассылки"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE broadcast_jobs
+                SET status_chat_id = ?, status_message_id = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ?
+            ''', (chat_id, message_id, job_id))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения сообщения прогресса рассылки {job_id}: {e}")
+            if conn is not None:
+                conn.rollback()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_unfinished_broadcast_jobs(self) -> List[Dict[str, Any]]:
+        """Получает задания рассылки, которые не были завершены"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM broadcast_jobs
+                WHERE status = 'running'
+                ORDER BY job_id
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения заданий рассылки: {e}")
+            return []
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def recover_broadcast_job(self, job_id: int) -> int:
+        """Помечает получателей, отправка которым прервалась, как 'unknown'
+
+        Доставлено ли им сообщение, неизвестно, поэтому повторно им не отправляем.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE broadcast_recipients
+                SET state = 'unknown', updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND state = 'sending'
+            ''', (job_id,))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"❌ Ошибка восстановления задания рассылки {job_id}: {e}")
+            if conn is not None:
+                conn.rollback()
+            return 0
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def claim_broadcast_recipients(self, job_id: int, limit: int) -> List[int]:
+        """Берет следующую пачку получателей после курсора и помечает их как 'sending'"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT cursor FROM broadcast_jobs WHERE job_id = ?', (job_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return []
+
+            cursor.execute('''
+                SELECT user_id FROM broadcast_recipients
+                WHERE job_id = ? AND user_id > ? AND state = 'pending'
+                ORDER BY user_id
+                LIMIT ?
+            ''', (job_id, row['cursor'], limit))
+            user_ids = [r['user_id'] for r in cursor.fetchall()]
+
+            if user_ids:
+                cursor.executemany('''
+                    UPDATE broadcast_recipients
+                    SET state = 'sending', updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = ? AND user_id = ?
+                ''', [(job_id, user_id) for user_id in user_ids])
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET cursor = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = ?
+                ''', (user_ids[-1], job_id))
+
+            conn.commit()
+            return user_ids
+        except Exception as e:
+            logger.error(f"❌ Ошибка выборки получателей рассылки {job_id}: {e}")
+            if conn is not None:
+                conn.rollback()
+            return []
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def complete_broadcast_recipients(self, job_id: int, delivered: List[int], errors: Dict[int, str],
+                                      released: List[int], activity: tuple = None) -> bool:
+        """Записывает результаты отправки пачки получателей одной транзакцией
+
+        delivered — доставлено, errors — ошибки по получателям, released — не успели
+        отправить, они возвращаются в очередь. Для доставленных записывается активность
+        activity = (activity_type, message_text, bot_response).
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE broadcast_recipients SET state = 'sent', updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND user_id = ?
+            ''', [(job_id, user_id) for user_id in delivered])
+
+            cursor.executemany('''
+                UPDATE broadcast_recipients SET state = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND user_id = ?
+            ''', [(error, job_id, user_id) for user_id, error in errors.items()])
+
+            if released:
+                cursor.executemany('''
+                    UPDATE broadcast_recipients SET state = 'pending', updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = ? AND user_id = ?
+                ''', [(job_id, user_id) for user_id in released])
+                # Курсор откатываем назад, чтобы вернувшиеся получатели снова попали в выборку
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET cursor = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE job_id = ? AND cursor >= ?
+                ''', (min(released) - 1, job_id, min(released)))
+
+            if activity and delivered:
+                activity_type, message_text, bot_response = activity
+                cursor.executemany('''
+                    INSERT INTO user_activities (user_id, activity_type, message_text, bot_response)
+                    VALUES (?, ?, ?, ?)
+                ''', [(user_id, activity_type, message_text, bot_response) for user_id in delivered])
+
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи результатов рассылки {job_id}: {e}")
+            if conn is not None:
+                conn.rollback()
+            return False
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def finish_broadcast_job(self, job_id: int):
+        """Помечает задание рассылки завершенным"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE broadcast_jobs
+                SET status = 'done', finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ?
+            ''', (job_id,))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка завершения задания рассылки {job_id}: {e}")
+            if conn is not None:
+                conn.rollback()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_broadcast_job_stats(self, job_id: int) -> Dict[str, int]:
+        """Получает количество получателей задания по состояниям доставки"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT state, COUNT(*) as count
+                FROM broadcast_recipients
+                WHERE job_id = ?
+                GROUP BY state
+            ''', (job_id,))
+            return {row['state']: row['count'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения статистики рассылки {job_id}: {e}")
+            return {}
+        finally:
+            if conn is not None:
+                conn.close()
+
 
 # Глобальный экземпляр базы данных
-db = Database()
\ No newline at end of file
+db = Database(profiler=query_profiler if DB_PROFILE else None)
\ No newline at end of file
@@ -0,0 +1,181 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Свободное соединение не появилось за отведенное время"""
+
+
+class PooledConnection:
+    """Соединение, выданное пулом. close() возвращает его в пул, а не закрывает"""
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Соединение уже возвращено в пул")
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        """Курсор соединения; при подключенном профилировщике — с замером операторов"""
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Соединение уже возвращено в пул")
+        if self._pool.profiler is not None and not args:
+            return self._conn.cursor(self._pool.profiler.cursor)
+        return self._conn.cursor(*args)
+
+    def close(self):
+        """Возвращает соединение в пул"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Пул переиспользуемых соединений SQLite
+
+    Соединения создаются лениво до size штук. Каждое соединение держит свой кэш
+    подготовленных запросов (cached_statements), поэтому повторные запросы
+    не компилируются заново. Настройки pragmas применяются к каждому новому
+    соединению. Перед выдачей соединение, простоявшее дольше
+    health_check_interval, проверяется запросом SELECT 1. Если задан
+    profiler (QueryProfiler), курсоры соединений замеряют каждый оператор.
+    Ожидающие соединения потоки будятся и при возврате соединения, и при
+    отбраковке: тогда освободившееся место занимается новым соединением.
+    """
+
+    def __init__(self, db_file: str, size: int = 5, timeout: float = 10.0,
+                 statement_cache_size: int = 128, health_check_interval: float = 30.0,
+                 pragmas: List[str] = None, profiler=None):
+        self.db_file = db_file
+        self.pragmas = pragmas or []
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.statement_cache_size = statement_cache_size
+        self.health_check_interval = health_check_interval
+        self.profiler = profiler
+
+        # LIFO: чаще всего выдаем самое "горячее" соединение с прогретым кэшем страниц
+        self._idle: List[tuple] = []
+        self._created = 0
+        self._available = threading.Condition(threading.Lock())
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection, checked_at: float) -> bool:
+        if time.monotonic() - checked_at < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Соединение с базой не прошло проверку: {e}")
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._available:
+            self._created -= 1
+            # Освободилось место под новое соединение — будим ожидающего
+            self._available.notify()
+
+    def acquire(self) -> PooledConnection:
+        """Выдает соединение из пула, при необходимости создавая новое"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._available:
+                while not self._idle and self._created >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Нет свободных соединений за {self.timeout} сек. (размер пула {self.size})"
+                        )
+                    self._available.wait(remaining)
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+                if self._idle:
+                    conn, checked_at = self._idle.pop()
+                else:
+                    conn = None
+                    self._created += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._available:
+                        self._created -= 1
+                        self._available.notify()
+                    raise
+                return PooledConnection(self, conn)
+
+            if self._is_healthy(conn, checked_at):
+                return PooledConnection(self, conn)
+
+            self._discard(conn)
+
+    def release(self, conn: sqlite3.Connection):
+        """Возвращает соединение в пул, откатывая незавершенную транзакцию"""
+        if self._closed:
+            self._discard(conn)
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось откатить транзакцию при возврате соединения: {e}")
+            self._discard(conn)
+            return
+
+        with self._available:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    def close(self):
+        """Закрывает все простаивающие соединения"""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    @property
+    def created_count(self) -> int:
+        return self._created
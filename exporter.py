@@ -0,0 +1,161 @@
+"""Потоковая выгрузка заказов и журнала активностей в CSV или JSONL
+
+Строки читаются курсором пачками по EXPORT_BATCH_SIZE и сразу пишутся в файл
+(при необходимости через gzip), поэтому память не растет с числом строк.
+Запросы идут в порядке первичного ключа или индекса created_at — без
+сортировки во временной таблице.
+
+Выгрузка из командной строки:
+    python exporter.py orders|activities [--db bot_database.db] [--format csv|jsonl] [--gzip] [--days N] [-o файл]
+"""
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from config import EXPORT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+
+
+class ExportSpec(NamedTuple):
+    """Что выгружать: колонки, запрос по всей таблице и запрос с началом периода"""
+    columns: List[str]
+    sql: str
+    sql_since: str
+
+
+EXPORTS = {
+    'orders': ExportSpec(
+        columns=['order_id', 'user_id', 'first_name', 'username', 'subject', 'variant', 'package', 'price',
+                 'status', 'admin_comment', 'created_at', 'updated_at'],
+        sql='''
+            SELECT o.order_id, o.user_id, u.first_name, u.username, o.subject, o.variant, o.package, o.price,
+                   o.status, o.admin_comment, o.created_at, o.updated_at
+            FROM orders o
+            LEFT JOIN users u ON u.user_id = o.user_id
+            ORDER BY o.order_id
+        ''',
+        sql_since='''
+            SELECT o.order_id, o.user_id, u.first_name, u.username, o.subject, o.variant, o.package, o.price,
+                   o.status, o.admin_comment, o.created_at, o.updated_at
+            FROM orders o
+            LEFT JOIN users u ON u.user_id = o.user_id
+            WHERE o.created_at >= ?
+            ORDER BY o.created_at
+        ''',
+    ),
+    'activities': ExportSpec(
+        columns=['id', 'user_id', 'activity_type', 'message_text', 'bot_response', 'created_at'],
+        sql='''
+            SELECT id, user_id, activity_type, message_text, bot_response, created_at
+            FROM user_activities
+            ORDER BY id
+        ''',
+        sql_since='''
+            SELECT id, user_id, activity_type, message_text, bot_response, created_at
+            FROM user_activities
+            WHERE created_at >= ?
+            ORDER BY created_at
+        ''',
+    ),
+}
+
+
+def export_filename(kind: str, fmt: str, compress: bool) -> str:
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+    return f"{kind}_{stamp}.{fmt}" + ('.gz' if compress else '')
+
+
+def export_rows(database, kind: str, path: str, fmt: str = 'csv', compress: bool = False,
+                days: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Выгружает заказы или активности в файл path и возвращает число строк, размер и время"""
+    if kind not in EXPORTS:
+        raise ValueError(f"Неизвестная выгрузка: {kind}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+    spec = EXPORTS[kind]
+    if days:
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        sql, params = spec.sql_since, (since,)
+    else:
+        sql, params = spec.sql, ()
+
+    started = time.monotonic()
+    rows_written = 0
+    opener = gzip.open if compress else open
+
+    with opener(path, 'wt', encoding='utf-8', newline='') as out:
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(spec.columns)
+            for rows in database.stream_query(sql, params, batch_size):
+                writer.writerows(rows)
+                rows_written += len(rows)
+        else:
+            for rows in database.stream_query(sql, params, batch_size):
+                out.writelines(
+                    json.dumps(dict(zip(spec.columns, row)), ensure_ascii=False) + '\n' for row in rows
+                )
+                rows_written += len(rows)
+
+    result = {
+        'kind': kind,
+        'path': path,
+        'rows': rows_written,
+        'bytes': os.path.getsize(path),
+        'seconds': round(time.monotonic() - started, 2),
+    }
+    logger.info(f"📦 Выгрузка {kind}: {rows_written} строк, {result['bytes']} байт за {result['seconds']} сек.")
+    return result
+
+
+def parse_export_args(args: List[str]) -> Dict[str, Any]:
+    """Аргументы /export в любом порядке: orders|activities, csv|jsonl, gz, число дней"""
+    options = {'kind': 'orders', 'fmt': 'csv', 'compress': False, 'days': None}
+
+    for arg in args:
+        arg = arg.lower()
+        if arg in EXPORTS:
+            options['kind'] = arg
+        elif arg in FORMATS:
+            options['fmt'] = arg
+        elif arg in ('gz', 'gzip'):
+            options['compress'] = True
+        elif arg.isdigit() and int(arg) > 0:
+            options['days'] = int(arg)
+        else:
+            raise ValueError(f"Непонятный параметр: {arg}")
+
+    return options
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Выгрузка заказов и журнала активностей")
+    parser.add_argument('kind', choices=sorted(EXPORTS))
+    parser.add_argument('--db', default='bot_database.db')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--days', type=int, help="только записи за последние N дней")
+    parser.add_argument('--batch', type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument('-o', '--output')
+    args = parser.parse_args()
+
+    from database import Database
+    database = Database(args.db)
+    output = args.output or export_filename(args.kind, args.format, args.gzip)
+
+    try:
+        result = export_rows(database, args.kind, output, args.format, args.gzip, args.days, args.batch)
+    finally:
+        database.close()
+
+    print(f"✅ {result['path']}: {result['rows']} строк, {result['bytes']} байт за {result['seconds']} сек.")
@@ -0,0 +1,333 @@
+"""Генератор большой синтетической базы для проверки масштабирования
+
+Создает базу с полной схемой бота (Database + миграции) и заполняет ее:
+пользователи регистрируются с растущей к концу периода скоростью, часть
+пользователей намного активнее остальных, активности идут по суточному
+профилю (ночью мало, пик вечером) с просадкой в выходные. Типы и тексты
+активностей — те же, что пишут обработчики; каждая активность order_created
+создает заказ по SUBJECT_PRICES, а статус заказа зависит от его возраста
+и проходит все ORDER_STATUSES.
+
+Вся загрузка — одна транзакция: индексы и триггеры статистики на время
+вставки удаляются и создаются заново в конце, строки пишутся пачками
+executemany, затем счетчики статистики пересчитываются из данных. Если
+загрузка прервется, транзакция откатится целиком.
+
+    python generate_database.py big.db --users 200000 --activities 10000000 --orders 300000 --days 90
+    python generate_database.py bot_database.db --append --activities 100000
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import SUBJECT_PRICES, SERVICE_PACKAGES, ORDER_STATUSES, SUBJECTS
+from migrations import rebuild_stats
+from routing import BTN_GUARANTEES, BTN_PRICES, BTN_ABOUT, BTN_CONTACTS, BTN_CART, BTN_SUBJECTS, BTN_BACK_TO_MENU
+
+# Таблицы, индексы и триггеры которых удаляются на время загрузки
+BULK_TABLES = ('users', 'user_activities', 'orders')
+
+# Относительная активность по часам суток (UTC)
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 4, 6, 8, 9, 10, 10, 11, 11, 10, 10, 11, 12, 14, 16, 17, 15, 10, 5]
+WEEKEND_FACTOR = 0.8
+
+# Доля пользователей, зарегистрированных до начала периода
+EARLY_USERS_SHARE = 0.1
+
+# Частоты типов активностей (order_created задается отдельно через --orders)
+ACTIVITY_WEIGHTS = {
+    'menu_click': 30,
+    'start': 10,
+    'subject_selection': 14,
+    'subject_selected': 4,
+    'variant_entered': 10,
+    'package_selected': 7,
+    'cart_view': 6,
+    'consultation_request': 1,
+    'user_message': 5,
+    'unknown_message': 3,
+    'order_status_update': 1,
+}
+
+PACKAGE_WEIGHTS = {'basic': 5, 'standard': 4, 'individual': 1}
+
+FIRST_NAMES = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Иван', 'Елена', 'Максим', 'Ольга', 'Артем', 'Дарья',
+               'Никита', 'Полина', 'Егор', 'Софья', 'Кирилл', 'Виктория', 'Михаил', 'Алина', 'Андрей', 'Ксения']
+
+USER_MESSAGES = ['Здравствуйте, когда будет готово?', 'Можно уточнить по варианту?', 'Спасибо!',
+                 'Сколько стоит срочно?', 'Добрый день', 'Пришлите, пожалуйста, пример', 'А можно скидку?']
+
+MAX_VARIANT = 30
+
+
+def activity_texts():
+    """Тексты активностей по типам — как их пишут обработчики"""
+    subjects = list(SUBJECT_PRICES)
+    texts = {
+        'menu_click': [BTN_GUARANTEES, BTN_PRICES, BTN_ABOUT, BTN_CONTACTS, BTN_CART, BTN_SUBJECTS, BTN_BACK_TO_MENU],
+        'start': ['/start'],
+        'subject_selection': [f"Выбрал предмет: {subject}" for subject in subjects],
+        'subject_selected': list(SUBJECTS),
+        'variant_entered': [f"Ввел вариант: {variant} для {subject}"
+                            for subject in subjects for variant in range(1, MAX_VARIANT + 1)],
+        'package_selected': [f"Выбрал тариф {package} за {prices[package]} руб. для {subject} варианта {variant}"
+                             for subject, prices in SUBJECT_PRICES.items() for package in prices
+                             for variant in range(1, MAX_VARIANT + 1)],
+        'cart_view': ['Просмотр корзины'],
+        'consultation_request': ['Запрошена консультация'],
+        'user_message': USER_MESSAGES,
+        'unknown_message': USER_MESSAGES,
+        'order_status_update': [f"Статус заказа изменен на {status}" for status in ORDER_STATUSES.values()],
+    }
+    return texts
+
+
+def weighted_pool(weights):
+    """Индексы, повторенные пропорционально весу: выбор по весу — одно обращение к списку"""
+    return [index for index, weight in enumerate(weights) for _ in range(max(1, round(weight)))]
+
+
+class Generator:
+    """Строки пользователей, активностей и заказов в хронологическом порядке"""
+
+    def __init__(self, users: int, activities: int, orders: int, days: int, first_user_id: int,
+                 first_order_id: int, seed: int):
+        self.rng = random.Random(seed)
+        self.activities = activities
+        self.days = days
+        self.first_order_id = first_order_id
+        self.now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+        self.start = (self.now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0)
+
+        rng = self.rng
+        # Регистрации ускоряются к концу периода; пользователи упорядочены по дню регистрации
+        self.signup_days = sorted(
+            -1 if rng.random() < EARLY_USERS_SHARE else min(days - 1, int(days * rng.random() ** 0.5))
+            for _ in range(users)
+        )
+        self.user_ids = list(range(first_user_id, first_user_id + users))
+        # Активность пользователей распределена по Парето: немногие делают большую часть действий.
+        # Пул упорядочен как пользователи, поэтому зарегистрированные к дню — его начало до user_pool_ends
+        self.user_pool = weighted_pool(min(100.0, rng.paretovariate(1.5)) for _ in range(users))
+        self.user_pool_ends = [bisect.bisect_right(self.user_pool, index) for index in range(users)]
+        self.first_seen = [None] * users
+        self.last_seen = [None] * users
+
+        self.texts = activity_texts()
+        weights = dict(ACTIVITY_WEIGHTS)
+        share = orders / activities if activities else 0
+        scale = sum(weights.values()) * share / (1 - share) if share < 1 else 0
+        weights['order_created'] = scale
+        self.types = list(weights)
+        self.type_cum_weights = list(itertools.accumulate(weights.values()))
+
+        self.subjects = list(SUBJECT_PRICES)
+        # Первые предметы популярнее последних
+        self.subject_cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(self.subjects))))
+        self.packages = [package for package in PACKAGE_WEIGHTS if package in SERVICE_PACKAGES]
+        self.package_cum_weights = list(itertools.accumulate(PACKAGE_WEIGHTS[package] for package in self.packages))
+        self.statuses = list(ORDER_STATUSES.values())
+        self.times = [f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}" for second in range(86400)]
+        self.hour_pool = weighted_pool(HOUR_WEIGHTS)
+
+    def day_counts(self):
+        """Число активностей по дням: пропорционально активности уже зарегистрированных пользователей"""
+        weights = []
+        for day in range(self.days):
+            eligible = bisect.bisect_right(self.signup_days, day)
+            weekend = (self.start + timedelta(days=day)).weekday() >= 5
+            weight = self.user_pool_ends[eligible - 1] if eligible else 0
+            weights.append(weight * (WEEKEND_FACTOR if weekend else 1.0))
+
+        total = sum(weights)
+        counts = [int(self.activities * weight / total) if total else 0 for weight in weights]
+        if total:
+            counts[-1] += self.activities - sum(counts)
+        return counts
+
+    def _order(self, order_id: int, user_id: int, created: str, age_days: float):
+        rng = self.rng
+        subject = rng.choices(self.subjects, cum_weights=self.subject_cum_weights)[0]
+        package = rng.choices(self.packages, cum_weights=self.package_cum_weights)[0]
+        # Чем старше заказ, тем дальше он продвинулся по статусам
+        stage = min(len(self.statuses) - 1, int(rng.random() * (1 + age_days / 3)))
+        updated = created
+        if stage:
+            updated_at = datetime.strptime(created, '%Y-%m-%d %H:%M:%S') + timedelta(days=stage * rng.random() * 2)
+            updated = min(updated_at, self.now).strftime('%Y-%m-%d %H:%M:%S')
+        return (order_id, user_id, subject, str(rng.randint(1, MAX_VARIANT)), SERVICE_PACKAGES[package]['name'],
+                SUBJECT_PRICES[subject][package], self.statuses[stage], None, created, updated)
+
+    def activity_rows(self, orders_out: list):
+        """Активности по порядку времени; заказы добавляются в orders_out по мере появления"""
+        random_ = self.rng.random
+        order_ids = itertools.count(self.first_order_id)
+        times, user_ids, user_pool, hour_pool = self.times, self.user_ids, self.user_pool, self.hour_pool
+        texts = {activity_type: (values, len(values)) for activity_type, values in self.texts.items()}
+        first_seen, last_seen = self.first_seen, self.last_seen
+
+        for day, count in enumerate(self.day_counts()):
+            if not count:
+                continue
+            eligible = bisect.bisect_right(self.signup_days, day)
+            pool_end = self.user_pool_ends[eligible - 1]
+            date = self.start + timedelta(days=day)
+            prefix = date.strftime('%Y-%m-%d ')
+            # Сегодняшний день — только до текущего момента
+            limit = min(86400, int((self.now - date).total_seconds()) + 1)
+
+            seconds = []
+            while len(seconds) < count:
+                seconds.extend(
+                    second for second in (hour_pool[int(random_() * len(hour_pool))] * 3600 + int(random_() * 3600)
+                                          for _ in range(count - len(seconds)))
+                    if second < limit
+                )
+            seconds.sort()
+            types = self.rng.choices(self.types, cum_weights=self.type_cum_weights, k=count)
+
+            for second, activity_type in zip(seconds, types):
+                index = user_pool[int(random_() * pool_end)]
+                created = prefix + times[second]
+                user_id = user_ids[index]
+                if first_seen[index] is None:
+                    first_seen[index] = created
+                last_seen[index] = created
+
+                if activity_type == 'order_created':
+                    order_id = next(order_ids)
+                    orders_out.append(self._order(order_id, user_id, created, self.days - day))
+                    text = f"Создан заказ #{order_id}"
+                else:
+                    values, size = texts[activity_type]
+                    text = values[int(random_() * size)]
+                yield user_id, activity_type, text, None, created
+
+    def user_rows(self):
+        """Пользователи: регистрация не позже первой активности"""
+        rng = self.rng
+        for index, user_id in enumerate(self.user_ids):
+            signup_day = self.signup_days[index]
+            if signup_day < 0:
+                signup = self.start - timedelta(days=rng.randint(1, 365), seconds=rng.randrange(86400))
+            else:
+                signup = self.start + timedelta(days=signup_day, seconds=rng.randrange(86400))
+            created = min(signup, self.now).strftime('%Y-%m-%d %H:%M:%S')
+            if self.first_seen[index] is not None and self.first_seen[index] < created:
+                created = self.first_seen[index]
+            username = f"user{user_id}" if rng.random() < 0.7 else None
+            yield user_id, rng.choice(FIRST_NAMES), username, created, self.last_seen[index] or created
+
+
+def insert_batches(conn, sql: str, rows, batch_size: int) -> int:
+    """Пишет строки пачками executemany и возвращает их число"""
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return total
+        conn.executemany(sql, batch)
+        total += len(batch)
+
+
+def generate(db_file: str, users: int, activities: int, orders: int, days: int, batch_size: int = 50000,
+             seed: int = 42, append: bool = False):
+    if orders > activities:
+        raise ValueError("Заказов не может быть больше, чем активностей")
+    if os.path.exists(db_file) and not append:
+        raise ValueError(f"Файл {db_file} уже существует: укажите --append, чтобы дописать в него")
+
+    # Схема создается так же, как при запуске бота
+    from database import Database
+    Database(db_file).close()
+
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+    started = time.perf_counter()
+    try:
+        first_user_id = max(100000000, conn.execute('SELECT COALESCE(MAX(user_id), 0) FROM users').fetchone()[0] + 1)
+        first_order_id = conn.execute('SELECT COALESCE(MAX(order_id), 0) FROM orders').fetchone()[0] + 1
+        generator = Generator(users, activities, orders, days, first_user_id, first_order_id, seed)
+
+        conn.execute('BEGIN')
+        placeholders = ','.join('?' * len(BULK_TABLES))
+        schema = conn.execute(f'''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND tbl_name IN ({placeholders}) AND sql IS NOT NULL
+        ''', BULK_TABLES).fetchall()
+        for object_type, name, _ in schema:
+            conn.execute(f'DROP {object_type.upper()} {name}')
+
+        order_rows = []
+        inserted_orders = 0
+        inserted_activities = 0
+        activity_rows = generator.activity_rows(order_rows)
+        while True:
+            count = insert_batches(conn, '''
+                INSERT INTO user_activities (user_id, activity_type, message_text, bot_response, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', itertools.islice(activity_rows, batch_size), batch_size)
+            if order_rows:
+                inserted_orders += insert_batches(conn, '''
+                    INSERT INTO orders (order_id, user_id, subject, variant, package, price, status, admin_comment,
+                                        created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', order_rows, batch_size)
+                order_rows.clear()
+            if not count:
+                break
+            inserted_activities += count
+            print(f"\r📝 Активностей: {inserted_activities}/{activities}, заказов: {inserted_orders}", end='', flush=True)
+        print()
+
+        inserted_users = insert_batches(conn, '''
+            INSERT INTO users (user_id, first_name, username, created_at, last_seen) VALUES (?, ?, ?, ?, ?)
+        ''', generator.user_rows(), batch_size)
+        loaded = time.perf_counter()
+        print(f"✅ Вставлено за {loaded - started:.1f} сек.: пользователей {inserted_users}, "
+              f"активностей {inserted_activities}, заказов {inserted_orders}")
+
+        # Индексы строятся по уже загруженным данным — быстрее, чем обновлять их на каждой вставке
+        for _, _, sql in schema:
+            conn.execute(sql)
+        rebuild_stats(conn)
+        conn.execute('COMMIT')
+        print(f"✅ Индексы, триггеры и счетчики статистики за {time.perf_counter() - loaded:.1f} сек.")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"🎯 База {db_file}: {os.path.getsize(db_file) / 1024 / 1024:.0f} МБ за {elapsed:.1f} сек., "
+          f"{inserted_activities / elapsed:.0f} активностей/сек.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Генератор большой синтетической базы бота")
+    parser.add_argument('db_file')
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--activities', type=int, default=2000000)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=90, help="период активности до текущего момента, дней")
+    parser.add_argument('--batch', type=int, default=50000, help="строк в одном executemany")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--append', action='store_true', help="дописать в существующую базу")
+    args = parser.parse_args()
+
+    try:
+        generate(args.db_file, args.users, args.activities, args.orders, args.days, args.batch, args.seed, args.append)
+    except ValueError as e:
+        print(f"❌ {e}")
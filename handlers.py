@@ -1,15 +1,33 @@
 import logging
+import os
 import re
+import tempfile
 from datetime import datetime
 from telegram import Update, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler
-from config import ADMIN_ID, SUBJECTS, SUBJECT_PRICES, SERVICE_PACKAGES, admin_states, ORDER_STATUSES
-from database import db
+from config import (
+    ADMIN_ID, SUBJECTS, SUBJECT_PRICES, SERVICE_PACKAGES, ORDER_STATUSES, ORDERS_PAGE_SIZE, STATS_PERIOD_DAYS,
+    EXPORT_DIR, EXPORT_MAX_UPLOAD_MB, EXPORT_UPLOAD_TIMEOUT
+)
+from analytics import build_report, format_report, parse_period
+from async_db import adb
+from exporter import export_filename, export_rows, parse_export_args
+from metrics import metrics
+from responses import catalog
+from state_store import admin_states
+from routing import (
+    router, admin_router, activity_middleware, PACKAGE_BUTTONS,
+    BTN_SUBJECTS, BTN_GUARANTEES, BTN_PRICES, BTN_ABOUT, BTN_CART, BTN_CONTACTS, BTN_CLEAR_CART,
+    BTN_BACK_TO_MENU, BTN_HOME, BTN_ENTER_VARIANT, BTN_TO_SUBJECTS, BTN_CONSULTATION, BTN_BACK,
+    BTN_CONTACT_MANAGER, BTN_BACK_TO_PACKAGES, BTN_CHECKOUT,
+    BTN_ADMIN_USERS, BTN_ADMIN_ORDERS, BTN_ADMIN_BROADCAST, BTN_ADMIN_EXIT, BTN_ADMIN_BACK, BTN_ADMIN_CANCEL,
+    BTN_ORDERS_ALL, BTN_ORDERS_READY, BTN_ORDERS_WORKING, BTN_ADMIN_REPLY_PREFIX
+)
 from keyboards import (
     main_keyboard, subjects_keyboard, subject_selected_keyboard,
     service_packages_keyboard, consultation_keyboard, cart_keyboard,
     admin_panel_keyboard, admin_cancel_keyboard, admin_users_keyboard,
-    admin_orders_keyboard, order_actions_keyboard, quick_reply_inline_keyboard
+    admin_orders_keyboard, order_actions_keyboard, quick_reply_inline_keyboard, orders_page_keyboard
 )
 from services import notify_admin, handle_admin_broadcast, handle_admin_reply, send_message_to_user, \
     send_message_with_notify, notify_user_order_status
@@ -17,36 +35,21 @@ from services import notify_admin, handle_admin_broadcast, handle_admin_reply, s
 logger = logging.getLogger(__name__)
 
 
+@router.command("start")
+@router.route(BTN_BACK_TO_MENU, BTN_HOME, activity="Главное меню")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     logger.info(f"Пользователь {user.id} запустил бота")
 
-    db.save_user(user.id, user.first_name, user.username)
-    db.save_user_activity(user.id, "start", "/start")
-
-    welcome_text = f"""Привет, {user.first_name}\! 👋
-
-    *Мы — команда профессионалов, которые разбираются в строительных дисциплинах* 🏗️ *и знают, как помочь студентам\.*
-
-    *Если ты учишься на 1\-3 курсе* и у тебя нет времени или нужна помощь с курсовой — *ты по адресу\!* ✅
-
-    *Наше главное правило:* мы *не продаем готовые работы «с полки»*\. *Мы создаем каждую курсовую индивидуально для тебя* ✍️\. Это значит, что твоя работа будет:
-
-    • *Уникальной* 🛡️
-
-    • *Качественной* 📐
-
-    • *По требованиям преподавателя* 👨‍🏫
-
-    *Можешь быть уверен* — мы подходим к делу ответственно, чтобы твой проект был *сделан на отлично\!* 🎯
+    await adb.save_user(user.id, user.first_name, user.username)
+    await adb.save_user_activity(user.id, "start", "/start")
 
-    *Давай сделаем твою учебу немного проще?* 😉
-
-    *Выбери нужный раздел:*"""
-
-    await update.message.reply_text(welcome_text, reply_markup=main_keyboard(), parse_mode='MarkdownV2')
+    await update.message.reply_text(catalog.welcome(user.first_name), reply_markup=main_keyboard(),
+                                    parse_mode='MarkdownV2')
 
 
+@router.route(BTN_SUBJECTS, activity="Предметы")
+@router.route(BTN_TO_SUBJECTS, activity="К выбору предмета")
 async def handle_subjects(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = "📚 Доступные предметы:\n\nВыбери предмет для заказа курсовой работы:"
     await update.message.reply_text(text, reply_markup=subjects_keyboard())
@@ -56,8 +59,8 @@ async def handle_subject_selection(update: Update, context: ContextTypes.DEFAULT
     user = update.effective_user
 
     # Сохраняем только предмет, очищаем предыдущие выборы
-    db.save_user_selection(user.id, subject=subject, variant=None, package=None, price=None)
-    db.save_user_activity(user.id, "subject_selection", f"Выбрал предмет: {subject}")
+    await adb.save_user_selection(user.id, subject=subject, variant=None, package=None, price=None)
+    await adb.save_user_activity(user.id, "subject_selection", f"Выбрал предмет: {subject}")
 
     text = f"""🎯 Выбран: {subject}
 
@@ -68,6 +71,7 @@ async def handle_subject_selection(update: Update, context: ContextTypes.DEFAULT
     await update.message.reply_text(text, reply_markup=subject_selected_keyboard())
 
 
+@router.when(str.isdigit)
 async def handle_variant_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает ввод номера варианта"""
     user = update.effective_user
@@ -84,7 +88,7 @@ async def handle_variant_input(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     # Получаем текущий выбор пользователя
-    selection = db.get_user_selection(user.id)
+    selection = await adb.get_user_selection(user.id)
     logger.info(f"Текущий выбор пользователя: {selection}")
 
     if not selection or not selection.get('subject'):
@@ -97,8 +101,8 @@ async def handle_variant_input(update: Update, context: ContextTypes.DEFAULT_TYP
     subject = selection['subject']
 
     # Сохраняем вариант
-    db.save_user_selection(user.id, variant=variant)
-    db.save_user_activity(user.id, "variant_entered", f"Ввел вариант: {variant} для {subject}")
+    await adb.save_user_selection(user.id, variant=variant)
+    await adb.save_user_activity(user.id, "variant_entered", f"Ввел вариант: {variant} для {subject}")
 
     # Показываем тарифы
     await show_service_packages(update, context, subject, variant)
@@ -106,27 +110,15 @@ async def handle_variant_input(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def show_service_packages(update: Update, context: ContextTypes.DEFAULT_TYPE, subject: str, variant: str):
     """Показывает тарифы для выбранного предмета и варианта"""
-    text = f"🎯 Вариант {variant} \- {subject}\n\nВыберите тариф выполнения:\n\n"
-
-    # Получаем цены для выбранного предмета
-    prices = SUBJECT_PRICES.get(subject, {})
-
-    # Формируем описание каждого тарифа в новом формате с жирными названиями
-    for package_key, package_info in SERVICE_PACKAGES.items():
-        price = prices.get(package_key, 0)
-        text += f"*{package_info['name']}* \- {price} руб\.\n\n"
-
-    text += "💬 Или закажите консультацию для обсуждения деталей"
-
-    await update.message.reply_text(text, reply_markup=service_packages_keyboard(), parse_mode='MarkdownV2')
-
+    await update.message.reply_text(catalog.packages(subject, variant), reply_markup=service_packages_keyboard(),
+                                    parse_mode='MarkdownV2')
 
 async def handle_package_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, package_key: str):
     """Обрабатывает выбор тарифа"""
     user = update.effective_user
 
     # Получаем текущий выбор пользователя
-    selection = db.get_user_selection(user.id)
+    selection = await adb.get_user_selection(user.id)
     if not selection or not selection.get('subject') or not selection.get('variant'):
         await update.message.reply_text(
             "❌ Сначала выберите предмет и введите вариант",
@@ -149,9 +141,9 @@ async def handle_package_selection(update: Update, context: ContextTypes.DEFAULT
         return
 
     # Сохраняем выбранный тариф и цену
-    db.save_user_selection(user.id, package=package_key, price=price)
-    db.save_user_activity(user.id, "package_selected",
-                          f"Выбрал тариф {package_key} за {price} руб. для {subject} варианта {variant}")
+    await adb.save_user_selection(user.id, package=package_key, price=price)
+    await adb.save_user_activity(user.id, "package_selected",
+                                 f"Выбрал тариф {package_key} за {price} руб. для {subject} варианта {variant}")
 
     # Показываем корзину
     await show_cart(update, context)
@@ -160,7 +152,7 @@ async def handle_package_selection(update: Update, context: ContextTypes.DEFAULT
 async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает корзину с выбранными опциями"""
     user = update.effective_user
-    selection = db.get_user_selection(user.id)
+    selection = await adb.get_user_selection(user.id)
 
     if not selection or not selection.get('subject') or not selection.get('variant') or not selection.get('package'):
         await update.message.reply_text(
@@ -187,14 +179,15 @@ async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Для оформления заказа нажмите кнопку ниже👇"""
 
     await update.message.reply_text(cart_text, reply_markup=cart_keyboard())
-    db.save_user_activity(user.id, "cart_view", "Просмотр корзины")
+    await adb.save_user_activity(user.id, "cart_view", "Просмотр корзины")
 
 
+@router.route(BTN_CONSULTATION, activity="Заказать консультацию")
 async def handle_consultation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает запрос консультации"""
     user = update.effective_user
 
-    selection = db.get_user_selection(user.id)
+    selection = await adb.get_user_selection(user.id)
     subject = selection.get('subject', 'Не выбран') if selection else 'Не выбран'
     variant = selection.get('variant', 'Не указан') if selection else 'Не указан'
 
@@ -208,13 +201,14 @@ async def handle_consultation(update: Update, context: ContextTypes.DEFAULT_TYPE
 Мы ответим на все ваши вопросы и поможем определиться с выбором!"""
 
     await update.message.reply_text(text, reply_markup=consultation_keyboard())
-    db.save_user_activity(user.id, "consultation_request", "Запрошена консультация")
+    await adb.save_user_activity(user.id, "consultation_request", "Запрошена консультация")
 
 
+@router.route(BTN_CHECKOUT, activity="Оформить заказ")
 async def create_order_from_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Создает заказ из корзины"""
     user = update.effective_user
-    selection = db.get_user_selection(user.id)
+    selection = await adb.get_user_selection(user.id)
 
     if not selection or not selection.get('subject') or not selection.get('variant') or not selection.get('package'):
         await update.message.reply_text("❌ Не все параметры выбраны", reply_markup=main_keyboard())
@@ -229,14 +223,14 @@ async def create_order_from_cart(update: Update, context: ContextTypes.DEFAULT_T
     package_name = package_info.get('name', 'Неизвестный тариф')
 
     # Создаем заказ в базе данных
-    order_id = db.create_order(user.id, subject, variant, package_name, price)
+    order_id = await adb.create_order(user.id, subject, variant, package_name, price)
 
     if order_id:
         # Уведомляем админа о новом заказе
         await notify_admin_new_order(context, user, order_id, subject, variant, package_name, price)
 
         # Очищаем корзину пользователя
-        db.delete_user_selection(user.id)
+        await adb.delete_user_selection(user.id)
 
         order_text = f"""✅ Заказ оформлен!
 
@@ -250,7 +244,7 @@ async def create_order_from_cart(update: Update, context: ContextTypes.DEFAULT_T
 💬 Мы свяжемся с вами в ближайшее время для уточнения деталей."""
 
         await update.message.reply_text(order_text, reply_markup=main_keyboard())
-        db.save_user_activity(user.id, "order_created", f"Создан заказ #{order_id}")
+        await adb.save_user_activity(user.id, "order_created", f"Создан заказ #{order_id}")
 
     else:
         await update.message.reply_text("❌ Ошибка при создании заказа", reply_markup=main_keyboard())
@@ -282,11 +276,12 @@ async def notify_admin_new_order(context, user, order_id, subject, variant, pack
         logger.error(f"Ошибка уведомления админа о новом заказе: {e}")
 
 
+@router.route(BTN_CLEAR_CART, activity="Очистить корзину")
 async def clear_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
-    db.delete_user_selection(user.id)
-    db.save_user_activity(user.id, "clear_chat", "Очистить корзину")
+    await adb.delete_user_selection(user.id)
+    await adb.save_user_activity(user.id, "clear_chat", "Очистить корзину")
 
     await update.message.reply_text(
         "🧹 Корзина полностью очищена!\n\nВсе выборы сброшены.",
@@ -294,10 +289,11 @@ async def clear_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@router.route(BTN_CART, activity="Корзина")
 async def handle_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает корзину по запросу пользователя"""
     user = update.effective_user
-    selection = db.get_user_selection(user.id)
+    selection = await adb.get_user_selection(user.id)
 
     if selection and selection.get('subject') and selection.get('variant') and selection.get('package'):
         await show_cart(update, context)
@@ -306,94 +302,138 @@ async def handle_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🛒 Корзина пуста. Сначала выберите предмет, вариант и тариф!",
             reply_markup=main_keyboard()
         )
-        db.save_user_activity(user.id, "empty_cart", "Корзина пуста")
+        await adb.save_user_activity(user.id, "empty_cart", "Корзина пуста")
 
 
 # АДМИН ПАНЕЛЬ
+@router.command("admin")
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if user.id != ADMIN_ID:
         return
 
-    admin_states[user.id] = 'admin_panel'
+    await admin_states.set(user.id, 'admin_panel')
     await update.message.reply_text("🛠️ Панель администратора", reply_markup=admin_panel_keyboard())
 
 
-async def handle_admin_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    if user.id != ADMIN_ID:
-        return
+# МАРШРУТЫ АДМИН-ПАНЕЛИ
+@admin_router.route(BTN_ADMIN_BROADCAST)
+async def ask_broadcast_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await admin_states.set(update.effective_user.id, 'awaiting_broadcast')
+    await update.message.reply_text(
+        "📢 Введите текст для рассылки всем пользователям:",
+        reply_markup=admin_cancel_keyboard()
+    )
 
-    text = update.message.text
 
-    if text == '👥 Пользователи':
-        await admin_users(update, context)
-    elif text == '📦 Заказы':
-        await admin_orders(update, context)
-    elif text == '📢 Общая рассылка':
-        admin_states[user.id] = 'awaiting_broadcast'
-        await update.message.reply_text(
-            "📢 Введите текст для рассылки всем пользователям:",
-            reply_markup=admin_cancel_keyboard()
-        )
-    elif text == '🚪 Обычный режим':
-        admin_states.pop(user.id, None)
-        await update.message.reply_text("Вы перешли в обычный режим", reply_markup=main_keyboard())
-    elif text == '↩️ Назад в админ-панель':
-        admin_states[user.id] = 'admin_panel'
-        await update.message.reply_text("Возврат в админ-панель", reply_markup=admin_panel_keyboard())
-    elif text == '❌ Отмена':
-        admin_states[user.id] = 'admin_panel'
-        await update.message.reply_text("Действие отменено", reply_markup=admin_panel_keyboard())
-    elif text in ['📦 Все заказы', '✅ Готовые заказы', '🔄 Заказы в работе']:
-        await handle_orders_filter(update, context, text)
+@admin_router.route(BTN_ADMIN_EXIT)
+async def exit_admin_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await admin_states.pop(update.effective_user.id, None)
+    await update.message.reply_text("Вы перешли в обычный режим", reply_markup=main_keyboard())
+
+
+@admin_router.route(BTN_ADMIN_BACK)
+async def back_to_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await admin_states.set(update.effective_user.id, 'admin_panel')
+    await update.message.reply_text("Возврат в админ-панель", reply_markup=admin_panel_keyboard())
+
+
+@admin_router.route(BTN_ADMIN_CANCEL)
+async def cancel_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await admin_states.set(update.effective_user.id, 'admin_panel')
+    await update.message.reply_text("Действие отменено", reply_markup=admin_panel_keyboard())
+
 
+@admin_router.route(BTN_ORDERS_ALL, BTN_ORDERS_READY, BTN_ORDERS_WORKING)
+async def select_orders_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await handle_orders_filter(update, context, update.message.text)
 
+
+@admin_router.when(lambda text: text.startswith(BTN_ADMIN_REPLY_PREFIX))
+async def ask_reply_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка "Ответить" из списка активных пользователей"""
+    try:
+        match = re.search(r'ID: (\d+)\)', update.message.text)
+        if match:
+            user_id = int(match.group(1))
+            user_info = await adb.find_active_user(user_id, 1)
+
+            if user_info:
+                await admin_states.set(update.effective_user.id, {'mode': 'awaiting_reply', 'target_id': user_id})
+                await update.message.reply_text(
+                    f"💬 Введите текст ответа для пользователя {user_info['first_name']} (ID: {user_id}):",
+                    reply_markup=admin_cancel_keyboard()
+                )
+            else:
+                await update.message.reply_text("❌ Пользователь не найден", reply_markup=admin_panel_keyboard())
+        else:
+            await update.message.reply_text("❌ Ошибка формата", reply_markup=admin_panel_keyboard())
+    except (ValueError, IndexError):
+        await update.message.reply_text("❌ Ошибка формата", reply_markup=admin_panel_keyboard())
+
+
+@admin_router.route(BTN_ADMIN_ORDERS)
 async def admin_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if user.id != ADMIN_ID:
         return
 
-    admin_states[user.id] = 'admin_orders'
+    await admin_states.set(user.id, 'admin_orders')
     await update.message.reply_text(
         "📦 Управление заказами\n\nВыберите фильтр для просмотра заказов:",
         reply_markup=admin_orders_keyboard()
     )
 
 
-async def handle_orders_filter(update: Update, context: ContextTypes.DEFAULT_TYPE, filter_type: str):
-    user = update.effective_user
-    if user.id != ADMIN_ID:
-        return
+# Фильтры списка заказов: код в callback_data -> (заголовок, статус)
+ORDER_FILTERS = {
+    'a': (BTN_ORDERS_ALL, "all"),
+    'r': (BTN_ORDERS_READY, ORDER_STATUSES['ready']),
+    'w': (BTN_ORDERS_WORKING, ORDER_STATUSES['working']),
+}
+ORDER_FILTER_CODES = {title: code for code, (title, _) in ORDER_FILTERS.items()}
 
-    if filter_type == '📦 Все заказы':
-        orders = db.get_orders("all")
-        await show_orders_list(update, orders, "📦 Все заказы")
-    elif filter_type == '✅ Готовые заказы':
-        orders = db.get_orders(ORDER_STATUSES['ready'])
-        await show_orders_list(update, orders, "✅ Готовые заказы")
-    elif filter_type == '🔄 Заказы в работе':
-        orders = db.get_orders(ORDER_STATUSES['working'])
-        await show_individual_orders(update, orders, "🔄 Заказы в работе")
-    else:
-        return
 
+def parse_order_cursor(timestamp: str, order_id: str):
+    """Восстанавливает курсор (created_at, order_id) из callback_data"""
+    created_at = (f"{timestamp[0:4]}-{timestamp[4:6]}-{timestamp[6:8]} "
+                  f"{timestamp[8:10]}:{timestamp[10:12]}:{timestamp[12:14]}")
+    return created_at, int(order_id)
+
+
+async def render_orders_page(filter_code: str, after=None, before=None):
+    """Формирует текст и клавиатуру одной страницы заказов. Возвращает (None, None), если заказов нет"""
+    title, status = ORDER_FILTERS[filter_code]
+
+    # Берем на один заказ больше, чтобы понять, есть ли следующая страница
+    orders = await adb.get_orders(status, limit=ORDERS_PAGE_SIZE + 1, after=after, before=before)
+    if before is not None:
+        has_prev = len(orders) > ORDERS_PAGE_SIZE
+        orders = orders[-ORDERS_PAGE_SIZE:]
+        has_next = True
+    else:
+        has_next = len(orders) > ORDERS_PAGE_SIZE
+        orders = orders[:ORDERS_PAGE_SIZE]
+        has_prev = False
 
-async def show_orders_list(update: Update, orders: list, title: str):
     if not orders:
-        await update.message.reply_text(
-            f"❌ {title.split(' ')[1]} не найдены",
-            reply_markup=admin_orders_keyboard()
-        )
-        return
+        if after is not None or before is not None:
+            # Страница опустела (например, заказы удалены) — показываем первую
+            return await render_orders_page(filter_code)
+        return None, None
 
-    orders_text = f"{title} ({len(orders)} шт.):\n\n"
+    if after is not None:
+        # Курсор после действия с заказом указывает и на первую страницу — проверяем, есть ли заказы раньше
+        has_prev = bool(await adb.get_orders(status, limit=1, before=(orders[0]['created_at'], orders[0]['order_id'])))
 
-    for i, order in enumerate(orders, 1):
+    orders_text = f"{title}, заказы #{orders[0]['order_id']}–#{orders[-1]['order_id']}:\n\n"
+
+    for order in orders:
         orders_text += f"🔹 Заказ #{order['order_id']}\n"
         orders_text += f"👤 {order['first_name']}"
         if order['username']:
             orders_text += f" (@{order['username']})"
+        orders_text += f" | 🆔 {order['user_id']}"
         orders_text += f"\n📚 {order['subject']}\n"
         orders_text += f"🔢 Вариант: {order['variant']}\n"
         orders_text += f"📦 Тариф: {order['package']}\n"
@@ -401,49 +441,67 @@ async def show_orders_list(update: Update, orders: list, title: str):
         orders_text += f"⏰ {order['created_at'][:16]}\n"
 
         if order['admin_comment']:
-            orders_text += f"💬 {order['admin_comment']}\n"
+            # Длинные комментарии обрезаем, чтобы страница не превысила лимит сообщения Telegram
+            comment = order['admin_comment']
+            if len(comment) > 200:
+                comment = comment[:200] + '…'
+            orders_text += f"💬 {comment}\n"
 
         orders_text += "━━━━━━━━━━━━━━━━━━━━\n\n"
 
-    await update.message.reply_text(orders_text, reply_markup=admin_orders_keyboard())
+    with_actions = status == ORDER_STATUSES['working']
+    return orders_text, orders_page_keyboard(filter_code, orders, has_prev, has_next, with_actions)
 
 
-async def show_individual_orders(update: Update, orders: list, title: str):
-    if not orders:
+async def handle_orders_filter(update: Update, context: ContextTypes.DEFAULT_TYPE, filter_type: str):
+    user = update.effective_user
+    if user.id != ADMIN_ID:
+        return
+
+    filter_code = ORDER_FILTER_CODES.get(filter_type)
+    if not filter_code:
+        return
+
+    orders_text, reply_markup = await render_orders_page(filter_code)
+    if not orders_text:
         await update.message.reply_text(
-            f"❌ {title.split(' ')[1]} не найдены",
+            f"❌ {filter_type.split(' ')[1]} не найдены",
             reply_markup=admin_orders_keyboard()
         )
         return
 
-    await update.message.reply_text(f"{title} ({len(orders)} шт.):")
+    await update.message.reply_text(orders_text, reply_markup=reply_markup)
 
-    for order in orders:
-        order_text = f"""🔹 Заказ #{order['order_id']}
 
-👤 Пользователь:
-├ Имя: {order['first_name']}
-├ ID: {order['user_id']}
-└ @{order['username'] if order['username'] else 'нет'}
+async def handle_orders_page(update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
+    """Листает список заказов, редактируя то же сообщение"""
+    query = update.callback_query
 
-📋 Детали заказа:
-├ Предмет: {order['subject']}
-├ Вариант: {order['variant']}
-├ Тариф: {order['package']}
-├ Стоимость: {order['price']} руб.
-├ Статус: {order['status']}
-└ Создан: {order['created_at'][:16]}
+    try:
+        _, filter_code, direction, timestamp, order_id = callback_data.split('_')
+        cursor = parse_order_cursor(timestamp, order_id)
+    except ValueError:
+        await query.answer("❌ Ошибка формата")
+        return
 
-💬 Комментарий: {order['admin_comment'] or 'нет'}"""
+    if filter_code not in ORDER_FILTERS:
+        return
 
-        await update.message.reply_text(
-            order_text,
-            reply_markup=order_actions_keyboard(order['order_id'])
-        )
+    if direction == 'p':
+        orders_text, reply_markup = await render_orders_page(filter_code, before=cursor)
+    else:
+        orders_text, reply_markup = await render_orders_page(filter_code, after=cursor)
 
+    if not orders_text:
+        orders_text = f"❌ {ORDER_FILTERS[filter_code][0].split(' ')[1]} не найдены"
 
+    await query.edit_message_text(text=orders_text, reply_markup=reply_markup)
+
+
+@router.command("users")
+@admin_router.route(BTN_ADMIN_USERS)
 async def admin_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    active_users = db.get_active_users(24)
+    active_users = await adb.get_active_users(24)
 
     if not active_users:
         await update.message.reply_text("📭 Нет активных пользователей", reply_markup=admin_panel_keyboard())
@@ -461,21 +519,123 @@ async def admin_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     users_text += f"\n💡 Всего: {len(active_users)} пользователей"
     users_text += f"\n\n💬 Нажмите на кнопку ниже чтобы ответить пользователю"
 
-    await update.message.reply_text(users_text, reply_markup=admin_users_keyboard())
+    await update.message.reply_text(users_text, reply_markup=admin_users_keyboard(active_users))
 
 
+@router.command("stats")
 async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    stats = db.get_user_stats()
+    if update.effective_user.id != ADMIN_ID:
+        return
+
+    stats = await adb.get_user_stats()
+    summary = await adb.get_activity_summary(STATS_PERIOD_DAYS)
+
+    today, yesterday, period = stats['today'], stats['yesterday'], stats['period']
 
     stats_text = f"""📊 Статистика бота
 
-👥 Всего пользователей: {stats['total_users']}
-🔥 Активных за 24 часа: {stats['active_today']}
-📝 Текущих заказов: {stats['current_orders']}"""
+👥 Всего пользователей: {stats['total_users']} (новых сегодня: {today['new_users']})
+🔥 Активных сегодня: {stats['active_today']} (вчера: {yesterday['active_users']})
+👆 Действий сегодня: {today['actions']}
+📝 Текущих заказов: {stats['current_orders']} на {stats['revenue_total']} руб.
+🛒 Заказов сегодня: {today['orders']} на {today['revenue']} руб.
+
+📅 За {stats['days']} дн.: заказов {period['orders']} на {period['revenue']} руб., новых пользователей {period['new_users']}"""
+
+    if stats['orders_by_status']:
+        stats_text += "\n\n📝 Заказы по статусам:"
+        for status, count in stats['orders_by_status'].items():
+            stats_text += f"\n• {status}: {count}"
+
+    for title, breakdown in (("📚 По предметам", stats['revenue_by_subject']),
+                             ("📦 По тарифам", stats['revenue_by_package'])):
+        if breakdown:
+            stats_text += f"\n\n{title}:"
+            for name, (orders, revenue) in sorted(breakdown.items(), key=lambda item: -item[1][1]):
+                stats_text += f"\n• {name}: {orders} зак., {revenue} руб."
+
+    stats_text += f"\n\n📈 За {summary['days']} дн.: {summary['actions']} действий, {summary['users']} пользователей"
+    for activity_type, count in list(summary['by_type'].items())[:5]:
+        stats_text += f"\n• {activity_type}: {count}"
 
     await update.message.reply_text(stats_text, reply_markup=admin_panel_keyboard())
 
 
+@router.command("funnel")
+async def admin_funnel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Воронка заказа и выручка: /funnel, /funnel 7 или /funnel 2024-01-01 2024-01-31"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+
+    try:
+        date_from, date_to = parse_period(context.args)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\nИспользование: /funnel, /funnel 7 или /funnel 2024-01-01 2024-01-31"
+        )
+        return
+
+    await update.message.reply_text("⏳ Считаю воронку...")
+    report = await adb.run_report(build_report, adb.database, date_from, date_to)
+    await update.message.reply_text(format_report(report), reply_markup=admin_panel_keyboard())
+
+
+@router.command("export")
+async def admin_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выгрузка файлом: /export [orders|activities] [csv|jsonl] [gz] [дней]"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+
+    try:
+        options = parse_export_args(context.args)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\nИспользование: /export [orders|activities] [csv|jsonl] [gz] [дней]"
+        )
+        return
+
+    filename = export_filename(options['kind'], options['fmt'], options['compress'])
+    path = os.path.join(EXPORT_DIR or tempfile.gettempdir(), filename)
+    await update.message.reply_text("⏳ Готовлю выгрузку...")
+
+    try:
+        # Выгрузка держит соединение все время чтения — в потоке отчетов, а не в общих потоках чтения
+        result = await adb.run_report(
+            export_rows, adb.database, options['kind'], path, options['fmt'], options['compress'], options['days']
+        )
+        size_mb = result['bytes'] / 1024 / 1024
+        if size_mb > EXPORT_MAX_UPLOAD_MB:
+            await update.message.reply_text(
+                f"❌ Файл {size_mb:.1f} МБ больше лимита {EXPORT_MAX_UPLOAD_MB} МБ. "
+                f"Включите gz, сократите период или используйте exporter.py на сервере."
+            )
+            return
+
+        with open(path, 'rb') as document:
+            await update.message.reply_document(
+                document=document,
+                filename=filename,
+                caption=f"📦 {filename}: {result['rows']} строк за {result['seconds']} сек.",
+                write_timeout=EXPORT_UPLOAD_TIMEOUT
+            )
+    except Exception as e:
+        logger.error(f"❌ Ошибка выгрузки {options['kind']}: {e}")
+        await update.message.reply_text(f"❌ Ошибка выгрузки: {e}")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@router.command("metrics")
+async def admin_metrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сводка метрик: самые медленные обработчики, методы базы и вызовы Bot API"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+
+    await update.message.reply_text(metrics.summary(), reply_markup=admin_panel_keyboard())
+
+
+@router.command("reply")
 async def admin_reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if user.id != ADMIN_ID:
@@ -493,8 +653,7 @@ async def admin_reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         success = await send_message_to_user(context, target_user_id, reply_text, update)
 
         if success:
-            active_users = db.get_active_users(1)
-            target_user_info = active_users.get(target_user_id, {})
+            target_user_info = await adb.find_active_user(target_user_id, 1) or {}
             user_name = target_user_info.get('first_name', 'Неизвестный пользователь')
             success_msg = f"✅ Ответ отправлен пользователю {user_name} (ID: {target_user_id})"
             await update.message.reply_text(success_msg, reply_markup=admin_panel_keyboard())
@@ -543,8 +702,7 @@ async def admin_reply_underscore(update: Update, context: ContextTypes.DEFAULT_T
         success = await send_message_to_user(context, target_user_id, reply_text, update)
 
         if success:
-            active_users = db.get_active_users(1)
-            target_user_info = active_users.get(target_user_id, {})
+            target_user_info = await adb.find_active_user(target_user_id, 1) or {}
             user_name = target_user_info.get('first_name', 'Неизвестный пользователь')
             success_msg = f"✅ Ответ отправлен пользователю {user_name} (ID: {target_user_id})"
             await update.message.reply_text(success_msg, reply_markup=admin_panel_keyboard())
@@ -571,11 +729,10 @@ async def handle_inline_buttons(update: Update, context: ContextTypes.DEFAULT_TY
     if callback_data.startswith('quick_reply_'):
         try:
             user_id = int(callback_data.split('_')[2])
-            active_users = db.get_active_users(1)
+            user_info = await adb.find_active_user(user_id, 1)
 
-            if user_id in active_users:
-                admin_states[user.id] = {'mode': 'awaiting_reply', 'target_id': user_id}
-                user_info = active_users[user_id]
+            if user_info:
+                await admin_states.set(user.id, {'mode': 'awaiting_reply', 'target_id': user_id})
 
                 await query.edit_message_text(
                     text=query.message.text + f"\n\n🔄 Режим ответа для {user_info['first_name']} активирован",
@@ -603,6 +760,9 @@ async def handle_inline_buttons(update: Update, context: ContextTypes.DEFAULT_TY
     elif callback_data.startswith('order_'):
         await handle_order_actions(update, context, callback_data)
 
+    elif callback_data.startswith('opage_'):
+        await handle_orders_page(update, context, callback_data)
+
 
 async def handle_order_actions(update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
     """Обрабатывает действия с заказами"""
@@ -614,16 +774,23 @@ async def handle_order_actions(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     try:
-        action, order_id = callback_data.split('_')[1], int(callback_data.split('_')[2])
+        parts = callback_data.split('_')
+        action, order_id = parts[1], int(parts[2])
+
+        # Кнопка со страницы списка заказов: после действия перерисовываем эту страницу
+        page = None
+        if len(parts) == 6 and parts[3] in ORDER_FILTERS:
+            page = parts[3], parse_order_cursor(parts[4], parts[5])
 
         if action == 'ready':
-            success = db.update_order_status(order_id, ORDER_STATUSES['ready'])
-            if success:
+            order = await adb.update_order_status_returning(order_id, ORDER_STATUSES['ready'])
+            if order:
                 # Уведомляем пользователя
-                orders = db.get_orders("all")
-                target_order = next((o for o in orders if o['order_id'] == order_id), None)
-                if target_order:
-                    await notify_user_order_status(context, target_order['user_id'], order_id, ORDER_STATUSES['ready'])
+                await notify_user_order_status(context, order['user_id'], order_id, ORDER_STATUSES['ready'])
+
+                if page:
+                    await refresh_orders_page(query, *page)
+                    return
 
                 # Удаляем сообщение с заказом
                 await query.delete_message()
@@ -636,8 +803,12 @@ async def handle_order_actions(update: Update, context: ContextTypes.DEFAULT_TYP
                 )
 
         elif action == 'delete':
-            success = db.delete_order(order_id)
+            success = await adb.delete_order(order_id)
             if success:
+                if page:
+                    await refresh_orders_page(query, *page)
+                    return
+
                 # Удаляем сообщение с заказом
                 await query.delete_message()
 
@@ -657,201 +828,107 @@ async def handle_order_actions(update: Update, context: ContextTypes.DEFAULT_TYP
         )
 
 
+async def refresh_orders_page(query, filter_code: str, cursor):
+    """Перерисовывает страницу заказов после действия с заказом"""
+    orders_text, reply_markup = await render_orders_page(filter_code, after=cursor)
+    if not orders_text:
+        orders_text = f"❌ {ORDER_FILTERS[filter_code][0].split(' ')[1]} не найдены"
+    await query.edit_message_text(text=orders_text, reply_markup=reply_markup)
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    text = update.message.text
 
-    db.save_user(user.id, user.first_name, user.username)
+    await adb.save_user(user.id, user.first_name, user.username)
 
     # Проверяем специальные состояния админа
-    if user.id == ADMIN_ID and admin_states.get(user.id):
-        state = admin_states.get(user.id)
-
+    state = await admin_states.get(user.id) if user.id == ADMIN_ID else None
+    if state:
         if state == 'awaiting_broadcast':
             await handle_admin_broadcast(update, context)
         elif isinstance(state, dict) and state.get('mode') == 'awaiting_reply':
             await handle_admin_reply(update, context)
         elif isinstance(state, dict) and state.get('mode') == 'order_comment':
             await handle_order_comment(update, context)
-        elif text.startswith('💬 Ответить'):
-            try:
-                match = re.search(r'ID: (\d+)\)', text)
-                if match:
-                    user_id = int(match.group(1))
-                    active_users = db.get_active_users(1)
-
-                    if user_id in active_users:
-                        admin_states[user.id] = {'mode': 'awaiting_reply', 'target_id': user_id}
-                        user_info = active_users[user_id]
-                        await update.message.reply_text(
-                            f"💬 Введите текст ответа для пользователя {user_info['first_name']} (ID: {user_id}):",
-                            reply_markup=admin_cancel_keyboard()
-                        )
-                    else:
-                        await update.message.reply_text("❌ Пользователь не найден", reply_markup=admin_panel_keyboard())
-                else:
-                    await update.message.reply_text("❌ Ошибка формата", reply_markup=admin_panel_keyboard())
-            except (ValueError, IndexError):
-                await update.message.reply_text("❌ Ошибка формата", reply_markup=admin_panel_keyboard())
         else:
-            await handle_admin_buttons(update, context)
+            await admin_router.dispatch(update, context)
         return
 
-    # Обработка сообщений пользователя
-    if text == '📚 Предметы':
-        db.save_user_activity(user.id, "menu_click", "Предметы")
-        await handle_subjects(update, context)
+    # Обработка сообщений пользователя по таблице маршрутов
+    await router.dispatch(update, context)
 
-    elif text == '✏️ Ввести вариант':
-        db.save_user_activity(user.id, "menu_click", "Ввести вариант")
-        await update.message.reply_text(
-            "✏️ Введите номер вашего варианта:\n\nНапример: 27, 15, 8 и т.д.\n\n(просто отправьте номер в чат)",
-            reply_markup=subject_selected_keyboard()
-        )
 
-    elif text in ['🏗️ БАЗОВЫЙ', '📊 СТАНДАРТ', '💎 ИНДИВИДУАЛЬНЫЙ']:
-        db.save_user_activity(user.id, "menu_click", f"Выбор тарифа: {text}")
-        package_map = {
-            '🏗️ БАЗОВЫЙ': 'basic',
-            '📊 СТАНДАРТ': 'standard',
-            '💎 ИНДИВИДУАЛЬНЫЙ': 'individual'
-        }
-        package_key = package_map.get(text)
-        if package_key:
-            await handle_package_selection(update, context, package_key)
-
-    elif text == '📞 Заказать консультацию':
-        db.save_user_activity(user.id, "menu_click", "Заказать консультацию")
-        await handle_consultation(update, context)
-
-    elif text == '📞 Связаться с менеджером':
-        db.save_user_activity(user.id, "menu_click", "Связаться с менеджером")
-        await update.message.reply_text(
-            "👤 Наш менеджер: @struct_bot_admin\n\n💬 Напишите ему прямо сейчас для консультации!",
-            reply_markup=consultation_keyboard()
-        )
+# МАРШРУТЫ ПОЛЬЗОВАТЕЛЯ
+router.use(activity_middleware(adb.save_user_activity))
 
-    elif text == '🛒 Корзина':
-        db.save_user_activity(user.id, "menu_click", "Корзина")
-        await handle_cart(update, context)
 
-    elif text == '✅ Оформить заказ':
-        db.save_user_activity(user.id, "menu_click", "Оформить заказ")
-        await create_order_from_cart(update, context)
+@router.route(BTN_ENTER_VARIANT, activity="Ввести вариант")
+async def ask_variant(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "✏️ Введите номер вашего варианта:\n\nНапример: 27, 15, 8 и т.д.\n\n(просто отправьте номер в чат)",
+        reply_markup=subject_selected_keyboard()
+    )
 
-    elif text in SUBJECTS:
-        db.save_user_activity(user.id, "subject_selected", text)
-        await handle_subject_selection(update, context, text)
 
-    elif text in ['↩️ Назад в меню', '🏠 В главное меню']:
-        db.save_user_activity(user.id, "menu_click", "Главное меню")
-        await start(update, context)
+@router.route(*PACKAGE_BUTTONS, activity="Выбор тарифа: {text}")
+async def select_package(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await handle_package_selection(update, context, PACKAGE_BUTTONS[update.message.text])
 
-    elif text == '↩️ К выбору предмета':
-        db.save_user_activity(user.id, "menu_click", "К выбору предмета")
-        await handle_subjects(update, context)
 
-    elif text == '↩️ Назад к тарифам':
-        db.save_user_activity(user.id, "menu_click", "Назад к тарифам")
-        selection = db.get_user_selection(user.id)
-        if selection and selection.get('subject') and selection.get('variant'):
-            await show_service_packages(update, context, selection['subject'], selection['variant'])
-        else:
-            await handle_subjects(update, context)
+@router.route(BTN_CONTACT_MANAGER, activity="Связаться с менеджером")
+async def contact_manager(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "👤 Наш менеджер: @struct_bot_admin\n\n💬 Напишите ему прямо сейчас для консультации!",
+        reply_markup=consultation_keyboard()
+    )
+
+
+@router.route(*SUBJECTS, activity_type="subject_selected")
+async def select_subject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await handle_subject_selection(update, context, update.message.text)
 
-    elif text == '↩️ Назад':
-        db.save_user_activity(user.id, "menu_click", "Назад")
-        selection = db.get_user_selection(user.id)
-        if selection and selection.get('subject'):
-            await handle_subject_selection(update, context, selection['subject'])
-        else:
-            await handle_subjects(update, context)
-
-    elif text == '🧹 Очистить корзину':
-        db.save_user_activity(user.id, "menu_click", "Очистить корзину")
-        await clear_chat(update, context)
-
-    elif text == 'ℹ️ Гарантии':
-        db.save_user_activity(user.id, "menu_click", "Гарантии")
-        guarantees_text = (
-            "*Наши гарантии* 🛡️\n\n"
-            "Мы уверены в качестве нашей работы и поэтому предоставляем четкие гарантии:\n\n"
-            "• *Сроки* — работа будет готова строго к оговоренной дате\n"
-            "• *Качество* — полное соответствие вашим требованиям и стандартам вуза\n"
-            "• *Уникальность* — каждый проект создается индивидуально для вас\n"
-            "• *Правки* — оперативно вносим корректировки по вашим замечаниям\n"
-            "• *Конфиденциальность* — ваши данные защищены\n\n"
-            "*Наше правило:* если что\-то пойдет не так — мы решим без лишних вопросов\.\n\n"
-            "✅ *Ваш результат и спокойствие — наш главный приоритет\!*"
-        )
-        await send_message_with_notify(update, context, guarantees_text, parse_mode='MarkdownV2')
-
-    elif text == '💰 Цены':
-        db.save_user_activity(user.id, "menu_click", "Цены")
-        price_text = (
-            "🏗️ *Тариф «БАЗОВЫЙ»* — надежный фундамент вашей работы\n"
-            "Идеален, если вы хорошо разбираетесь в теме, но хотите сэкономить время на оформлении и базовых расчетах\.\n\n"
-            "• *Теоретическая часть* — чтобы работа была глубокой и аргументированной\n"
-            "• *Основные расчеты* — чтобы все цифры были точными и обоснованными\n"
-            "• *Оформление по ГОСТ* — чтобы не пришлось переделывать «из\-за точек и запятых»\n\n"
-            "*💰 Стоимость для вашего предмета:*\n"
-            "🏛️ Архитектура — 3000 руб\.\n"
-            "♨️ ТГВ — 2000 руб\.\n"
-            "📐 ТСП — 2500 руб\.\n"
-            "💧 ВиВ — 2800 руб\.\n\n"
-            "*Это ваш выбор, если:* вы уверены в своих силах, но цените своё время и хотите прочной основы для отличной работы\.\n\n\n\n"
-            "📊 *Тариф «СТАНДАРТ»* — готовое решение «под ключ»\n"
-            "Всё, что нужно для уверенной сдачи, включая возможность корректировок\.\n\n"
-            "• *Всё из тарифа «Базовый»* — теория, расчеты, безупречное оформление\n"
-            "• *Чертежи* — профессиональные схемы и чертежи для вашего проекта\n"
-            "• *Правки и доработки* — возможность внести корректировки по замечаниям преподавателя\n\n"
-            "*💰 Стоимость для вашего предмета:*\n"
-            "🏛️ Архитектура — 5000 руб\.\n"
-            "♨️ ТГВ — 4000 руб\.\n"
-            "📐 ТСП — 4500 руб\.\n"
-            "💧 ВиВ — 4800 руб\.\n\n"
-            "*Это ваш выбор, если:* вам нужна полностью готовая работа с возможностью адаптировать её под требования преподавателя\.\n\n\n\n"
-            "💎 *Тариф «ИНДИВИДУАЛЬНЫЙ»* — ваш персональный проект с гарантией результата\n"
-            "Максимум поддержки и внимания к деталям\. Для тех, кто хочет идеальный результат без компромиссов\.\n\n"
-            "• *Полное сопровождение* — от согласования плана до подготовки к защите\n"
-            "• *Персональный куратор* — эксперт на связи, чтобы ответить на любой вопрос и помочь с любыми правками\n"
-            "• *Неограниченные правки* — вносим изменения столько, сколько нужно, пока вы не будете довольны на 100%\n"
-            "• *Приоритетное выполнение* — ваша работа выполняется вне очереди, чтобы вы точно уложились в срок\n\n"
-            "*💰 Стоимость для вашего предмета:*\n"
-            "🏛️ Архитектура — 7000 руб\.\n"
-            "♨️ ТГВ — 6000 руб\.\n"
-            "📐 ТСП — 6500 руб\.\n"
-            "💧 ВиВ — 6800 руб\.\n\n"
-            "*Это ваш выбор, если:* для вас важна не просто сдача, а высший балл, полное спокойствие и уверенность на каждом этапе\.\n\n"
-            "🎯 *Нужна помощь с выбором?*\n"
-            "Просто напишите нам свою тему и предмет — вместе подберем лучший вариант для вашего успеха\! 😊"
-        )
-        await send_message_with_notify(update, context, price_text, parse_mode='MarkdownV2')
-
-    elif text == '👨‍🎓 О нас':
-        db.save_user_activity(user.id, "menu_click", "О нас")
-        about_text = (
-            "*Мы — команда специалистов в строительных дисциплинах* 🏗️\n\n"
-            "🏫 *Работаем для студентов 1\-3 курсов*\n\n"
-            "📝 *Наше правило:* никаких готовых работ\. Каждый проект создаем *с нуля* под ваши требования ✅\n\n"
-            "🛡️ *Гарантируем:*\n"
-            "• *Качество* работ\n"
-            "• Полное *соответствие стандартам*\n"
-            "• *Индивидуальный подход*\n\n"
-            "🎯 *Ваша сдача — наша общая цель\!*\n\n"
-            "💪 *Убедитесь сами — доверьте нам свою курсовую\!* 😊"
-        )
-        await send_message_with_notify(update, context, about_text, parse_mode='MarkdownV2')
 
-    elif text == '📞 Контакты':
-        db.save_user_activity(user.id, "menu_click", "Контакты")
-        await send_message_with_notify(update, context,
-                                       "📞 Наши контакты:\n\n👤 Менеджер: @struct_bot_admin\n📧 Email: struct.bot@mail.ru",
-                                       "Контакты")
+@router.route(BTN_BACK_TO_PACKAGES, activity="Назад к тарифам")
+async def back_to_packages(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    selection = await adb.get_user_selection(update.effective_user.id)
+    if selection and selection.get('subject') and selection.get('variant'):
+        await show_service_packages(update, context, selection['subject'], selection['variant'])
+    else:
+        await handle_subjects(update, context)
+
 
+@router.route(BTN_BACK, activity="Назад")
+async def back_to_subject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    selection = await adb.get_user_selection(update.effective_user.id)
+    if selection and selection.get('subject'):
+        await handle_subject_selection(update, context, selection['subject'])
     else:
-        db.save_user_activity(user.id, "unknown_message", text)
-        await send_message_with_notify(update, context, "Пожалуйста, используй кнопки меню 👆", text)
+        await handle_subjects(update, context)
+
+
+@router.route(BTN_GUARANTEES, activity="Гарантии")
+async def show_guarantees(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_message_with_notify(update, context, catalog.guarantees, parse_mode='MarkdownV2')
+
+
+@router.route(BTN_PRICES, activity="Цены")
+async def show_prices(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_message_with_notify(update, context, catalog.prices, parse_mode='MarkdownV2')
+
+
+@router.route(BTN_ABOUT, activity="О нас")
+async def show_about(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_message_with_notify(update, context, catalog.about, parse_mode='MarkdownV2')
+
+
+@router.route(BTN_CONTACTS, activity="Контакты")
+async def show_contacts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_message_with_notify(update, context, catalog.contacts, "Контакты")
+
+
+@router.fallback(activity_type="unknown_message")
+async def unknown_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_message_with_notify(update, context, "Пожалуйста, используй кнопки меню 👆", update.message.text)
 
 
 async def handle_order_comment(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -860,19 +937,19 @@ async def handle_order_comment(update: Update, context: ContextTypes.DEFAULT_TYP
     if user.id != ADMIN_ID:
         return
 
-    state = admin_states.get(user.id)
+    state = await admin_states.get(user.id)
     if isinstance(state, dict) and state.get('mode') == 'order_comment':
         order_id = state.get('order_id')
         comment = update.message.text
 
-        if comment == '❌ Отмена':
-            admin_states[user.id] = 'admin_panel'
+        if comment == BTN_ADMIN_CANCEL:
+            await admin_states.set(user.id, 'admin_panel')
             await update.message.reply_text("Добавление комментария отменено", reply_markup=admin_panel_keyboard())
             return
 
-        success = db.update_order_comment(order_id, comment)
+        success = await adb.update_order_comment(order_id, comment)
         if success:
-            admin_states[user.id] = 'admin_panel'
+            await admin_states.set(user.id, 'admin_panel')
             await update.message.reply_text(
                 f"✅ Комментарий добавлен к заказу #{order_id}",
                 reply_markup=admin_panel_keyboard()
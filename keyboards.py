@@ -1,93 +1,115 @@
+import re
+from functools import lru_cache
 from telegram import ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
+from routing import (
+    BTN_SUBJECTS, BTN_GUARANTEES, BTN_PRICES, BTN_ABOUT, BTN_CART, BTN_CONTACTS, BTN_CLEAR_CART,
+    BTN_BACK_TO_MENU, BTN_HOME, BTN_ENTER_VARIANT, BTN_TO_SUBJECTS, BTN_PACKAGE_BASIC, BTN_PACKAGE_STANDARD,
+    BTN_PACKAGE_INDIVIDUAL, BTN_CONSULTATION, BTN_BACK, BTN_CONTACT_MANAGER, BTN_BACK_TO_PACKAGES, BTN_CHECKOUT,
+    BTN_ADMIN_USERS, BTN_ADMIN_ORDERS, BTN_ADMIN_BROADCAST, BTN_ADMIN_EXIT, BTN_ADMIN_BACK, BTN_ADMIN_CANCEL,
+    BTN_ORDERS_ALL, BTN_ORDERS_READY, BTN_ORDERS_WORKING, BTN_ADMIN_REPLY_PREFIX
+)
+from config import SUBJECTS, KEYBOARD_CACHE_SIZE
+
+
+# Статические клавиатуры создаются один раз: объекты telegram неизменяемы, их можно переиспользовать
+MAIN_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_SUBJECTS, BTN_GUARANTEES],
+    [BTN_PRICES, BTN_ABOUT],
+    [BTN_CART, BTN_CONTACTS],
+    [BTN_CLEAR_CART]
+], resize_keyboard=True)
+
+# Предметы по 2 в ряд
+SUBJECTS_KEYBOARD = ReplyKeyboardMarkup(
+    [SUBJECTS[i:i + 2] for i in range(0, len(SUBJECTS), 2)] + [[BTN_BACK_TO_MENU]],
+    resize_keyboard=True
+)
+
+SUBJECT_SELECTED_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_ENTER_VARIANT],
+    [BTN_TO_SUBJECTS, BTN_HOME]
+], resize_keyboard=True)
+
+SERVICE_PACKAGES_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_PACKAGE_BASIC, BTN_PACKAGE_STANDARD],
+    [BTN_PACKAGE_INDIVIDUAL, BTN_CONSULTATION],
+    [BTN_BACK]
+], resize_keyboard=True)
+
+CONSULTATION_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_CONTACT_MANAGER],
+    [BTN_BACK_TO_PACKAGES]
+], resize_keyboard=True)
+
+CART_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_CHECKOUT],
+    [BTN_BACK_TO_MENU]
+], resize_keyboard=True)
+
+ADMIN_PANEL_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_ADMIN_USERS, BTN_ADMIN_ORDERS],
+    [BTN_ADMIN_BROADCAST, BTN_ADMIN_EXIT]
+], resize_keyboard=True)
+
+ADMIN_CANCEL_KEYBOARD = ReplyKeyboardMarkup([[BTN_ADMIN_CANCEL]], resize_keyboard=True)
+
+ADMIN_ORDERS_KEYBOARD = ReplyKeyboardMarkup([
+    [BTN_ORDERS_ALL, BTN_ORDERS_READY],
+    [BTN_ORDERS_WORKING, BTN_ADMIN_BACK]
+], resize_keyboard=True)
 
 
 def main_keyboard():
-    keyboard = [
-        ['📚 Предметы', 'ℹ️ Гарантии'],
-        ['💰 Цены', '👨‍🎓 О нас'],
-        ['🛒 Корзина', '📞 Контакты'],
-        ['🧹 Очистить корзину']
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return MAIN_KEYBOARD
 
 
 def subjects_keyboard():
-    from config import SUBJECTS
-    keyboard = []
-
-    # Разбиваем предметы по 2 в ряд
-    for i in range(0, len(SUBJECTS), 2):
-        row = SUBJECTS[i:i + 2]
-        keyboard.append(row)
-
-    keyboard.append(['↩️ Назад в меню'])
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return SUBJECTS_KEYBOARD
 
 
 def subject_selected_keyboard():
     """Клавиатура после выбора предмета"""
-    return ReplyKeyboardMarkup([
-        ['✏️ Ввести вариант'],
-        ['↩️ К выбору предмета', '🏠 В главное меню']
-    ], resize_keyboard=True)
+    return SUBJECT_SELECTED_KEYBOARD
 
 
 def service_packages_keyboard():
     """Клавиатура с тарифами"""
-    return ReplyKeyboardMarkup([
-        ['🏗️ БАЗОВЫЙ', '📊 СТАНДАРТ'],
-        ['💎 ИНДИВИДУАЛЬНЫЙ', '📞 Заказать консультацию'],
-        ['↩️ Назад']
-    ], resize_keyboard=True)
+    return SERVICE_PACKAGES_KEYBOARD
 
 
 def consultation_keyboard():
     """Клавиатура для консультации"""
-    return ReplyKeyboardMarkup([
-        ['📞 Связаться с менеджером'],
-        ['↩️ Назад к тарифам']
-    ], resize_keyboard=True)
+    return CONSULTATION_KEYBOARD
 
 
 def cart_keyboard():
     """Клавиатура для корзины"""
-    return ReplyKeyboardMarkup([
-        ['✅ Оформить заказ'],
-        ['↩️ Назад в меню']
-    ], resize_keyboard=True)
+    return CART_KEYBOARD
 
 
 def admin_panel_keyboard():
-    return ReplyKeyboardMarkup([
-        ['👥 Пользователи', '📦 Заказы'],
-        ['📢 Общая рассылка', '🚪 Обычный режим']
-    ], resize_keyboard=True)
+    return ADMIN_PANEL_KEYBOARD
 
 
 def admin_cancel_keyboard():
-    return ReplyKeyboardMarkup([['❌ Отмена']], resize_keyboard=True)
-
+    return ADMIN_CANCEL_KEYBOARD
 
-def admin_users_keyboard():
-    from database import db
-    active_users = db.get_active_users(24)
 
+def admin_users_keyboard(active_users):
     keyboard = []
     for user_id, user_info in active_users.items():
-        keyboard.append([f"💬 Ответить {user_info.get('first_name', 'Пользователю')} (ID: {user_id})"])
+        keyboard.append([f"{BTN_ADMIN_REPLY_PREFIX} {user_info.get('first_name', 'Пользователю')} (ID: {user_id})"])
 
-    keyboard.append(['↩️ Назад в админ-панель'])
+    keyboard.append([BTN_ADMIN_BACK])
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
 
 def admin_orders_keyboard():
     """Клавиатура для управления заказами"""
-    return ReplyKeyboardMarkup([
-        ['📦 Все заказы', '✅ Готовые заказы'],
-        ['🔄 Заказы в работе', '↩️ Назад в админ-панель']
-    ], resize_keyboard=True)
+    return ADMIN_ORDERS_KEYBOARD
 
 
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def order_actions_keyboard(order_id):
     """Инлайн клавиатура для действий с заказом"""
     return InlineKeyboardMarkup([
@@ -98,10 +120,47 @@ def order_actions_keyboard(order_id):
     ])
 
 
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def quick_reply_inline_keyboard(user_id, user_name):
     return InlineKeyboardMarkup([
         [InlineKeyboardButton(
             f"💬 Ответить {user_name}",
             callback_data=f"quick_reply_{user_id}"
         )]
-    ])
\ No newline at end of file
+    ])
+
+
+def order_cursor_token(created_at, order_id):
+    """Курсор страницы заказов для callback_data: время без разделителей и номер заказа"""
+    return f"{re.sub(r'[^0-9]', '', created_at)[:14]}_{order_id}"
+
+
+def orders_page_keyboard(filter_code, orders, has_prev, has_next, with_actions=False):
+    """Инлайн клавиатура страницы заказов: действия с заказами и навигация"""
+    keyboard = []
+    first, last = orders[0], orders[-1]
+
+    if with_actions:
+        # Курсор "с первого заказа страницы включительно", чтобы после действия перерисовать ту же страницу
+        page = f"{filter_code}_{order_cursor_token(first['created_at'], first['order_id'] - 1)}"
+        for order in orders:
+            keyboard.append([
+                InlineKeyboardButton(f"✅ #{order['order_id']} Готов",
+                                     callback_data=f"order_ready_{order['order_id']}_{page}"),
+                InlineKeyboardButton(f"🗑️ #{order['order_id']} Удалить",
+                                     callback_data=f"order_delete_{order['order_id']}_{page}")
+            ])
+
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(
+            "◀️ Назад", callback_data=f"opage_{filter_code}_p_{order_cursor_token(first['created_at'], first['order_id'])}"
+        ))
+    if has_next:
+        navigation.append(InlineKeyboardButton(
+            "Вперед ▶️", callback_data=f"opage_{filter_code}_n_{order_cursor_token(last['created_at'], last['order_id'])}"
+        ))
+    if navigation:
+        keyboard.append(navigation)
+
+    return InlineKeyboardMarkup(keyboard) if keyboard else None
@@ -1,12 +1,23 @@
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
+from telegram.ext import Application, BaseUpdateProcessor, MessageHandler, filters, CallbackQueryHandler
+from telegram.request import BaseRequest, HTTPXRequest
 
-from config import BOT_TOKEN, ADMIN_ID
-from handlers import (
-    start, handle_message, handle_inline_buttons,
-    admin_panel, admin_users, admin_stats, admin_reply_command, admin_reply_underscore,
-    create_order_from_cart, handle_variant_input, handle_consultation, handle_cart, clear_chat
+from admin_notifier import admin_notifier
+from async_db import adb
+from broadcast_jobs import broadcast_worker
+from config import (
+    BOT_TOKEN, ADMIN_ID, BOT_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL,
+    WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, CONCURRENT_UPDATES, TELEGRAM_API_URL, DB_PROFILE, DB_PROFILE_FILE,
+    UPDATE_PER_USER_ORDER
 )
+from database import db
+from handlers import handle_message, handle_inline_buttons, admin_reply_underscore
+from metrics import metrics
+from query_profiler import query_profiler
+from retention import retention_job
+from routing import router, admin_router
+from state_store import state_store
+from update_processor import PerUserUpdateProcessor
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -14,44 +25,105 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+async def on_startup(application: Application):
+    """Запускает фоновую запись в базу, уведомления админа, очистку журнала, сервер метрик и возобновляет рассылки"""
+    metrics.start_server()
+    await adb.start()
+    admin_notifier.start(application.bot)
+    retention_job.start(adb, state_store)
+    await broadcast_worker.start(application.bot)
+
+
+async def on_shutdown(application: Application):
+    """Отправляет оставшиеся уведомления, дожидается отложенных записей в базу и закрывает соединения"""
+    await broadcast_worker.stop()
+    await admin_notifier.stop()
+    await retention_job.stop()
+    await adb.close()
+    db.close()
+    if DB_PROFILE and DB_PROFILE_FILE:
+        query_profiler.save(DB_PROFILE_FILE)
+    metrics.stop_server()
+
+
+def build_application(request: BaseRequest = None, get_updates_request: BaseRequest = None,
+                      update_processor: BaseUpdateProcessor = None) -> Application:
+    """Создает приложение со всеми обработчиками; request подменяет сетевой слой (нагрузочные тесты)"""
+    if update_processor is None and CONCURRENT_UPDATES > 1 and UPDATE_PER_USER_ORDER:
+        update_processor = PerUserUpdateProcessor()
+
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .concurrent_updates(update_processor or CONCURRENT_UPDATES)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    # Вызовы Bot API замеряются оберткой сетевого слоя (пул по умолчанию, как у PTB);
+    # долгий опрос getUpdates не замеряется
+    if metrics.enabled:
+        request = metrics.instrument_request(request or HTTPXRequest(connection_pool_size=256))
+    if request is not None:
+        builder = builder.request(request)
+    if get_updates_request is not None:
+        builder = builder.get_updates_request(get_updates_request)
+    application = builder.build()
+
+    # Команды и единый обработчик текстовых сообщений из таблицы маршрутов
+    router.register(application, handle_message)
+
+    # Обработчик инлайн-кнопок
+    application.add_handler(CallbackQueryHandler(handle_inline_buttons))
+
+    # Обработчик для команд с подчеркиванием
+    application.add_handler(MessageHandler(
+        filters.TEXT & filters.User(ADMIN_ID) & filters.Regex(r'^/reply_\d+'),
+        admin_reply_underscore
+    ))
+
+    # Метрики: обертки ставятся после регистрации всех обработчиков (без METRICS_ENABLED ничего не делают)
+    metrics.instrument_application(application)
+    metrics.instrument_router(router)
+    metrics.instrument_router(admin_router)
+    metrics.instrument_database(db)
+    metrics.collect('activity_buffer', adb.activities.metrics)
+    metrics.collect('profile_cache', adb.profiles.metrics)
+    metrics.collect('admin_notifier', admin_notifier.metrics)
+    metrics.collect('retention', retention_job.metrics)
+    if isinstance(application.update_processor, PerUserUpdateProcessor):
+        metrics.collect('updates', application.update_processor.metrics)
+    if DB_PROFILE:
+        metrics.collect('db_profile', query_profiler.metrics)
+
+    return application
+
+
 def main():
     try:
-        application = Application.builder().token(BOT_TOKEN).build()
-
-        # ОБЯЗАТЕЛЬНО: Обработчик для ввода варианта ДОЛЖЕН БЫТЬ ПЕРВЫМ
-        application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND & filters.Regex(r'^\d+$'),
-            handle_variant_input
-        ))
-
-        # Обработчики для пользователей
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-
-        # Обработчик инлайн-кнопок
-        application.add_handler(CallbackQueryHandler(handle_inline_buttons))
-
-        # Команды админа
-        application.add_handler(CommandHandler("admin", admin_panel))
-        application.add_handler(CommandHandler("users", admin_users))
-        application.add_handler(CommandHandler("stats", admin_stats))
-        application.add_handler(CommandHandler("reply", admin_reply_command))
-
-        # Обработчик для команд с подчеркиванием
-        application.add_handler(MessageHandler(
-            filters.TEXT & filters.User(ADMIN_ID) & filters.Regex(r'^/reply_\d+'),
-            admin_reply_underscore
-        ))
-
-        # Обработчик для оформления заказа
-        application.add_handler(MessageHandler(
-            filters.TEXT & filters.Regex(r'^✅ Оформить заказ$'),
-            create_order_from_cart
-        ))
+        application = build_application()
 
         print("✅ Бот активен!")
 
-        application.run_polling()
+        # При остановке сначала закрывается прием обновлений, затем дорабатываются
+        # уже принятые, и только после этого on_shutdown сбрасывает буферы и закрывает базу
+        if BOT_MODE == 'webhook':
+            if not WEBHOOK_URL:
+                raise ValueError("Для BOT_MODE=webhook нужно указать WEBHOOK_URL")
+
+            logger.info(f"🌐 Webhook: {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}, "
+                        f"параллельных обновлений: {CONCURRENT_UPDATES}")
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None,
+                max_connections=WEBHOOK_MAX_CONNECTIONS
+            )
+        else:
+            application.run_polling()
 
     except Exception as e:
         logger.error(f"❌ Ошибка: {e}")
@@ -0,0 +1,404 @@
+"""Метрики бота в текстовом формате Prometheus
+
+Собираются задержки обработчиков обновлений (bot_handler_seconds) и
+маршрутов кнопок внутри них (bot_route_seconds), число и время вызовов
+методов Database (bot_db_calls_total, bot_db_seconds), время вызовов Bot API
+(bot_api_seconds) и ошибки каждого уровня. Метрики компонентов (буфер
+активностей, уведомления админа, свертка журнала) снимаются при выдаче.
+
+Инструментирование включается METRICS_ENABLED=1 и ставится один раз при
+сборке приложения (main.build_application). Если метрики выключены, обертки
+не ставятся вовсе и накладных расходов нет. Метрики отдаются по HTTP на
+METRICS_LISTEN:METRICS_PORT/metrics и сводкой по команде админа /metrics.
+"""
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import BaseRequest
+
+from config import METRICS_ENABLED, METRICS_LISTEN, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм, секунд
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Служебные методы Database, которые не оборачиваются
+DB_SKIP_METHODS = frozenset({'get_connection', 'close', 'init_db'})
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Счетчик с метками; безопасен для вызова из потоков базы"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как в клиенте Prometheus"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float('inf'),)
+        # метки -> [счетчики корзин (не накопительные), сумма, количество]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = len(self.buckets) - 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def series(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def quantile(self, q: float, counts: List[int], count: int) -> float:
+        """Оценка квантиля по верхней границе корзины"""
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound if bound != float('inf') else self.buckets[-2]
+        return self.buckets[-2]
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self.series().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class InstrumentedRequest(BaseRequest):
+    """Сетевой слой бота, который замеряет каждый вызов Bot API и передает его исходному"""
+
+    def __init__(self, request: BaseRequest, registry: 'Metrics'):
+        self.request = request
+        self.registry = registry
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.request.read_timeout
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await self.request.do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+                connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+        except Exception as e:
+            self.registry.api_errors.inc(api_method, type(e).__name__)
+            raise
+        finally:
+            self.registry.api_seconds.observe(time.perf_counter() - started, api_method)
+
+        if code != 200:
+            self.registry.api_errors.inc(api_method, str(code))
+        return code, payload
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Отдает метрики по GET /metrics"""
+
+    registry: 'Metrics' = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Metrics:
+    """Реестр метрик бота и обертки, которые их собирают"""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.monotonic()
+        self._metrics: List[Any] = []
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._instrumented = set()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._server_thread: Optional[threading.Thread] = None
+
+        self.handler_seconds = self.histogram(
+            'bot_handler_seconds', "Время обработки обновления обработчиком", ('handler',))
+        self.handler_errors = self.counter(
+            'bot_handler_errors_total', "Исключения в обработчиках", ('handler', 'error'))
+        self.route_seconds = self.histogram(
+            'bot_route_seconds', "Время обработчика маршрута текстового сообщения", ('router', 'route'))
+        self.db_calls = self.counter(
+            'bot_db_calls_total', "Вызовы методов Database", ('method',))
+        self.db_seconds = self.histogram(
+            'bot_db_seconds', "Время выполнения метода Database в потоке базы", ('method',))
+        self.db_errors = self.counter(
+            'bot_db_errors_total', "Исключения в методах Database", ('method', 'error'))
+        self.api_seconds = self.histogram(
+            'bot_api_seconds', "Время вызова Bot API", ('method',))
+        self.api_errors = self.counter(
+            'bot_api_errors_total', "Ошибки вызовов Bot API: исключения и коды ответа", ('method', 'error'))
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, component: str, source: Callable[[], Dict[str, Any]]):
+        """Добавляет метрики компонента: числовые значения source() выдаются как gauge bot_<component>_<ключ>"""
+        self._collectors[component] = source
+
+    def _timed_async(self, func, histogram: Histogram, errors: Counter, *labels: str):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except ApplicationHandlerStop:
+                raise
+            except Exception as e:
+                errors.inc(*labels, type(e).__name__)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+
+    def _timed_db(self, func, name: str):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.db_calls.inc(name)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                self.db_errors.inc(name, type(e).__name__)
+                raise
+            finally:
+                self.db_seconds.observe(time.perf_counter() - started, name)
+        return wrapper
+
+    def _once(self, target) -> bool:
+        """Не дает обернуть один объект дважды"""
+        if id(target) in self._instrumented:
+            return False
+        self._instrumented.add(id(target))
+        return True
+
+    def instrument_application(self, application):
+        """Оборачивает обработчики всех групп приложения; вызывать после регистрации обработчиков"""
+        if not self.enabled or not self._once(application):
+            return
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                handler.callback = self._timed_async(
+                    handler.callback, self.handler_seconds, self.handler_errors, handler.callback.__name__
+                )
+
+    def instrument_router(self, router):
+        """Оборачивает обработчики маршрутов текстовых сообщений"""
+        if not self.enabled or not self._once(router):
+            return
+        router.wrap_handlers(lambda handler: self._timed_async(
+            handler, self.route_seconds, self.handler_errors, router.name, handler.__name__
+        ))
+
+    def instrument_database(self, database):
+        """Оборачивает методы экземпляра Database: число вызовов, время и исключения по методам"""
+        if not self.enabled or not self._once(database):
+            return
+        for name, method in inspect.getmembers(type(database), inspect.isfunction):
+            # Генераторы (stream_query) выполняются по частям — время вызова ничего не говорит
+            if name.startswith('_') or name in DB_SKIP_METHODS or inspect.isgeneratorfunction(method):
+                continue
+            setattr(database, name, self._timed_db(getattr(database, name), name))
+
+    def instrument_request(self, request: BaseRequest) -> BaseRequest:
+        """Возвращает сетевой слой с замером вызовов Bot API"""
+        if not self.enabled:
+            return request
+        return InstrumentedRequest(request, self)
+
+    def _component_lines(self) -> List[str]:
+        lines = []
+        for component, source in self._collectors.items():
+            try:
+                values = source()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сбора метрик {component}: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    name = f"bot_{component}_{key}"
+                    lines.extend([f"# TYPE {name} gauge", f"{name} {_format_value(value)}"])
+        return lines
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = [
+            "# HELP bot_uptime_seconds Время с запуска процесса",
+            "# TYPE bot_uptime_seconds gauge",
+            f"bot_uptime_seconds {time.monotonic() - self.started_at:.3f}",
+        ]
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        lines.extend(self._component_lines())
+        return '\n'.join(lines) + '\n'
+
+    def _top(self, histogram: Histogram, top: int) -> List[str]:
+        """Строки сводки по самым затратным сериям гистограммы: вызовов, среднее и p95"""
+        series = sorted(histogram.series().items(), key=lambda item: -item[1][1])[:top]
+        lines = []
+        for labels, (counts, total, count) in series:
+            p95 = histogram.quantile(0.95, counts, count)
+            lines.append(f"• {' / '.join(labels)}: {count}, {total / count * 1000:.1f} мс, p95 ≤ {p95 * 1000:g} мс")
+        return lines
+
+    def summary(self, top: int = 8) -> str:
+        """Сводка для админа: самые затратные обработчики, методы базы и вызовы Bot API"""
+        if not self.enabled:
+            return "📈 Метрики выключены. Включите METRICS_ENABLED=1 и перезапустите бота."
+
+        text = f"📈 Метрики за {(time.monotonic() - self.started_at) / 60:.0f} мин. (вызовов, среднее, p95)"
+        for title, histogram in (("⏱ Обработчики", self.handler_seconds),
+                                 ("🧭 Маршруты", self.route_seconds),
+                                 ("🗄 База данных", self.db_seconds),
+                                 ("🌐 Bot API", self.api_seconds)):
+            lines = self._top(histogram, top)
+            if lines:
+                text += f"\n\n{title}:\n" + '\n'.join(lines)
+
+        errors = [(f"{kind} {' / '.join(labels)}", count)
+                  for kind, counter in (('обработчик', self.handler_errors), ('база', self.db_errors),
+                                        ('Bot API', self.api_errors))
+                  for labels, count in counter.values().items()]
+        if errors:
+            text += "\n\n❌ Ошибки:\n" + '\n'.join(
+                f"• {name}: {count:g}" for name, count in sorted(errors, key=lambda item: -item[1])[:top]
+            )
+
+        if self._server is not None:
+            host, port = self._server.server_address[:2]
+            text += f"\n\n🔗 http://{host}:{port}/metrics"
+        return text
+
+    def start_server(self, listen: str = METRICS_LISTEN, port: int = METRICS_PORT):
+        """Запускает HTTP-сервер метрик в фоновом потоке (порт 0 — без сервера)"""
+        if not self.enabled or not port or self._server is not None:
+            return
+
+        handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'registry': self})
+        try:
+            self._server = ThreadingHTTPServer((listen, port), handler)
+        except OSError as e:
+            logger.error(f"❌ Не удалось запустить сервер метрик на {listen}:{port}: {e}")
+            return
+
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+        self._server_thread.start()
+        logger.info(f"📈 Метрики: http://{listen}:{port}/metrics")
+
+    def stop_server(self):
+        """Останавливает HTTP-сервер метрик"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+        self._server = None
+        self._server_thread = None
+
+
+# Глобальный реестр метрик
+metrics = Metrics()
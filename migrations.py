@@ -0,0 +1,529 @@
+"""Версионные миграции схемы базы данных
+
+Текущая версия схемы хранится в PRAGMA user_version. Каждая миграция
+применяется в своей транзакции и содержит проверки EXPLAIN QUERY PLAN
+для горячих запросов, которые она ускоряет.
+
+Проверка планов запросов на рабочей базе:
+    python migrations.py [путь_к_базе]
+"""
+import logging
+import sys
+from typing import List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueryPlanCheck(NamedTuple):
+    """Запрос и индекс, который он обязан использовать"""
+    name: str
+    sql: str
+    params: Tuple
+    expected_index: str
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+    checks: List[QueryPlanCheck]
+
+
+# Таблицы счетчиков статистики и их пересчет из данных: при миграции 5 и после массовой
+# загрузки с отключенными триггерами (generate_database.py)
+STATS_TABLES = ['stats_counters', 'stats_daily', 'daily_active_users', 'order_stats']
+
+STATS_BACKFILL = [
+    '''
+    INSERT OR REPLACE INTO stats_counters (name, value)
+    SELECT 'users', COUNT(*) FROM users
+    ''',
+    '''
+    INSERT OR REPLACE INTO order_stats (subject, package, status, orders, revenue)
+    SELECT subject, package, COALESCE(status, ''), COUNT(*), SUM(price)
+    FROM orders
+    GROUP BY subject, package, COALESCE(status, '')
+    ''',
+    '''
+    INSERT OR IGNORE INTO daily_active_users (day, user_id)
+    SELECT DISTINCT date(created_at), user_id FROM user_activities
+    ''',
+    '''
+    INSERT OR REPLACE INTO stats_daily (day, active_users, actions)
+    SELECT day, COUNT(DISTINCT user_id), SUM(actions) FROM (
+        SELECT date(created_at) as day, user_id, COUNT(*) as actions
+        FROM user_activities
+        GROUP BY date(created_at), user_id
+        UNION ALL
+        SELECT day, user_id, SUM(count) FROM activity_daily GROUP BY day, user_id
+    )
+    GROUP BY day
+    ''',
+    '''
+    INSERT INTO stats_daily (day, new_users)
+    SELECT date(created_at), COUNT(*) FROM users
+    WHERE created_at IS NOT NULL
+    GROUP BY date(created_at)
+    ON CONFLICT (day) DO UPDATE SET new_users = excluded.new_users
+    ''',
+    '''
+    INSERT INTO stats_daily (day, orders, revenue)
+    SELECT date(created_at), COUNT(*), SUM(price) FROM orders
+    WHERE created_at IS NOT NULL
+    GROUP BY date(created_at)
+    ON CONFLICT (day) DO UPDATE SET orders = excluded.orders, revenue = excluded.revenue
+    ''',
+]
+
+MIGRATIONS = [
+    Migration(
+        version=1,
+        description="Индексы для активных пользователей, статистики и списка заказов",
+        statements=[
+            # get_active_users и get_user_stats: диапазон по времени, COUNT(DISTINCT user_id) без обращения к таблице
+            'CREATE INDEX IF NOT EXISTS idx_user_activities_created_user ON user_activities (created_at, user_id)',
+            # История конкретного пользователя
+            'CREATE INDEX IF NOT EXISTS idx_user_activities_user_created ON user_activities (user_id, created_at)',
+            # get_orders с фильтром: поиск по статусу сразу в порядке created_at, без сортировки
+            'CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)',
+            # get_orders("all"): обход в порядке created_at
+            'CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)',
+        ],
+        checks=[
+            QueryPlanCheck(
+                name="get_active_users",
+                sql='''
+                    SELECT u.user_id, u.first_name, u.username, ua.activity_type, ua.message_text,
+                           ua.bot_response, MAX(ua.created_at) as last_activity_time
+                    FROM users u
+                    JOIN user_activities ua ON u.user_id = ua.user_id
+                    WHERE ua.created_at > datetime('now', ?)
+                    GROUP BY u.user_id
+                    ORDER BY last_activity_time DESC
+                ''',
+                params=('-24 hours',),
+                expected_index='idx_user_activities_created_user'
+            ),
+            QueryPlanCheck(
+                name="get_active_user",
+                sql='''
+                    SELECT u.first_name, u.username, ua.activity_type, ua.message_text, ua.created_at
+                    FROM user_activities ua
+                    JOIN users u ON u.user_id = ua.user_id
+                    WHERE ua.user_id = ? AND ua.created_at > datetime('now', ?)
+                    ORDER BY ua.created_at DESC
+                    LIMIT 1
+                ''',
+                params=(1, '-1 hours'),
+                expected_index='idx_user_activities_user_created'
+            ),
+            QueryPlanCheck(
+                name="get_user_stats: active_today",
+                sql='''
+                    SELECT COUNT(DISTINCT user_id) as active_today
+                    FROM user_activities
+                    WHERE created_at > datetime('now', '-24 hours')
+                ''',
+                params=(),
+                expected_index='COVERING INDEX idx_user_activities_created_user'
+            ),
+            QueryPlanCheck(
+                name="get_orders(status)",
+                sql='''
+                    SELECT o.*, u.first_name, u.username
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.user_id
+                    WHERE o.status = ?
+                    ORDER BY o.created_at ASC, o.order_id ASC
+                ''',
+                params=('🔄 В работе',),
+                expected_index='idx_orders_status_created'
+            ),
+            QueryPlanCheck(
+                name="get_orders(status, after) — страница",
+                sql='''
+                    SELECT o.*, u.first_name, u.username
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.user_id
+                    WHERE o.status = ? AND (o.created_at, o.order_id) > (?, ?)
+                    ORDER BY o.created_at ASC, o.order_id ASC
+                    LIMIT ?
+                ''',
+                params=('🔄 В работе', '2024-01-01 00:00:00', 0, 6),
+                expected_index='idx_orders_status_created (status=? AND created_at>?)'
+            ),
+            QueryPlanCheck(
+                name="get_orders(all)",
+                sql='''
+                    SELECT o.*, u.first_name, u.username
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.user_id
+                    ORDER BY o.created_at ASC, o.order_id ASC
+                ''',
+                params=(),
+                expected_index='idx_orders_created'
+            ),
+        ]
+    ),
+    Migration(
+        version=2,
+        description="Задания рассылки с курсором и состоянием доставки по каждому получателю",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                total INTEGER NOT NULL DEFAULT 0,
+                cursor INTEGER NOT NULL DEFAULT 0,
+                status_chat_id INTEGER,
+                status_message_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                job_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_id, user_id),
+                FOREIGN KEY (job_id) REFERENCES broadcast_jobs (job_id)
+            ) WITHOUT ROWID
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)',
+        ],
+        checks=[
+            QueryPlanCheck(
+                name="claim_broadcast_recipients",
+                sql='''
+                    SELECT user_id FROM broadcast_recipients
+                    WHERE job_id = ? AND user_id > ? AND state = 'pending'
+                    ORDER BY user_id
+                    LIMIT ?
+                ''',
+                params=(1, 0, 100),
+                expected_index='PRIMARY KEY'
+            ),
+        ]
+    ),
+    Migration(
+        version=3,
+        description="Состояния диалогов админа и пользователей",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS conversation_states (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            ''',
+            # Очистка просроченных состояний
+            'CREATE INDEX IF NOT EXISTS idx_conversation_states_expires ON conversation_states (expires_at)',
+        ],
+        checks=[
+            QueryPlanCheck(
+                name="state_store.get",
+                sql='''
+                    SELECT value, expires_at FROM conversation_states
+                    WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)
+                ''',
+                params=('admin', '1', 0.0),
+                expected_index='PRIMARY KEY'
+            ),
+        ]
+    ),
+    Migration(
+        version=4,
+        description="Дневные итоги активности для свертки старого журнала",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS activity_daily (
+                day TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                activity_type TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                first_at TIMESTAMP,
+                last_at TIMESTAMP,
+                PRIMARY KEY (day, user_id, activity_type)
+            ) WITHOUT ROWID
+            ''',
+        ],
+        checks=[
+            QueryPlanCheck(
+                name="rollup_activities_chunk: выбор пачки",
+                sql='''
+                    SELECT id FROM user_activities
+                    WHERE created_at < ?
+                    ORDER BY created_at
+                    LIMIT ?
+                ''',
+                params=('2024-01-01 00:00:00', 2000),
+                expected_index='COVERING INDEX idx_user_activities_created_user'
+            ),
+            QueryPlanCheck(
+                name="get_activity_summary: итоги",
+                sql='''
+                    SELECT activity_type, SUM(count) FROM activity_daily
+                    WHERE day >= date('now', ?)
+                    GROUP BY activity_type
+                ''',
+                params=('-29 days',),
+                expected_index='PRIMARY KEY'
+            ),
+            QueryPlanCheck(
+                name="get_activity_daily_chunk: воронка по итогам",
+                sql='''
+                    SELECT day, user_id, activity_type, count FROM activity_daily
+                    WHERE (day, user_id, activity_type) > (?, ?, ?)
+                      AND day < ?
+                      AND activity_type IN (?, ?)
+                    ORDER BY day, user_id, activity_type
+                    LIMIT ?
+                ''',
+                params=('2024-01-01', 0, '', '2024-02-01', 'cart_view', 'order_created', 5000),
+                expected_index='PRIMARY KEY'
+            ),
+            QueryPlanCheck(
+                name="get_activities_chunk: воронка по журналу",
+                sql='''
+                    SELECT id, user_id, activity_type FROM user_activities
+                    WHERE id > ? AND id <= ?
+                      AND +created_at >= ? AND +created_at < ?
+                      AND activity_type IN (?, ?)
+                    ORDER BY id
+                    LIMIT ?
+                ''',
+                params=(0, 100, '2024-01-01 00:00:00', '2024-02-01 00:00:00', 'cart_view', 'order_created', 5000),
+                expected_index='INTEGER PRIMARY KEY'
+            ),
+        ]
+    ),
+    Migration(
+        version=5,
+        description="Счетчики статистики, которые триггеры обновляют при каждой записи",
+        statements=[
+            '''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS stats_daily (
+                day TEXT PRIMARY KEY,
+                active_users INTEGER NOT NULL DEFAULT 0,
+                actions INTEGER NOT NULL DEFAULT 0,
+                new_users INTEGER NOT NULL DEFAULT 0,
+                orders INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            ''',
+            # Кто уже был активен в этот день: по ней триггер считает active_users без COUNT(DISTINCT)
+            '''
+            CREATE TABLE IF NOT EXISTS daily_active_users (
+                day TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                PRIMARY KEY (day, user_id)
+            ) WITHOUT ROWID
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS order_stats (
+                subject TEXT NOT NULL,
+                package TEXT NOT NULL,
+                status TEXT NOT NULL,
+                orders INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (subject, package, status)
+            ) WITHOUT ROWID
+            ''',
+
+            # Начальные значения из уже накопленных данных
+            *STATS_BACKFILL,
+
+            # Пользователи: upsert в save_user по существующему пользователю вызывает только UPDATE
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert AFTER INSERT ON users
+            BEGIN
+                INSERT INTO stats_counters (name, value) VALUES ('users', 1)
+                ON CONFLICT (name) DO UPDATE SET value = value + 1;
+                INSERT INTO stats_daily (day, new_users) VALUES (date(NEW.created_at), 1)
+                ON CONFLICT (day) DO UPDATE SET new_users = new_users + 1;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+            BEGIN
+                UPDATE stats_counters SET value = value - 1 WHERE name = 'users';
+            END
+            ''',
+            # Активности: удаление при свертке журнала счетчики не уменьшает — это история
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_user_activities_stats_insert AFTER INSERT ON user_activities
+            BEGIN
+                INSERT INTO stats_daily (day, actions, active_users)
+                VALUES (
+                    date(NEW.created_at), 1,
+                    NOT EXISTS (
+                        SELECT 1 FROM daily_active_users
+                        WHERE day = date(NEW.created_at) AND user_id = NEW.user_id
+                    )
+                )
+                ON CONFLICT (day) DO UPDATE SET
+                    actions = actions + 1,
+                    active_users = active_users + excluded.active_users;
+                INSERT OR IGNORE INTO daily_active_users (day, user_id) VALUES (date(NEW.created_at), NEW.user_id);
+            END
+            ''',
+            # Заказы: order_stats отражает текущие заказы, stats_daily — оформленные за день
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_orders_stats_insert AFTER INSERT ON orders
+            BEGIN
+                INSERT INTO order_stats (subject, package, status, orders, revenue)
+                VALUES (NEW.subject, NEW.package, COALESCE(NEW.status, ''), 1, NEW.price)
+                ON CONFLICT (subject, package, status) DO UPDATE SET
+                    orders = orders + 1,
+                    revenue = revenue + excluded.revenue;
+                INSERT INTO stats_daily (day, orders, revenue) VALUES (date(NEW.created_at), 1, NEW.price)
+                ON CONFLICT (day) DO UPDATE SET
+                    orders = orders + 1,
+                    revenue = revenue + excluded.revenue;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_orders_stats_update AFTER UPDATE OF subject, package, status, price ON orders
+            BEGIN
+                UPDATE order_stats SET orders = orders - 1, revenue = revenue - OLD.price
+                WHERE subject = OLD.subject AND package = OLD.package AND status = COALESCE(OLD.status, '');
+                INSERT INTO order_stats (subject, package, status, orders, revenue)
+                VALUES (NEW.subject, NEW.package, COALESCE(NEW.status, ''), 1, NEW.price)
+                ON CONFLICT (subject, package, status) DO UPDATE SET
+                    orders = orders + 1,
+                    revenue = revenue + excluded.revenue;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_orders_stats_delete AFTER DELETE ON orders
+            BEGIN
+                UPDATE order_stats SET orders = orders - 1, revenue = revenue - OLD.price
+                WHERE subject = OLD.subject AND package = OLD.package AND status = COALESCE(OLD.status, '');
+            END
+            ''',
+        ],
+        checks=[
+            QueryPlanCheck(
+                name="get_user_stats: дни",
+                sql='''
+                    SELECT * FROM stats_daily
+                    WHERE day >= date('now', ?)
+                    ORDER BY day DESC
+                ''',
+                params=('-6 days',),
+                expected_index='PRIMARY KEY'
+            ),
+            QueryPlanCheck(
+                name="trg_user_activities_stats_insert: был ли активен",
+                sql='''
+                    SELECT 1 FROM daily_active_users
+                    WHERE day = ? AND user_id = ?
+                ''',
+                params=('2024-01-01', 1),
+                expected_index='PRIMARY KEY'
+            ),
+        ]
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn) -> int:
+    """Применяет недостающие миграции и возвращает итоговую версию схемы"""
+    current = get_schema_version(conn)
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+
+        try:
+            conn.execute('BEGIN')
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {migration.version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"❌ Ошибка применения миграции {migration.version}: {migration.description}")
+            raise
+
+        current = migration.version
+        logger.info(f"✅ Применена миграция {migration.version}: {migration.description}")
+
+    return current
+
+
+def rebuild_stats(conn):
+    """Пересчитывает счетчики статистики из данных; транзакцией управляет вызывающий"""
+    for table in STATS_TABLES:
+        conn.execute(f'DELETE FROM {table}')
+    for statement in STATS_BACKFILL:
+        conn.execute(statement)
+
+
+def explain(conn, sql: str, params: Tuple = ()) -> List[str]:
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def check_query_plans(conn) -> List[str]:
+    """Проверяет, что горячие запросы используют индексы примененных миграций
+
+    Возвращает список описаний нарушений; пустой список — все планы в порядке.
+    """
+    current = get_schema_version(conn)
+    failures = []
+
+    for migration in MIGRATIONS:
+        if migration.version > current:
+            continue
+        for check in migration.checks:
+            plan = explain(conn, check.sql, check.params)
+            if not any(check.expected_index in line for line in plan):
+                failures.append(
+                    f"Миграция {migration.version}, {check.name}: ожидался {check.expected_index}, план: {plan}"
+                )
+
+    return failures
+
+
+if __name__ == '__main__':
+    db_file = sys.argv[1] if len(sys.argv) > 1 else 'bot_database.db'
+
+    from database import Database
+    database = Database(db_file)
+    conn = database.get_connection()
+
+    try:
+        print(f"📐 Версия схемы: {get_schema_version(conn)} (последняя: {LATEST_VERSION})")
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+        database.close()
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+
+    print("✅ Все горячие запросы используют индексы")
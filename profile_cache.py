@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from typing import Any, Dict
+
+from config import PROFILE_CACHE_SIZE
+
+
+class ProfileCache:
+    """Кэш профилей пользователей (имя и username), уже сохраненных в базе
+
+    Позволяет писать пользователя в базу только при первом появлении
+    после запуска и при смене имени или username. Давно не писавшие
+    пользователи вытесняются, когда кэш заполнен.
+    """
+
+    def __init__(self, max_entries: int = PROFILE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._profiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def is_saved(self, user_id: int, first_name: str, username: str = None) -> bool:
+        """Проверяет, что в базе уже лежит именно такой профиль"""
+        profile = self._profiles.get(user_id)
+        if profile == (first_name, username):
+            self._profiles.move_to_end(user_id)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def remember(self, user_id: int, first_name: str, username: str = None):
+        """Запоминает профиль, успешно записанный в базу"""
+        if self.max_entries <= 0:
+            return
+        self._profiles[user_id] = (first_name, username)
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def forget(self, user_id: int):
+        self._profiles.pop(user_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает счетчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._profiles),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
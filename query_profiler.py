@@ -0,0 +1,256 @@
+"""Профилировщик запросов Database и журнал медленных запросов
+
+Включается DB_PROFILE=1 (или передачей профилировщика в Database): пул
+выдает курсоры ProfilingCursor, которые замеряют каждый оператор — от
+execute до первого fetch*, то есть вместе с чтением результата (при чтении
+пачками fetchmany — до первой пачки). Для каждого метода Database и текста
+оператора копятся число выполнений, суммарное и максимальное время;
+DB_PROFILE_TOP самых медленных выполнений хранятся с параметрами и планом
+EXPLAIN QUERY PLAN. Операторы дольше DB_SLOW_QUERY_MS пишутся в лог.
+
+Отчет выводит check_db.py --profile (прогон основных запросов по файлу базы)
+или check_db.py --report файл (отчет, сохраненный ботом в DB_PROFILE_FILE).
+"""
+import json
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import DB_SLOW_QUERY_MS, DB_PROFILE_TOP
+
+logger = logging.getLogger(__name__)
+
+# Операторы, для которых имеет смысл EXPLAIN QUERY PLAN
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+MAX_PARAMS_LENGTH = 200
+
+
+def normalize_sql(sql: str) -> str:
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Курсор, который сообщает профилировщику время каждого оператора"""
+
+    def __init__(self, connection: sqlite3.Connection, profiler: 'QueryProfiler'):
+        super().__init__(connection)
+        self._profiler = profiler
+        # (sql, параметры, секунды, executemany) последнего оператора, еще не переданного профилировщику
+        self._pending: Optional[Tuple[str, Any, float, bool]] = None
+
+    def _finish(self, extra: float = 0.0):
+        if self._pending is not None:
+            sql, params, seconds, many = self._pending
+            self._pending = None
+            self._profiler.record(self.connection, sql, params, seconds + extra, many)
+
+    def _run(self, method, sql: str, params, many: bool):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            method(sql, params)
+        except Exception:
+            self._pending = (sql, params, time.perf_counter() - started, many)
+            self._finish()
+            raise
+        self._pending = (sql, params, time.perf_counter() - started, many)
+        # Оператор без результата (запись, BEGIN, COMMIT) уже выполнен целиком
+        if self.description is None:
+            self._finish()
+        return self
+
+    def execute(self, sql: str, parameters=()):
+        return self._run(super().execute, sql, parameters, False)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters, True)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._finish(time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class QueryProfiler:
+    """Время операторов по методам Database, самые медленные выполнения и их планы"""
+
+    def __init__(self, slow_ms: float = DB_SLOW_QUERY_MS, top_n: int = DB_PROFILE_TOP,
+                 caller_module: str = 'database'):
+        self.slow_ms = slow_ms
+        self.top_n = top_n
+        self.caller_module = caller_module
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает накопленную статистику"""
+        with self._lock:
+            # (метод, оператор) -> [выполнений, секунд всего, максимум секунд]
+            self._statements: Dict[Tuple[str, str], list] = {}
+            self._slowest: List[Dict[str, Any]] = []
+            self._plans: Dict[str, List[str]] = {}
+            self.slow_total = 0
+            self.started_at = time.time()
+
+    def cursor(self, connection: sqlite3.Connection) -> ProfilingCursor:
+        """Фабрика курсоров для sqlite3.Connection.cursor()"""
+        return ProfilingCursor(connection, self)
+
+    def _caller(self) -> str:
+        """Ближайший по стеку метод модуля Database"""
+        frame = sys._getframe(2)
+        while frame is not None:
+            if frame.f_globals.get('__name__') == self.caller_module:
+                return frame.f_code.co_name
+            frame = frame.f_back
+        return '?'
+
+    def _explain(self, connection: sqlite3.Connection, sql: str, params, many: bool) -> List[str]:
+        if sql in self._plans:
+            return self._plans[sql]
+        if many or not sql.upper().startswith(EXPLAINABLE):
+            return []
+        try:
+            rows = connection.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+            plan = [row[3] for row in rows]
+        except sqlite3.Error as e:
+            plan = [f"не удалось получить план: {e}"]
+        self._plans[sql] = plan
+        return plan
+
+    def record(self, connection: sqlite3.Connection, sql: str, params, seconds: float, many: bool = False):
+        """Учитывает выполнение оператора"""
+        method = self._caller()
+        sql = normalize_sql(sql)
+        ms = seconds * 1000
+
+        with self._lock:
+            stats = self._statements.get((method, sql))
+            if stats is None:
+                stats = self._statements[(method, sql)] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            is_top = len(self._slowest) < self.top_n or ms > self._slowest[-1]['ms']
+            if ms >= self.slow_ms:
+                self.slow_total += 1
+
+        if ms >= self.slow_ms:
+            logger.warning(f"🐢 Медленный запрос {ms:.1f} мс в {method}: {sql[:300]} {self._format_params(params, many)}")
+        if not is_top:
+            return
+
+        # План запрашивается вне блокировки и один раз на текст оператора
+        entry = {
+            'ms': round(ms, 3),
+            'method': method,
+            'sql': sql,
+            'params': self._format_params(params, many),
+            'plan': self._explain(connection, sql, params, many),
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._lock:
+            self._slowest.append(entry)
+            self._slowest.sort(key=lambda item: -item['ms'])
+            del self._slowest[self.top_n:]
+
+    @staticmethod
+    def _format_params(params, many: bool) -> str:
+        if many:
+            return 'executemany'
+        text = repr(tuple(params) if isinstance(params, list) else params)
+        return text if len(text) <= MAX_PARAMS_LENGTH else text[:MAX_PARAMS_LENGTH] + '...'
+
+    def report(self) -> Dict[str, Any]:
+        """Отчет: итоги по методам, операторы по суммарному времени и самые медленные выполнения"""
+        with self._lock:
+            statements = [
+                {'method': method, 'sql': sql, 'count': count, 'total_ms': round(total * 1000, 3),
+                 'avg_ms': round(total / count * 1000, 3), 'max_ms': round(peak * 1000, 3)}
+                for (method, sql), (count, total, peak) in self._statements.items()
+            ]
+            slowest = [dict(entry) for entry in self._slowest]
+            slow_total = self.slow_total
+
+        methods: Dict[str, Dict[str, Any]] = {}
+        for statement in statements:
+            summary = methods.setdefault(statement['method'], {'statements': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            summary['statements'] += statement['count']
+            summary['total_ms'] = round(summary['total_ms'] + statement['total_ms'], 3)
+            summary['max_ms'] = max(summary['max_ms'], statement['max_ms'])
+
+        statements.sort(key=lambda item: -item['total_ms'])
+        return {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'slow_ms': self.slow_ms,
+            'slow_total': slow_total,
+            'methods': dict(sorted(methods.items(), key=lambda item: -item[1]['total_ms'])),
+            'statements': statements,
+            'slowest': slowest,
+        }
+
+    def save(self, path: str):
+        """Сохраняет отчет в JSON для check_db.py --report"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        logger.info(f"💾 Профиль запросов сохранен в {path}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает итоги профилирования"""
+        with self._lock:
+            return {
+                'statements': sum(count for count, _, _ in self._statements.values()),
+                'total_ms': round(sum(total for _, total, _ in self._statements.values()) * 1000, 3),
+                'slow_total': self.slow_total,
+            }
+
+
+def format_report(report: Dict[str, Any], top: int = 10) -> str:
+    """Текст отчета профилировщика"""
+    statements = report['statements']
+    lines = [
+        f"🔍 Профиль запросов с {report['started_at']}: {sum(s['count'] for s in statements)} операторов, "
+        f"медленнее {report['slow_ms']:g} мс: {report['slow_total']}",
+        "",
+        f"{'Метод Database':<32}{'операторов':>11}{'всего, мс':>12}{'макс., мс':>11}",
+    ]
+    for method, summary in report['methods'].items():
+        lines.append(f"{method:<32}{summary['statements']:>11}{summary['total_ms']:>12.1f}{summary['max_ms']:>11.2f}")
+
+    lines += ["", "📊 Операторы по суммарному времени:"]
+    for statement in statements[:top]:
+        lines.append(f"  {statement['total_ms']:.1f} мс = {statement['count']} × {statement['avg_ms']:.2f} мс "
+                     f"(макс. {statement['max_ms']:.2f}) {statement['method']}: {statement['sql'][:150]}")
+
+    lines += ["", "🐢 Самые медленные выполнения:"]
+    for number, entry in enumerate(report['slowest'][:top], 1):
+        lines.append(f"  {number}. {entry['ms']:.2f} мс {entry['method']} ({entry['at']})")
+        lines.append(f"     {entry['sql'][:300]}")
+        lines.append(f"     параметры: {entry['params']}")
+        for step in entry['plan']:
+            lines.append(f"     план: {step}")
+    return '\n'.join(lines)
+
+
+# Глобальный профилировщик, который подключается к пулу при DB_PROFILE=1
+query_profiler = QueryProfiler()
@@ -0,0 +1,151 @@
+"""Каталог готовых текстов ответов
+
+Тексты информационных экранов, приветствия и тарифов собираются один раз
+при запуске (и при reload() после изменения цен в config) уже с
+экранированием MarkdownV2, поэтому обработчики отправляют готовую строку.
+Подставляются на лету только имя пользователя и номер варианта.
+"""
+from telegram.helpers import escape_markdown
+
+import config
+
+GUARANTEES_TEXT = (
+    "*Наши гарантии* 🛡️\n\n"
+    "Мы уверены в качестве нашей работы и поэтому предоставляем четкие гарантии:\n\n"
+    "• *Сроки* — работа будет готова строго к оговоренной дате\n"
+    "• *Качество* — полное соответствие вашим требованиям и стандартам вуза\n"
+    "• *Уникальность* — каждый проект создается индивидуально для вас\n"
+    "• *Правки* — оперативно вносим корректировки по вашим замечаниям\n"
+    "• *Конфиденциальность* — ваши данные защищены\n\n"
+    "*Наше правило:* если что\\-то пойдет не так — мы решим без лишних вопросов\\.\n\n"
+    "✅ *Ваш результат и спокойствие — наш главный приоритет\\!*"
+)
+
+
+ABOUT_TEXT = (
+    "*Мы — команда специалистов в строительных дисциплинах* 🏗️\n\n"
+    "🏫 *Работаем для студентов 1\\-3 курсов*\n\n"
+    "📝 *Наше правило:* никаких готовых работ\\. Каждый проект создаем *с нуля* под ваши требования ✅\n\n"
+    "🛡️ *Гарантируем:*\n"
+    "• *Качество* работ\n"
+    "• Полное *соответствие стандартам*\n"
+    "• *Индивидуальный подход*\n\n"
+    "🎯 *Ваша сдача — наша общая цель\\!*\n\n"
+    "💪 *Убедитесь сами — доверьте нам свою курсовую\\!* 😊"
+)
+
+
+# Текст после имени в приветствии
+WELCOME_TEXT = (
+    "\\! 👋\n\n"
+    "    *Мы — команда профессионалов, которые разбираются в строительных дисциплинах* 🏗️ *и знают, как помочь студентам\\.*\n\n"
+    "    *Если ты учишься на 1\\-3 курсе* и у тебя нет времени или нужна помощь с курсовой — *ты по адресу\\!* ✅\n\n"
+    "    *Наше главное правило:* мы *не продаем готовые работы «с полки»*\\. *Мы создаем каждую курсовую индивидуально для тебя* ✍️\\. Это значит, что твоя работа будет:\n\n"
+    "    • *Уникальной* 🛡️\n\n"
+    "    • *Качественной* 📐\n\n"
+    "    • *По требованиям преподавателя* 👨‍🏫\n\n"
+    "    *Можешь быть уверен* — мы подходим к делу ответственно, чтобы твой проект был *сделан на отлично\\!* 🎯\n\n"
+    "    *Давай сделаем твою учебу немного проще?* 😉\n\n"
+    "    *Выбери нужный раздел:*"
+)
+
+
+# Описание тарифа до и после списка цен
+PACKAGE_DESCRIPTIONS = {
+    'basic': (
+        "🏗️ *Тариф «БАЗОВЫЙ»* — надежный фундамент вашей работы\n"
+        "Идеален, если вы хорошо разбираетесь в теме, но хотите сэкономить время на оформлении и базовых расчетах\\.\n\n"
+        "• *Теоретическая часть* — чтобы работа была глубокой и аргументированной\n"
+        "• *Основные расчеты* — чтобы все цифры были точными и обоснованными\n"
+        "• *Оформление по ГОСТ* — чтобы не пришлось переделывать «из\\-за точек и запятых»\n\n",
+        "*Это ваш выбор, если:* вы уверены в своих силах, но цените своё время и хотите прочной основы для отличной работы\\."
+    ),
+    'standard': (
+        "📊 *Тариф «СТАНДАРТ»* — готовое решение «под ключ»\n"
+        "Всё, что нужно для уверенной сдачи, включая возможность корректировок\\.\n\n"
+        "• *Всё из тарифа «Базовый»* — теория, расчеты, безупречное оформление\n"
+        "• *Чертежи* — профессиональные схемы и чертежи для вашего проекта\n"
+        "• *Правки и доработки* — возможность внести корректировки по замечаниям преподавателя\n\n",
+        "*Это ваш выбор, если:* вам нужна полностью готовая работа с возможностью адаптировать её под требования преподавателя\\."
+    ),
+    'individual': (
+        "💎 *Тариф «ИНДИВИДУАЛЬНЫЙ»* — ваш персональный проект с гарантией результата\n"
+        "Максимум поддержки и внимания к деталям\\. Для тех, кто хочет идеальный результат без компромиссов\\.\n\n"
+        "• *Полное сопровождение* — от согласования плана до подготовки к защите\n"
+        "• *Персональный куратор* — эксперт на связи, чтобы ответить на любой вопрос и помочь с любыми правками\n"
+        "• *Неограниченные правки* — вносим изменения столько, сколько нужно, пока вы не будете довольны на 100%\n"
+        "• *Приоритетное выполнение* — ваша работа выполняется вне очереди, чтобы вы точно уложились в срок\n\n",
+        "*Это ваш выбор, если:* для вас важна не просто сдача, а высший балл, полное спокойствие и уверенность на каждом этапе\\."
+    ),
+}
+
+
+PRICES_FOOTER = (
+    "🎯 *Нужна помощь с выбором?*\n"
+    "Просто напишите нам свою тему и предмет — вместе подберем лучший вариант для вашего успеха\\! 😊"
+)
+
+PRICES_HEADER = "*💰 Стоимость для вашего предмета:*\n"
+
+CONTACTS_TEXT = "📞 Наши контакты:\n\n👤 Менеджер: @struct_bot_admin\n📧 Email: struct.bot@mail.ru"
+
+
+def md(text) -> str:
+    """Экранирует значение для MarkdownV2"""
+    return escape_markdown(str(text), version=2)
+
+
+class ResponseCatalog:
+    """Готовые тексты ответов, зависящие только от настроек"""
+
+    def __init__(self):
+        self.reload()
+
+    def reload(self, subject_prices=None, service_packages=None):
+        """Пересобирает тексты по текущим ценам и тарифам"""
+        subject_prices = config.SUBJECT_PRICES if subject_prices is None else subject_prices
+        service_packages = config.SERVICE_PACKAGES if service_packages is None else service_packages
+
+        self.guarantees = GUARANTEES_TEXT
+        self.about = ABOUT_TEXT
+        self.contacts = CONTACTS_TEXT
+        self.prices = self._render_prices(subject_prices)
+        self._packages = {
+            subject: self._render_packages(prices, service_packages)
+            for subject, prices in subject_prices.items()
+        }
+        self._service_packages = service_packages
+
+    @staticmethod
+    def _render_prices(subject_prices) -> str:
+        blocks = []
+        for package_key, (intro, outro) in PACKAGE_DESCRIPTIONS.items():
+            lines = "".join(
+                f"{md(subject)} — {md(prices.get(package_key, 0))} руб\\.\n"
+                for subject, prices in subject_prices.items()
+            )
+            blocks.append(f"{intro}{PRICES_HEADER}{lines}\n{outro}")
+        return "\n\n\n\n".join(blocks) + "\n\n" + PRICES_FOOTER
+
+    @staticmethod
+    def _render_packages(prices, service_packages) -> str:
+        text = "Выберите тариф выполнения:\n\n"
+        for package_key, package_info in service_packages.items():
+            text += f"*{md(package_info['name'])}* \\- {md(prices.get(package_key, 0))} руб\\.\n\n"
+        text += "💬 Или закажите консультацию для обсуждения деталей"
+        return text
+
+    def welcome(self, first_name: str) -> str:
+        """Приветствие с экранированным именем пользователя"""
+        return f"Привет, {md(first_name)}{WELCOME_TEXT}"
+
+    def packages(self, subject: str, variant: str) -> str:
+        """Список тарифов с ценами для предмета и варианта"""
+        body = self._packages.get(subject)
+        if body is None:
+            body = self._render_packages({}, self._service_packages)
+        return f"🎯 Вариант {md(variant)} \\- {md(subject)}\n\n{body}"
+
+
+# Глобальный каталог ответов
+catalog = ResponseCatalog()
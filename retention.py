@@ -0,0 +1,187 @@
+"""Свертка и очистка журнала активностей
+
+Сырые записи user_activities старше срока хранения сворачиваются в дневные
+итоги activity_daily (день, пользователь, тип действия) и удаляются. Работа
+идет пачками: каждая пачка — короткая транзакция в потоке-писателе, между
+пачками успевают проходить обычные записи бота. При ACTIVITY_ARCHIVE_DB
+сырые записи перед удалением копируются в отдельный файл SQLite. Тот же
+проход удаляет просроченные состояния диалогов из хранилища состояний.
+
+По умолчанию выключено (ACTIVITY_RETENTION_DAYS=0): включение удаляет старые
+сырые записи безвозвратно, если не задан ACTIVITY_ARCHIVE_DB.
+
+Ручной запуск:
+    python retention.py [путь_к_базе] --days N [--archive archive.db]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from config import (
+    ACTIVITY_RETENTION_DAYS, RETENTION_CHUNK_SIZE, RETENTION_CHUNK_PAUSE, RETENTION_INTERVAL_HOURS,
+    ACTIVITY_ARCHIVE_DB
+)
+
+logger = logging.getLogger(__name__)
+
+
+def retention_cutoff(days: int) -> str:
+    """Граница хранения: начало UTC-дня days дней назад, чтобы сворачивались только целые дни"""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (today - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class RetentionJob:
+    """Периодическая свертка журнала активностей в дневные итоги и очистка просроченных состояний"""
+
+    def __init__(self, days: int = ACTIVITY_RETENTION_DAYS, chunk_size: int = RETENTION_CHUNK_SIZE,
+                 pause: float = RETENTION_CHUNK_PAUSE, interval_hours: float = RETENTION_INTERVAL_HOURS,
+                 archive_file: str = ACTIVITY_ARCHIVE_DB):
+        self.days = days
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.interval = interval_hours * 3600
+        self.archive_file = archive_file or None
+        self.adb = None
+        self.states = None
+
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+        # Метрики
+        self.runs = 0
+        self.rolled_up_total = 0
+        self.states_purged_total = 0
+        self.last_run = None
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Удаляет просроченные состояния, сворачивает записи старше срока хранения и возвращает итог прохода"""
+        started = time.monotonic()
+        purged = await self.states.purge_expired() if self.states is not None else 0
+        self.states_purged_total += purged
+        if purged:
+            logger.info(f"🧹 Удалено просроченных состояний диалогов: {purged}")
+
+        cutoff = retention_cutoff(self.days) if self.days > 0 else None
+        moved_total = 0
+        chunks = 0
+
+        while cutoff and not self._stopping:
+            moved = await self.adb.rollup_activities_chunk(cutoff, self.chunk_size, self.archive_file)
+            moved_total += moved
+            chunks += moved > 0
+            if moved < self.chunk_size:
+                break
+            await asyncio.sleep(self.pause)
+
+        # Отметки «был активен в этот день» нужны триггеру только за текущие дни
+        if cutoff:
+            await self.adb.prune_daily_active_users(cutoff[:10])
+
+        self.runs += 1
+        self.rolled_up_total += moved_total
+        self.last_run = {
+            'cutoff': cutoff,
+            'rolled_up': moved_total,
+            'chunks': chunks,
+            'states_purged': purged,
+            'seconds': round(time.monotonic() - started, 2),
+        }
+        if moved_total:
+            logger.info(f"🧹 Журнал активностей: свернуто {moved_total} записей старше {cutoff} "
+                        f"({chunks} пачек, {self.last_run['seconds']} сек.)")
+        return self.last_run
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка очистки журнала активностей: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None
+
+    def start(self, adb, states=None):
+        """Запускает периодическую свертку журнала и очистку состояний из хранилища states"""
+        self.adb = adb
+        self.states = states
+        if self.days <= 0:
+            logger.info("ℹ️ Срок хранения журнала активностей не ограничен, свертка отключена")
+            if states is None:
+                return
+        elif not self.archive_file:
+            logger.warning(f"⚠️ Сырые записи журнала активностей старше {self.days} дн. будут удалены "
+                           f"без архива (ACTIVITY_ARCHIVE_DB не задан)")
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Останавливает свертку после текущей пачки"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики свертки журнала"""
+        return {
+            'runs': self.runs,
+            'rolled_up_total': self.rolled_up_total,
+            'states_purged_total': self.states_purged_total,
+            'last_run': self.last_run,
+        }
+
+
+# Глобальная задача очистки журнала активностей
+retention_job = RetentionJob()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Свертка журнала активностей в дневные итоги")
+    parser.add_argument('db_file', nargs='?', default='bot_database.db')
+    parser.add_argument('--days', type=int, default=ACTIVITY_RETENTION_DAYS)
+    parser.add_argument('--chunk', type=int, default=RETENTION_CHUNK_SIZE)
+    parser.add_argument('--archive', default=ACTIVITY_ARCHIVE_DB)
+    args = parser.parse_args()
+
+    if args.days <= 0:
+        parser.error("укажите срок хранения --days N (ACTIVITY_RETENTION_DAYS не задан)")
+
+    from database import Database
+    database = Database(args.db_file)
+    cutoff = retention_cutoff(args.days)
+
+    try:
+        total = 0
+        while True:
+            moved = database.rollup_activities_chunk(cutoff, args.chunk, args.archive or None)
+            total += moved
+            if moved < args.chunk:
+                break
+        database.prune_daily_active_users(cutoff[:10])
+
+        conn = database.get_connection()
+        try:
+            raw = conn.execute('SELECT COUNT(*) FROM user_activities').fetchone()[0]
+            daily = conn.execute('SELECT COUNT(*) FROM activity_daily').fetchone()[0]
+        finally:
+            conn.close()
+    finally:
+        database.close()
+
+    print(f"🧹 Свернуто записей старше {cutoff}: {total}")
+    print(f"📊 В журнале: {raw}, дневных итогов: {daily}")
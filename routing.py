@@ -0,0 +1,180 @@
+"""Таблица маршрутизации текстовых сообщений и команд
+
+Надписи кнопок объявлены здесь один раз: из них строятся клавиатуры в
+keyboards.py, и на них же регистрируются обработчики в handlers.py.
+Поиск обработчика по тексту кнопки — одно обращение к словарю; условия
+(например, ввод номера варианта) проверяются, только если точного
+совпадения нет.
+"""
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from telegram.ext import CommandHandler, MessageHandler, filters
+
+logger = logging.getLogger(__name__)
+
+# Надписи кнопок пользователя
+BTN_SUBJECTS = '📚 Предметы'
+BTN_GUARANTEES = 'ℹ️ Гарантии'
+BTN_PRICES = '💰 Цены'
+BTN_ABOUT = '👨‍🎓 О нас'
+BTN_CART = '🛒 Корзина'
+BTN_CONTACTS = '📞 Контакты'
+BTN_CLEAR_CART = '🧹 Очистить корзину'
+BTN_BACK_TO_MENU = '↩️ Назад в меню'
+BTN_HOME = '🏠 В главное меню'
+BTN_ENTER_VARIANT = '✏️ Ввести вариант'
+BTN_TO_SUBJECTS = '↩️ К выбору предмета'
+BTN_PACKAGE_BASIC = '🏗️ БАЗОВЫЙ'
+BTN_PACKAGE_STANDARD = '📊 СТАНДАРТ'
+BTN_PACKAGE_INDIVIDUAL = '💎 ИНДИВИДУАЛЬНЫЙ'
+BTN_CONSULTATION = '📞 Заказать консультацию'
+BTN_BACK = '↩️ Назад'
+BTN_CONTACT_MANAGER = '📞 Связаться с менеджером'
+BTN_BACK_TO_PACKAGES = '↩️ Назад к тарифам'
+BTN_CHECKOUT = '✅ Оформить заказ'
+
+# Кнопка тарифа -> ключ тарифа в SERVICE_PACKAGES
+PACKAGE_BUTTONS = {
+    BTN_PACKAGE_BASIC: 'basic',
+    BTN_PACKAGE_STANDARD: 'standard',
+    BTN_PACKAGE_INDIVIDUAL: 'individual',
+}
+
+# Надписи кнопок админа
+BTN_ADMIN_USERS = '👥 Пользователи'
+BTN_ADMIN_ORDERS = '📦 Заказы'
+BTN_ADMIN_BROADCAST = '📢 Общая рассылка'
+BTN_ADMIN_EXIT = '🚪 Обычный режим'
+BTN_ADMIN_BACK = '↩️ Назад в админ-панель'
+BTN_ADMIN_CANCEL = '❌ Отмена'
+BTN_ORDERS_ALL = '📦 Все заказы'
+BTN_ORDERS_READY = '✅ Готовые заказы'
+BTN_ORDERS_WORKING = '🔄 Заказы в работе'
+BTN_ADMIN_REPLY_PREFIX = '💬 Ответить'
+
+Handler = Callable[..., Awaitable[None]]
+Middleware = Callable[..., Awaitable[None]]
+
+
+class Route(NamedTuple):
+    """Обработчик и запись активности, которую делает middleware перед его вызовом
+
+    activity — текст активности, {text} подставляется текстом сообщения;
+    activity_type=None — активность не записывается.
+    """
+    handler: Handler
+    activity_type: Optional[str] = 'menu_click'
+    activity: str = '{text}'
+
+
+class Router:
+    """Реестр обработчиков: точные тексты, условия и обработчик по умолчанию"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._exact: Dict[str, Route] = {}
+        self._conditions: List[Tuple[Callable[[str], bool], Route]] = []
+        self._fallback: Optional[Route] = None
+        self._middleware: List[Middleware] = []
+        self._commands: List[Tuple[str, Handler]] = []
+
+    def route(self, *texts: str, activity_type: Optional[str] = 'menu_click', activity: str = '{text}'):
+        """Декоратор: регистрирует обработчик для одной или нескольких надписей кнопок"""
+        def decorator(handler: Handler) -> Handler:
+            for text in texts:
+                if text in self._exact:
+                    raise ValueError(f"Кнопка {text!r} уже зарегистрирована в {self.name}")
+                self._exact[text] = Route(handler, activity_type, activity)
+            return handler
+        return decorator
+
+    def when(self, condition: Callable[[str], bool], activity_type: Optional[str] = None, activity: str = '{text}'):
+        """Декоратор: обработчик для текстов, подходящих под условие (проверяется после точных)"""
+        def decorator(handler: Handler) -> Handler:
+            self._conditions.append((condition, Route(handler, activity_type, activity)))
+            return handler
+        return decorator
+
+    def fallback(self, activity_type: Optional[str] = None, activity: str = '{text}'):
+        """Декоратор: обработчик сообщений, для которых не нашлось маршрута"""
+        def decorator(handler: Handler) -> Handler:
+            self._fallback = Route(handler, activity_type, activity)
+            return handler
+        return decorator
+
+    def command(self, name: str):
+        """Декоратор: регистрирует обработчик команды /name"""
+        def decorator(handler: Handler) -> Handler:
+            self._commands.append((name, handler))
+            return handler
+        return decorator
+
+    def use(self, middleware: Middleware):
+        """Добавляет middleware(update, context, route, text), вызываемый перед каждым обработчиком"""
+        self._middleware.append(middleware)
+        return middleware
+
+    def wrap_handlers(self, wrapper: Callable[[Handler], Handler]):
+        """Заменяет обработчики маршрутов на wrapper(handler); каждый обработчик оборачивается один раз"""
+        wrapped: Dict[Handler, Handler] = {}
+
+        def rewrap(route: Route) -> Route:
+            if route.handler not in wrapped:
+                wrapped[route.handler] = wrapper(route.handler)
+            return route._replace(handler=wrapped[route.handler])
+
+        self._exact = {text: rewrap(route) for text, route in self._exact.items()}
+        self._conditions = [(condition, rewrap(route)) for condition, route in self._conditions]
+        if self._fallback is not None:
+            self._fallback = rewrap(self._fallback)
+
+    @property
+    def labels(self) -> Iterable[str]:
+        return self._exact.keys()
+
+    def resolve(self, text: str) -> Optional[Route]:
+        """Находит маршрут для текста сообщения"""
+        route = self._exact.get(text)
+        if route is not None:
+            return route
+
+        for condition, route in self._conditions:
+            if condition(text):
+                return route
+        return self._fallback
+
+    def unrouted(self, keyboard: Iterable[Iterable[str]]) -> List[str]:
+        """Надписи клавиатуры, для которых нет обработчика"""
+        return [label for row in keyboard for label in row if self.resolve(label) in (None, self._fallback)]
+
+    async def dispatch(self, update, context) -> bool:
+        """Вызывает обработчик для сообщения. Возвращает False, если маршрут не найден"""
+        text = update.message.text
+        route = self.resolve(text)
+        if route is None:
+            return False
+
+        for middleware in self._middleware:
+            await middleware(update, context, route, text)
+        await route.handler(update, context)
+        return True
+
+    def register(self, application, message_handler: Handler, group: int = 0):
+        """Регистрирует в приложении команды и единый обработчик текстовых сообщений"""
+        for name, handler in self._commands:
+            application.add_handler(CommandHandler(name, handler), group)
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler), group)
+
+
+def activity_middleware(save_user_activity: Callable[..., Awaitable[None]]) -> Middleware:
+    """Middleware, записывающий активность пользователя, объявленную в маршруте"""
+    async def middleware(update, context, route: Route, text: str):
+        if route.activity_type is not None:
+            await save_user_activity(update.effective_user.id, route.activity_type, route.activity.format(text=text))
+    return middleware
+
+
+# Маршруты пользователя и админа (в режиме админ-панели)
+router = Router('user')
+admin_router = Router('admin')
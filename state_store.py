@@ -0,0 +1,255 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from config import STATE_BACKEND, STATE_CACHE, STATE_TTL, STATE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class StateStore(ABC):
+    """Хранилище состояний диалогов: значения по (namespace, key) с необязательным TTL"""
+
+    @abstractmethod
+    async def get(self, namespace: str, key, default=None):
+        pass
+
+    @abstractmethod
+    async def set(self, namespace: str, key, value, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    async def delete(self, namespace: str, key):
+        pass
+
+    async def purge_expired(self) -> int:
+        """Удаляет просроченные состояния; хранилищу в памяти не нужно — они удаляются при чтении и вытеснении"""
+        return 0
+
+    def namespace(self, name: str) -> 'StateNamespace':
+        return StateNamespace(self, name)
+
+
+class StateNamespace:
+    """Состояния одного вида (например, админа) с интерфейсом, похожим на dict"""
+
+    def __init__(self, store: StateStore, name: str):
+        self.store = store
+        self.name = name
+
+    async def get(self, key, default=None):
+        return await self.store.get(self.name, key, default)
+
+    async def set(self, key, value, ttl: Optional[float] = None):
+        await self.store.set(self.name, key, value, ttl)
+
+    async def pop(self, key, default=None):
+        value = await self.store.get(self.name, key, _MISSING)
+        if value is _MISSING:
+            return default
+        await self.store.delete(self.name, key)
+        return value
+
+
+class MemoryStateStore(StateStore):
+    """Состояния в памяти процесса с вытеснением давно не использованных (LRU)"""
+
+    def __init__(self, max_entries: int = STATE_MAX_ENTRIES, default_ttl: Optional[float] = STATE_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, namespace: str, key, default=None):
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[(namespace, key)]
+                return default
+
+            self._data.move_to_end((namespace, key))
+            return value
+
+    async def set(self, namespace: str, key, value, ttl: Optional[float] = None, expires_at: Optional[float] = _MISSING):
+        if expires_at is _MISSING:
+            ttl = self.default_ttl if ttl is None else ttl
+            expires_at = time.time() + ttl if ttl else None
+
+        with self._lock:
+            self._data[(namespace, key)] = (value, expires_at)
+            self._data.move_to_end((namespace, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    async def delete(self, namespace: str, key):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+
+class SQLiteStateStore(StateStore):
+    """Состояния в таблице conversation_states: переживают перезапуск и общие для нескольких процессов
+
+    Значения хранятся в JSON. Чтения идут в пуле потоков-читателей AsyncDatabase,
+    записи — в потоке-писателе, поэтому обработчики не блокируют event loop.
+    Просроченные записи не возвращаются и удаляются purge_expired(), которую
+    периодически вызывает retention_job.
+    """
+
+    def __init__(self, adb, default_ttl: Optional[float] = STATE_TTL):
+        self.adb = adb
+        self.database = adb.database
+        self.default_ttl = default_ttl
+
+    def _get_with_expiry(self, namespace: str, key):
+        conn = None
+        try:
+            conn = self.database.get_connection()
+            row = conn.execute('''
+                SELECT value, expires_at FROM conversation_states
+                WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)
+            ''', (namespace, str(key), time.time())).fetchone()
+            if row is None:
+                return None
+            return json.loads(row['value']), row['expires_at']
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения состояния {namespace}:{key}: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _set(self, namespace: str, key, value, expires_at: Optional[float]):
+        conn = None
+        try:
+            conn = self.database.get_connection()
+            conn.execute('''
+                INSERT INTO conversation_states (namespace, key, value, expires_at, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (namespace, key) DO UPDATE SET
+                    value = excluded.value,
+                    expires_at = excluded.expires_at,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (namespace, str(key), json.dumps(value, ensure_ascii=False), expires_at))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения состояния {namespace}:{key}: {e}")
+            if conn is not None:
+                conn.rollback()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _delete(self, namespace: str, key):
+        conn = None
+        try:
+            conn = self.database.get_connection()
+            conn.execute('DELETE FROM conversation_states WHERE namespace = ? AND key = ?', (namespace, str(key)))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка удаления состояния {namespace}:{key}: {e}")
+            if conn is not None:
+                conn.rollback()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _purge_expired(self) -> int:
+        conn = None
+        try:
+            conn = self.database.get_connection()
+            cursor = conn.execute(
+                'DELETE FROM conversation_states WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+            )
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"❌ Ошибка очистки просроченных состояний: {e}")
+            if conn is not None:
+                conn.rollback()
+            return 0
+        finally:
+            if conn is not None:
+                conn.close()
+
+    async def get_with_expiry(self, namespace: str, key):
+        """Возвращает (значение, expires_at) или None"""
+        return await self.adb.run_read(self._get_with_expiry, namespace, key)
+
+    async def get(self, namespace: str, key, default=None):
+        found = await self.get_with_expiry(namespace, key)
+        return default if found is None else found[0]
+
+    async def set(self, namespace: str, key, value, ttl: Optional[float] = None) -> Optional[float]:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        await self.adb.run_write(self._set, namespace, key, value, expires_at)
+        return expires_at
+
+    async def delete(self, namespace: str, key):
+        await self.adb.run_write(self._delete, namespace, key)
+
+    async def purge_expired(self) -> int:
+        """Удаляет просроченные состояния"""
+        return await self.adb.run_write(self._purge_expired)
+
+
+class CachedStateStore(StateStore):
+    """Кэш в памяти поверх SQLite: запись сразу в оба хранилища, чтение — из кэша
+
+    Подходит для одного процесса бота. При нескольких процессах кэш может
+    показывать устаревшее состояние, тогда используйте SQLiteStateStore напрямую.
+    """
+
+    def __init__(self, backend: SQLiteStateStore, cache: MemoryStateStore):
+        self.backend = backend
+        self.cache = cache
+
+    async def get(self, namespace: str, key, default=None):
+        value = await self.cache.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        found = await self.backend.get_with_expiry(namespace, key)
+        if found is None:
+            return default
+
+        value, expires_at = found
+        await self.cache.set(namespace, key, value, expires_at=expires_at)
+        return value
+
+    async def set(self, namespace: str, key, value, ttl: Optional[float] = None):
+        expires_at = await self.backend.set(namespace, key, value, ttl)
+        await self.cache.set(namespace, key, value, expires_at=expires_at)
+
+    async def delete(self, namespace: str, key):
+        await self.backend.delete(namespace, key)
+        await self.cache.delete(namespace, key)
+
+    async def purge_expired(self) -> int:
+        return await self.backend.purge_expired()
+
+
+def create_state_store(backend: str = STATE_BACKEND, cache: bool = STATE_CACHE) -> StateStore:
+    """Создает хранилище состояний по настройкам"""
+    if backend == 'memory':
+        return MemoryStateStore()
+    if backend == 'sqlite':
+        from async_db import adb
+        sqlite_store = SQLiteStateStore(adb)
+        return CachedStateStore(sqlite_store, MemoryStateStore()) if cache else sqlite_store
+    raise ValueError(f"Неизвестное хранилище состояний: {backend}")
+
+
+# Глобальное хранилище и состояния админа
+state_store = create_state_store()
+admin_states = state_store.namespace('admin')
@@ -0,0 +1,132 @@
+"""Параллельная обработка обновлений с сохранением порядка для каждого пользователя
+
+Обработчики выбора варианта и тарифа читают user_selections, ждут ответа
+Telegram и базы, затем пишут выбор обратно. Если два быстрых нажатия одного
+пользователя обрабатываются одновременно, второе видит выбор до первого:
+"Сначала выберите предмет" или корзина с ценой другого предмета.
+
+PerUserUpdateProcessor выполняет обновления одного пользователя строго в
+порядке поступления, а разных пользователей — параллельно, не больше
+concurrency одновременно. Очередь пользователя существует, только пока у
+него есть необработанные обновления, и удаляется сразу после последнего,
+поэтому число очередей не больше числа принятых обновлений (max_pending).
+"""
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from config import CONCURRENT_UPDATES, UPDATE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update: object) -> Optional[int]:
+    """Чьи обновления упорядочиваются: пользователь, иначе чат; None — без упорядочивания"""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return None
+
+
+class _UserQueue:
+    """Блокировка пользователя и число его обновлений, которые ждут или выполняются"""
+
+    __slots__ = ('lock', 'pending')
+
+    def __init__(self):
+        # asyncio.Lock будит ожидающих в порядке очереди — обновления идут в порядке поступления
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обновления одного пользователя — по очереди, разных пользователей — параллельно
+
+    Семафор базового класса захватывается до do_process_update, поэтому
+    ограничивает все принятые обновления (max_pending), включая ждущие своей
+    очереди. Одновременное выполнение ограничивает отдельный семафор,
+    который берется уже после блокировки пользователя: быстрые нажатия
+    одного пользователя не занимают места других.
+    """
+
+    def __init__(self, concurrency: int = CONCURRENT_UPDATES, max_pending: int = UPDATE_MAX_PENDING):
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max(self.concurrency, max_pending)
+        super().__init__(self.max_pending)
+        # Базовый класс размеряет семафор по max_concurrent_updates, то есть по concurrency
+        self._semaphore = asyncio.BoundedSemaphore(self.max_pending)
+        self._running_slots = asyncio.Semaphore(self.concurrency)
+        self._queues: Dict[int, _UserQueue] = {}
+
+        self.processed_total = 0
+        self.waited_total = 0
+        self.running = 0
+        self.max_running = 0
+        self.max_queues = 0
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        # Application по этому значению решает, запускать ли обновления параллельно, и показывает
+        # его как concurrent_updates; лимит принятых обновлений — семафор базового класса
+        return self.concurrency
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def _run(self, coroutine: Awaitable[Any]):
+        async with self._running_slots:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                await coroutine
+            finally:
+                self.running -= 1
+                self.processed_total += 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        key = update_key(update)
+        queue = None
+        if key is not None:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = _UserQueue()
+                self.max_queues = max(self.max_queues, len(self._queues))
+            if queue.pending:
+                self.waited_total += 1
+            queue.pending += 1
+
+        try:
+            if queue is None:
+                await self._run(coroutine)
+            else:
+                async with queue.lock:
+                    await self._run(coroutine)
+        finally:
+            if inspect.iscoroutine(coroutine) and inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                # Отменено до запуска — в очереди пользователя или в ожидании места: обработчик так и не
+                # запускался, закрываем корутину, чтобы не было предупреждения "was never awaited"
+                coroutine.close()
+            if queue is not None:
+                queue.pending -= 1
+                if not queue.pending:
+                    del self._queues[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики очередей пользователей"""
+        return {
+            'queues': len(self._queues),
+            'max_queues': self.max_queues,
+            'running': self.running,
+            'max_running': self.max_running,
+            'processed_total': self.processed_total,
+            'waited_total': self.waited_total,
+        }